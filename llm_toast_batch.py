@@ -0,0 +1,265 @@
+# llm_toast_batch.py
+"""
+Headless bulk explain: run explain_selection / chat over many inputs, no GUI.
+
+    python -m llm_toast_batch errors.log                       # one item per line
+    python -m llm_toast_batch items.jsonl --out answers.jsonl --workers 8
+    cat *.log | python -m llm_toast_batch - --order completed
+    python -m llm_toast_batch items.jsonl --out answers.jsonl --resume   # after a crash / Ctrl+C
+
+- Inputs: files or "-" (stdin), read as lines or JSONL (--format; auto picks JSONL when
+  the first non-blank line is a JSON object). JSONL items use "text" (or "selection" /
+  "prompt"), optional "id" and optional "mode" ("explain" / "chat").
+  Items without an id get "<file>:<line>".
+- Work runs on a llm_toast_workers.WorkerPool (--workers); intake blocks while the pool
+  is full, so memory stays flat on large inputs. Each item goes through the normal
+  explain path (local answers, glossary, answer cache, fallback chain, telemetry);
+  incomplete answers are retried (--retries) with backoff.
+- Output: one JSON object per item (id, mode, answer, source, detail, ok, ms, attempts)
+  to stdout or --out, in input order (default) or as completed.
+- Checkpoint: ids of items answered ok are appended to --checkpoint (default
+  <out>.ckpt when --out is given); --resume skips them and appends to --out.
+- A summary (counts by source, throughput, pool and concurrency-limiter stats) goes to
+  stderr. Requests also pass the adaptive per-model limit (llm_toast_limiter), so
+  --workers can be set above what the provider tolerates.
+
+The API key comes from the keyring as usual, or CLIPLLM_API_KEY on headless machines.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, Iterator, List, Iterable, Set, TextIO, NamedTuple
+
+import llm_toast_llm as llm
+import llm_toast_workers as workers
+import llm_toast_limiter as limiter
+
+__all__ = ["Item", "iter_items", "run_item", "BatchRunner", "main"]
+
+log = logging.getLogger("clip_llm_tray")
+
+MODES = ("explain", "chat")
+TEXT_FIELDS = ("text", "selection", "prompt")
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 1
+RETRY_BACKOFF_S = 1.0
+
+class Item(NamedTuple):
+    index: int
+    id: str
+    text: str
+    mode: str
+
+# -------------------- input --------------------
+def _open_input(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+def iter_items(paths: Iterable[str], fmt: str = "auto", mode: str = "explain") -> Iterator[Item]:
+    """Items from files (or "-" for stdin), numbered in input order. Bad JSONL lines are logged and skipped."""
+    index = 0
+    for path in paths:
+        name = "stdin" if path == "-" else os.path.basename(path)
+        f = _open_input(path)
+        try:
+            is_jsonl = None if fmt == "auto" else fmt == "jsonl"
+            for lineno, line in enumerate(f, 1):
+                s = line.strip()
+                if not s:
+                    continue
+                if is_jsonl is None:
+                    is_jsonl = s.startswith("{")
+                item_id, text, item_mode = f"{name}:{lineno}", s, mode
+                if is_jsonl:
+                    try:
+                        obj = json.loads(s)
+                        text = next(obj[k] for k in TEXT_FIELDS if isinstance(obj.get(k), str))
+                    except (ValueError, StopIteration, AttributeError):
+                        log.warning("[batch] %s:%d: not a JSON object with a text field; skipped", name, lineno)
+                        continue
+                    item_id = str(obj.get("id", item_id))
+                    item_mode = obj.get("mode") if obj.get("mode") in MODES else mode
+                yield Item(index, item_id, text, item_mode)
+                index += 1
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+# -------------------- one item --------------------
+def run_item(item: Item, retries: int = DEFAULT_RETRIES, deadline_s: Optional[float] = None,
+             system_prompt: Optional[str] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+    """Answer one item; retries incomplete answers with exponential backoff."""
+    # Yield to the tray app's hotkey explains and chat when sharing a limiter in-process
+    with limiter.background():
+        return _run_item(item, retries, deadline_s, system_prompt, profile)
+
+def _run_item(item: Item, retries: int, deadline_s: Optional[float],
+              system_prompt: Optional[str], profile: Optional[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        if item.mode == "chat":
+            try:
+                answer, _rid = llm.chat(item.text, system_prompt=system_prompt or llm.DEFAULT_CHAT_SYSTEM_PROMPT,
+                                        deadline_s=deadline_s)
+                source, detail = "llm", None
+            except Exception as e:
+                answer, source, detail = f"LLM error: {e}", "incomplete", None
+            if answer.startswith(("LLM error:", "No API key set")):
+                source = "incomplete"
+        else:
+            res = llm.explain(item.text, deadline_s=deadline_s, profile=profile)
+            answer, source, detail = res.text, res.source, res.detail
+        ok = source != "incomplete"
+        if ok or attempt > retries or answer.startswith("No API key set"):
+            break
+        time.sleep(RETRY_BACKOFF_S * 2 ** (attempt - 1))
+    return {"id": item.id, "mode": item.mode, "answer": answer, "source": source, "detail": detail,
+            "ok": ok, "ms": round((time.perf_counter() - t0) * 1000.0, 1), "attempts": attempt}
+
+# -------------------- checkpoint --------------------
+def load_checkpoint(path: Optional[str]) -> Set[str]:
+    done: Set[str] = set()
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            done.update(line.rstrip("\n") for line in f if line.strip())
+    return done
+
+# -------------------- runner --------------------
+class BatchRunner:
+    """
+    Feeds items to a WorkerPool with at most 2 x workers in flight, and writes results in
+    input order (buffering early finishers) or as they complete.
+    """
+
+    def __init__(self, out: TextIO, workers_n: int = DEFAULT_WORKERS, ordered: bool = True,
+                 checkpoint: Optional[TextIO] = None, **item_kwargs: Any) -> None:
+        self.out = out
+        self.ordered = ordered
+        self.checkpoint = checkpoint
+        self.item_kwargs = item_kwargs
+        # In flight (queued + running) is capped by _slots, so the pool queue never overflows
+        self._inflight = 2 * workers_n
+        self._slots = threading.BoundedSemaphore(self._inflight)
+        self.pool = workers.WorkerPool("BatchWorker", max_workers=workers_n, max_queue=self._inflight)
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Optional[Dict[str, Any]]] = {}   # index -> result (None: skipped)
+        self._next = 0
+        self.counts: Dict[str, int] = {"items": 0, "skipped": 0, "ok": 0, "failed": 0}
+        self.by_source: Dict[str, int] = {}
+
+    def run(self, items: Iterable[Item], skip: Set[str] = frozenset()) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            for item in items:
+                self.counts["items"] += 1
+                if item.id in skip:
+                    self.counts["skipped"] += 1
+                    self._finish(item.index, None)
+                    continue
+                self._slots.acquire()
+                fut = self.pool.submit(run_item, item, name=f"item-{item.index}", **self.item_kwargs)
+                fut.add_done_callback(lambda f, item=item: self._done(item, f))
+            for _ in range(self._inflight):   # wait for the last items
+                self._slots.acquire()
+        finally:
+            self.pool.shutdown(timeout_s=2.0)
+        elapsed = time.perf_counter() - t0
+        answered = self.counts["ok"] + self.counts["failed"]
+        return dict(self.counts, by_source=dict(self.by_source), elapsed_s=round(elapsed, 2),
+                    items_per_s=round(answered / elapsed, 2) if elapsed > 0 else 0.0,
+                    pool=self.pool.stats(), limiter=limiter.snapshot())
+
+    def _done(self, item: Item, fut) -> None:
+        try:
+            if fut.cancelled():
+                result = None
+            elif fut.exception() is not None:
+                result = {"id": item.id, "mode": item.mode, "answer": f"error: {fut.exception()}",
+                          "source": "incomplete", "detail": None, "ok": False, "ms": 0.0, "attempts": 1}
+            else:
+                result = fut.result()
+            self._finish(item.index, result)
+        finally:
+            self._slots.release()
+
+    def _finish(self, index: int, result: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            if result is not None:
+                self.counts["ok" if result["ok"] else "failed"] += 1
+                self.by_source[result["source"]] = self.by_source.get(result["source"], 0) + 1
+                if result["ok"] and self.checkpoint is not None:
+                    self.checkpoint.write(result["id"] + "\n")
+                    self.checkpoint.flush()
+            if not self.ordered:
+                if result is not None:
+                    self._write(result)
+                return
+            self._pending[index] = result
+            while self._next in self._pending:
+                ready = self._pending.pop(self._next)
+                self._next += 1
+                if ready is not None:
+                    self._write(ready)
+
+    def _write(self, result: Dict[str, Any]) -> None:
+        self.out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse  # CLI-only
+    ap = argparse.ArgumentParser(prog="python -m llm_toast_batch",
+                                 description="Explain many selections (or run chat turns) without the tray UI.")
+    ap.add_argument("inputs", nargs="*", default=["-"], help="input files; '-' reads stdin (default)")
+    ap.add_argument("--format", choices=("auto", "lines", "jsonl"), default="auto")
+    ap.add_argument("--mode", choices=MODES, default="explain", help="default for items without a mode")
+    ap.add_argument("--out", default=None, help="output JSONL file (default: stdout)")
+    ap.add_argument("--order", choices=("input", "completed"), default="input")
+    ap.add_argument("--workers", type=int,
+                    default=int(os.getenv("CLIPLLM_BATCH_WORKERS") or DEFAULT_WORKERS))
+    ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="extra attempts for incomplete answers")
+    ap.add_argument("--deadline", type=float, default=None, help="seconds per item (default: the profile's)")
+    ap.add_argument("--profile", default=None, help="latency profile for explain (fast / balanced / thorough / auto)")
+    ap.add_argument("--system", default=None, help="system prompt for chat items")
+    ap.add_argument("--checkpoint", default=None, help="file of finished ids (default: <out>.ckpt)")
+    ap.add_argument("--resume", action="store_true", help="skip ids in the checkpoint and append to --out")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    ckpt_path = args.checkpoint or (args.out + ".ckpt" if args.out else None)
+    skip = load_checkpoint(ckpt_path) if args.resume else set()
+    if args.resume and not ckpt_path:
+        ap.error("--resume needs --out or --checkpoint")
+
+    out = open(args.out, "a" if args.resume else "w", encoding="utf-8") if args.out else sys.stdout
+    ckpt = open(ckpt_path, "a" if args.resume else "w", encoding="utf-8") if ckpt_path else None
+    try:
+        runner = BatchRunner(out, workers_n=max(1, args.workers), ordered=args.order == "input",
+                             checkpoint=ckpt, retries=args.retries, deadline_s=args.deadline,
+                             system_prompt=args.system, profile=args.profile)
+        summary = runner.run(iter_items(args.inputs, args.format, args.mode), skip=skip)
+    except KeyboardInterrupt:
+        print("interrupted; rerun with --resume to continue", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if ckpt is not None:
+            ckpt.close()
+    json.dump(summary, sys.stderr, indent=2)
+    sys.stderr.write("\n")
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+# llm_toast_batchjob.py
+"""
+Provider batch jobs for bulk, non-interactive explains (OpenAI-style Batch API).
+
+Real-time calls (llm_toast_batch) pay full price and share the rate limit with the
+hotkey; a batch job is answered within the provider's completion window at a lower
+price, off the real-time limits. Meant for overnight bulk analysis.
+
+    python -m llm_toast_batchjob submit errors.log [--profile balanced]   # prints the job name
+    python -m llm_toast_batchjob status [JOB]
+    python -m llm_toast_batchjob collect JOB [--out answers.jsonl] [--no-wait]
+    python -m llm_toast_batchjob cancel JOB
+    python -m llm_toast_batchjob list
+
+- submit: items are read like llm_toast_batch (lines or JSONL with "id" / "text").
+  Items the explain path answers without a request (local evaluators, glossary,
+  answer cache) are answered at once and never uploaded. The rest become one
+  /v1/chat/completions request line each, custom_id "i<n>", all under one profile
+  (a batch file takes one model; default "balanced"). The file is uploaded (POST /files,
+  purpose "batch") and the job created (POST /batches).
+- The job is advanced step by step (upload, create, poll, download) and its state is
+  saved after every step, so status/collect after a restart continue where it stopped.
+- collect: polls GET /batches/{id} with growing intervals until a terminal status,
+  downloads the output and error files and maps lines back to the input ids by
+  custom_id. Answers are written as JSONL (id, answer, source, detail, ok), like
+  llm_toast_batch; they are not added to the tray app's answer cache, which lives in
+  that process's memory only.
+- Job names default to a timestamp plus a random suffix; submit refuses a name that
+  is already taken, so a job's state is never overwritten.
+
+State: %APPDATA%\\ClipLLM\\batch_jobs\\<job>.json (+ <job>.input.jsonl, <job>.results.jsonl)
+Try it locally: python llm_toast_mock_server.py --batch-delay 5
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import logging
+import secrets
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, TextIO
+
+import llm_toast_settings as settings
+import llm_toast_profiles as profiles
+import llm_toast_llm as llm
+import llm_toast_batch as batch
+
+__all__ = ["submit", "advance", "collect", "cancel", "load_job", "list_jobs", "main"]
+
+log = logging.getLogger("clip_llm_tray")
+
+ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+DEFAULT_PROFILE = "balanced"
+HTTP_TIMEOUT_S = (5, 120)
+POLL_START_S = 5.0
+POLL_FACTOR = 1.5
+POLL_MAX_S = 60.0
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+_DIR_NAME = "batch_jobs"
+_lock = threading.Lock()
+
+# -------------------- local state --------------------
+def _dir() -> str:
+    path = settings.config_file(_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _path(name: str, suffix: str = ".json") -> str:
+    return os.path.join(_dir(), name + suffix)
+
+def _save(job: Dict[str, Any]) -> None:
+    p = _path(job["name"])
+    tmp = p + ".tmp"
+    job["updated"] = time.time()
+    with _lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=1)
+        os.replace(tmp, p)  # atomic: a crash never leaves a half-written job
+
+def load_job(name: str) -> Dict[str, Any]:
+    try:
+        with open(_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"No batch job named {name!r}") from None
+
+def list_jobs() -> List[Dict[str, Any]]:
+    """Saved jobs, newest first (without their item maps)."""
+    out = []
+    for fn in os.listdir(_dir()):
+        if fn.endswith(".json"):
+            try:
+                job = load_job(fn[:-len(".json")])
+            except Exception:
+                log.exception("Failed to read batch job %s", fn)
+                continue
+            job.pop("items", None)
+            out.append(job)
+    return sorted(out, key=lambda j: j.get("created", 0), reverse=True)
+
+# -------------------- HTTP --------------------
+def _headers() -> Dict[str, str]:
+    key = settings.get_api_key()
+    if not key:
+        raise RuntimeError("No API key set (keyring, or CLIPLLM_API_KEY)")
+    return {"Authorization": f"Bearer {key}"}
+
+def _get(api_base: str, path: str) -> Dict[str, Any]:
+    return llm._get_json(llm._join(api_base, path), _headers(), HTTP_TIMEOUT_S)
+
+def _post(api_base: str, path: str, payload: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+    headers = _headers()
+    if payload is not None:
+        headers["Content-Type"] = "application/json"
+        kwargs["data"] = json.dumps(payload)
+    r = llm._http_session().post(llm._join(api_base, path), headers=headers, timeout=HTTP_TIMEOUT_S, **kwargs)
+    return llm._raise_for_status(r)
+
+def _download(api_base: str, file_id: str) -> List[Dict[str, Any]]:
+    r = llm._http_session().get(llm._join(api_base, f"/files/{file_id}/content"),
+                                headers=_headers(), timeout=HTTP_TIMEOUT_S)
+    if r.status_code >= 400:
+        llm._raise_for_status(r)
+    rows = []
+    for line in r.content.decode("utf-8", errors="replace").splitlines():
+        if line.strip():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                log.warning("[batchjob] unreadable result line in %s", file_id)
+    return rows
+
+# -------------------- submit --------------------
+def submit(items: Iterable[batch.Item], profile: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Any]:
+    """Pack items into a batch file, upload it and create the job. Returns the saved job."""
+    api_base, model, chat_model, _timeout = llm._load_config()
+    prof = profiles.resolve("", profile or DEFAULT_PROFILE)
+    model = profiles.model_for(prof, model, chat_model)
+    cfg = settings.load_settings() or {}
+    name = name or f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+    if os.path.exists(_path(name)):
+        raise FileExistsError(f"A batch job named {name!r} already exists")
+    job: Dict[str, Any] = {"name": name, "status": "packing", "api_base": api_base, "model": model,
+                           "profile": prof.name, "created": time.time(), "items": {}, "offline": 0}
+    results = open(_path(name, ".results.jsonl"), "w", encoding="utf-8")
+    with open(_path(name, ".input.jsonl"), "w", encoding="utf-8") as packed, results:
+        for item in items:
+            offline = llm.answer_offline(item.text, prof, cfg)
+            if offline is not None:
+                _write_result(results, item.id, offline.text, offline.source, offline.detail, True)
+                job["offline"] += 1
+                continue
+            custom_id = f"i{item.index}"
+            body = {"model": model, "temperature": llm.DEFAULT_TEMPERATURE,
+                    "max_completion_tokens": prof.max_tokens,
+                    "messages": [{"role": "system", "content": llm._grounded_prompt(item.text, cfg)},
+                                 {"role": "user", "content": item.text}]}
+            body.update(profiles.chat_params(model, prof))
+            packed.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT,
+                                     "body": body}, ensure_ascii=False) + "\n")
+            job["items"][custom_id] = {"id": item.id, "text": item.text}
+    job["status"] = "packed" if job["items"] else "completed"
+    _save(job)
+    log.info("[batchjob] %s: %d request(s) packed, %d answered offline", name, len(job["items"]), job["offline"])
+    return advance(job)
+
+def advance(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Do the next pending step (upload, create, refresh status) and save the job."""
+    api_base = job["api_base"]
+    if job["status"] == "packed" and not job.get("input_file_id"):
+        with open(_path(job["name"], ".input.jsonl"), "rb") as f:
+            data = _post(api_base, "/files", files={"file": (job["name"] + ".jsonl", f, "application/jsonl")},
+                         data={"purpose": "batch"})
+        job["input_file_id"] = data.get("id")
+        _save(job)
+    if job["status"] == "packed" and not job.get("batch_id"):
+        data = _post(api_base, "/batches", {"input_file_id": job["input_file_id"], "endpoint": ENDPOINT,
+                                            "completion_window": COMPLETION_WINDOW,
+                                            "metadata": {"clipllm_job": job["name"]}})
+        job["batch_id"] = data.get("id")
+        job["status"] = data.get("status") or "validating"
+        _save(job)
+        log.info("[batchjob] %s: submitted as %s", job["name"], job["batch_id"])
+        return job
+    if job.get("batch_id") and job["status"] not in TERMINAL and job["status"] != "collected":
+        data = _get(api_base, f"/batches/{job['batch_id']}")
+        job["status"] = data.get("status") or job["status"]
+        job["request_counts"] = data.get("request_counts") or {}
+        job["output_file_id"] = data.get("output_file_id")
+        job["error_file_id"] = data.get("error_file_id")
+        _save(job)
+    return job
+
+# -------------------- collect --------------------
+def _write_result(out: TextIO, item_id: str, answer: str, source: str, detail: Optional[str], ok: bool) -> None:
+    out.write(json.dumps({"id": item_id, "mode": "explain", "answer": answer, "source": source,
+                          "detail": detail, "ok": ok}, ensure_ascii=False) + "\n")
+
+def _fetch_results(job: Dict[str, Any]) -> Dict[str, int]:
+    """Map the output/error files back to input ids; appends to <job>.results.jsonl."""
+    items: Dict[str, Dict[str, str]] = job["items"]
+    counts = {"ok": 0, "failed": 0, "missing": 0, "tokens": 0}
+    seen = set()
+    with open(_path(job["name"], ".results.jsonl"), "a", encoding="utf-8") as out:
+        for file_key in ("output_file_id", "error_file_id"):
+            if not job.get(file_key):
+                continue
+            for row in _download(job["api_base"], job[file_key]):
+                item = items.get(row.get("custom_id") or "")
+                if item is None or row["custom_id"] in seen:
+                    continue
+                seen.add(row["custom_id"])
+                resp = row.get("response") or {}
+                body = resp.get("body") or {}
+                if row.get("error") or resp.get("status_code", 200) >= 400:
+                    msg = llm._extract_error_message(row) or llm._extract_error_message(body) or "request failed"
+                    _write_result(out, item["id"], f"LLM error: {msg}", "incomplete", job["profile"], False)
+                    counts["failed"] += 1
+                    continue
+                text = llm._extract_text_chat_completions(body)
+                usage = body.get("usage") or {}
+                tokens = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+                counts["tokens"] += tokens
+                _write_result(out, item["id"], text, "batch", job["profile"], True)
+                counts["ok"] += 1
+        for custom_id, item in items.items():
+            if custom_id not in seen:   # expired / cancelled before it ran
+                _write_result(out, item["id"], f"No result (batch {job['status']})", "incomplete", job["profile"], False)
+                counts["missing"] += 1
+    return counts
+
+def collect(name: str, wait: bool = True, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Poll the job to a terminal status (or once, without wait) and fetch its results.
+    Returns the job; job["status"] is "collected" once results are in <job>.results.jsonl.
+    """
+    job = load_job(name)
+    interval = POLL_START_S
+    while job["status"] != "collected":
+        job = advance(job)
+        if job["status"] in TERMINAL:
+            job["result_counts"] = _fetch_results(job) if job["items"] else {"ok": 0, "failed": 0, "missing": 0}
+            job["batch_status"], job["status"] = job["status"], "collected"
+            _save(job)
+            log.info("[batchjob] %s: %s, %s", name, job["batch_status"], job["result_counts"])
+            break
+        if not wait:
+            break
+        log.info("[batchjob] %s: %s %s; next poll in %.0fs", name, job["status"],
+                 job.get("request_counts") or "", interval)
+        if cancel is not None:
+            if cancel.wait(interval):
+                break
+        else:
+            time.sleep(interval)
+        interval = min(interval * POLL_FACTOR, POLL_MAX_S)
+    return job
+
+def cancel(name: str) -> Dict[str, Any]:
+    job = load_job(name)
+    if job.get("batch_id") and job["status"] not in TERMINAL and job["status"] != "collected":
+        data = _post(job["api_base"], f"/batches/{job['batch_id']}/cancel", {})
+        job["status"] = data.get("status") or "cancelling"
+        _save(job)
+    return job
+
+# -------------------- CLI --------------------
+def _summary(job: Dict[str, Any]) -> str:
+    counts = job.get("result_counts") or job.get("request_counts") or {}
+    return (f"{job['name']}  {job['status']:<11} {job.get('batch_status', '')}  "
+            f"items={len(job['items']) if 'items' in job else '-'} offline={job.get('offline', 0)}  "
+            f"{json.dumps(counts)}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse  # CLI-only
+    ap = argparse.ArgumentParser(prog="python -m llm_toast_batchjob",
+                                 description="Bulk explains through the provider's batch API.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("submit", help="pack inputs into a batch job and submit it")
+    p.add_argument("inputs", nargs="*", default=["-"])
+    p.add_argument("--format", choices=("auto", "lines", "jsonl"), default="auto")
+    p.add_argument("--profile", default=DEFAULT_PROFILE, choices=profiles.PROFILE_NAMES)
+    p.add_argument("--name", default=None, help="job name (default: a timestamp and a random suffix)")
+    p = sub.add_parser("status", help="refresh and show a job (default: all jobs)")
+    p.add_argument("name", nargs="?")
+    p = sub.add_parser("collect", help="wait for a job and write its results")
+    p.add_argument("name")
+    p.add_argument("--out", default=None, help="results JSONL (default: stdout)")
+    p.add_argument("--no-wait", action="store_true", help="poll once instead of waiting")
+    p = sub.add_parser("cancel", help="cancel a submitted job")
+    p.add_argument("name")
+    sub.add_parser("list", help="list saved jobs")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        if args.cmd == "submit":
+            job = submit(batch.iter_items(args.inputs, args.format), profile=args.profile, name=args.name)
+            print(job["name"])
+            print(_summary(job), file=sys.stderr)
+        elif args.cmd == "status":
+            for job in ([advance(load_job(args.name))] if args.name else list_jobs()):
+                print(_summary(job))
+        elif args.cmd == "list":
+            for job in list_jobs():
+                print(_summary(job))
+        elif args.cmd == "cancel":
+            print(_summary(cancel(args.name)))
+        elif args.cmd == "collect":
+            job = collect(args.name, wait=not args.no_wait)
+            print(_summary(job), file=sys.stderr)
+            if job["status"] != "collected":
+                return 2
+            with open(_path(job["name"], ".results.jsonl"), "r", encoding="utf-8") as f:
+                if args.out:
+                    with open(args.out, "w", encoding="utf-8") as out:
+                        out.writelines(f)
+                else:
+                    sys.stdout.writelines(f)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    except FileExistsError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("interrupted; the job state is saved (run status/collect again)", file=sys.stderr)
+        return 130
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+llm_toast_bench_startup.py
+Startup benchmark for the tray app.
+
+Two measurements:
+  1) Import cost:   python -X importtime -c "import llm_toast_ui"
+     -> total cumulative import time + the heaviest modules, checked against a budget.
+  2) Time-to-ready: launches the app with CLIPLLM_STARTUP_BENCH=<file>; the app writes its
+     startup milestones (tk_ready, hotkey_ready, tray_visible) to that file and quits.
+
+Usage:
+  python llm_toast_bench_startup.py [--repeat 5] [--budget-ms 400] [--top 15]
+  python llm_toast_bench_startup.py --exe C:\\_pyi\\out\\ClipLLMTray.exe   # measure the onefile build
+"""
+
+import os, sys, json, time, argparse, tempfile, statistics, subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------- import time ---------------------------
+def importtime(module: str = "llm_toast_ui", python: str = sys.executable):
+    """Return (total_ms, [(cumulative_ms, self_ms, name), ...]) for one cold interpreter."""
+    proc = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=HERE, capture_output=True, text=True)
+    rows, total_ms = [], None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header row
+        name = parts[2].rstrip()
+        rows.append((cum_us / 1000.0, self_us / 1000.0, name.strip()))
+        if name.strip() == module and not name.startswith("  "):
+            total_ms = cum_us / 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows.sort(reverse=True)
+    return total_ms, rows
+
+# --------------------------- time to ready ---------------------------
+def time_to_ready(cmd, timeout_s: float = 60.0):
+    """Launch the app, wait for it to report its milestones and exit. Returns (wall_ms, marks)."""
+    fd, path = tempfile.mkstemp(prefix="clipllm_startup_", suffix=".json")
+    os.close(fd); os.remove(path)
+    env = dict(os.environ, CLIPLLM_STARTUP_BENCH=path)
+    t_launch = time.time()
+    proc = subprocess.Popen(cmd, cwd=HERE, env=env)
+    try:
+        proc.wait(timeout=timeout_s)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        raise RuntimeError("App did not report startup milestones in time (hotkey/tray never became ready?)")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    finally:
+        try: os.remove(path)
+        except OSError: pass
+    return (data["epoch_end"] - t_launch) * 1000.0, data["marks_ms"]
+
+# --------------------------- CLI ---------------------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="ClipLLM startup benchmark")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=400.0, help="import-time budget for llm_toast_ui")
+    ap.add_argument("--top", type=int, default=15, help="show the N heaviest imports")
+    ap.add_argument("--exe", default=None, help="measure a built executable instead of the sources")
+    ap.add_argument("--skip-launch", action="store_true", help="only measure import time")
+    args = ap.parse_args(argv)
+
+    rc = 0
+    if not args.exe:
+        totals, rows = [], []
+        for _ in range(args.repeat):
+            total, rows = importtime()
+            totals.append(total or 0.0)
+        med = statistics.median(totals)
+        print(f"import llm_toast_ui: median {med:.1f} ms over {args.repeat} runs (budget {args.budget_ms:.0f} ms)")
+        for cum, own, name in rows[:args.top]:
+            print(f"  {cum:9.1f} ms cumulative  {own:8.1f} ms self  {name}")
+        if med > args.budget_ms:
+            print("IMPORT BUDGET EXCEEDED")
+            rc = 1
+
+    if not args.skip_launch:
+        cmd = [args.exe] if args.exe else [sys.executable, os.path.join(HERE, "llm_toast_ui.py")]
+        walls, marks = [], {}
+        for _ in range(args.repeat):
+            wall, m = time_to_ready(cmd)
+            walls.append(wall)
+            for k, v in m.items():
+                marks.setdefault(k, []).append(v)
+        print(f"launch -> all ready: median {statistics.median(walls):.1f} ms (wall clock, incl. interpreter start)")
+        for k in sorted(marks, key=lambda k: statistics.median(marks[k])):
+            print(f"  {k:<14} median {statistics.median(marks[k]):8.1f} ms after module start")
+    return rc
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# llm_toast_cache.py
+"""
+Answer cache for explain calls that also matches near-duplicate selections.
+
+The same stack trace or error message is often selected again with different
+boundaries, timestamps, line numbers or ids. Matching works locally, no embeddings:
+
+- exact tier: hash of the case-folded, whitespace-collapsed text. Numbers stay in, so
+  "HRESULT 0x80070005" and "HRESULT 0x80004005" are different selections.
+- normalize: additionally mask volatile tokens (timestamps, UUIDs, hex ids/addresses,
+  numbers) so "line 42 at 0x7ffe..." == "line 57 at 0x7ffd..." for the similar tier.
+- similar tier: 64-bit SimHash over word 3-shingles of the normalized text, indexed by
+  LSH (BANDS bands of 64/BANDS bits). Candidates sharing a band are verified by Jaccard
+  similarity of their shingle sets; the best one at or above the threshold is served.
+  Masked values still count where the number is what the selection is about: codes
+  after "port", "hresult", "errno", "code", "status", "exit" must be equal, and in short
+  selections (under LOOSE_MIN_TOKENS tokens, or with more than MAX_MASKED_SHARE of
+  them masked) every masked number / hex id must be.
+- bounded LRU (max_entries); evicted entries leave the LSH buckets.
+- entries remember their origin ("llm" or "prefetch") and token cost, so stats() can
+  tell how many speculative answers were ever served and what they cost.
+- every similar-tier hit is appended to cache_audit.jsonl (next to the telemetry file)
+  with both snippets and the score, for false-positive review.
+
+settings.json: "semantic_cache" (default true), "cache_similarity" (0.75),
+"cache_max_entries" (2000). Env: CLIPLLM_CACHE_SIMILARITY, CLIPLLM_CACHE_MAX_ENTRIES.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import logging.handlers
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Set, List, Tuple, NamedTuple, FrozenSet
+
+import llm_toast_settings as settings
+import llm_toast_telemetry as telemetry
+
+__all__ = ["CacheHit", "SimilarityCache", "default_cache", "fold", "normalize"]
+
+log = logging.getLogger("clip_llm_tray")
+
+DEFAULT_SIMILARITY = 0.75
+DEFAULT_MAX_ENTRIES = 2000
+BANDS = 8
+MAX_SHINGLES = 512
+SNIPPET_CHARS = 160
+MAX_MASKED_SHARE = 0.1      # masked numbers may differ when at most this share of the tokens...
+LOOSE_MIN_TOKENS = 24       # ...in a selection at least this long
+
+# -------------------- normalization / fingerprints --------------------
+# (pattern, replacement, significant): significant values are kept for the similar-tier check
+_MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(z|[+-]\d{2}:?\d{2})?", re.I), " <ts> ", False),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(\.\d+)?\b"), " <ts> ", False),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), " <uuid> ", False),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{8,}\b", re.I), " <hex> ", True),
+    (re.compile(r"\b\d+(\.\d+)?\b"), " <n> ", True),   # standalone only: "utf8" / "http2" stay distinct
+]
+_CODE = re.compile(r"\b(?:port|hresult|errno|code|status|exit)\s*[:=#]?\s*(0x[0-9a-f]+|\d+)\b", re.I)
+_WS = re.compile(r"\s+")
+_TOKEN = re.compile(r"<\w+>|\w+|[^\w\s]")
+
+def fold(text: str) -> str:
+    """Case-folded, whitespace-collapsed text: the exact-tier key."""
+    return _WS.sub(" ", (text or "").casefold()).strip()
+
+def _mask(text: str) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+    """Normalized text, the numbers / hex ids masked out of it (sorted) and the labelled codes among them."""
+    s = (text or "").casefold()
+    codes = tuple(sorted(_CODE.findall(s)))
+    values: List[str] = []
+    for rx, repl, significant in _MASKS:
+        if significant:
+            s = rx.sub(lambda m: values.append(m.group(0)) or repl, s)
+        else:
+            s = rx.sub(repl, s)
+    return _WS.sub(" ", s).strip(), tuple(sorted(values)), codes
+
+def normalize(text: str) -> str:
+    return _mask(text)[0]
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+def _shingles(norm: str) -> FrozenSet[int]:
+    toks = _TOKEN.findall(norm)
+    if len(toks) < 3:
+        return frozenset([_h64(" ".join(toks))]) if toks else frozenset()
+    sh = {_h64(" ".join(toks[i:i + 3])) for i in range(len(toks) - 2)}
+    if len(sh) > MAX_SHINGLES:
+        sh = set(sorted(sh)[:MAX_SHINGLES])  # bottom-k sample keeps Jaccard estimates unbiased
+    return frozenset(sh)
+
+def _simhash(shingles: FrozenSet[int]) -> int:
+    v = [0] * 64
+    for h in shingles:
+        for b in range(64):
+            v[b] += 1 if (h >> b) & 1 else -1
+    out = 0
+    for b in range(64):
+        if v[b] > 0:
+            out |= 1 << b
+    return out
+
+def _bands(sig: int) -> List[int]:
+    width = 64 // BANDS
+    mask = (1 << width) - 1
+    return [(sig >> (i * width)) & mask for i in range(BANDS)]
+
+def _jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+# -------------------- cache --------------------
+class CacheHit(NamedTuple):
+    answer: str
+    kind: str          # "exact" | "similar"
+    similarity: float
+    age_s: float
+    origin: str        # "llm" | "prefetch"
+
+class _Item:
+    __slots__ = ("key", "ns", "answer", "shingles", "sig", "masked", "codes", "snippet", "ts", "hits",
+                 "origin", "tokens")
+
+    def __init__(self, key, ns, answer, shingles, sig, masked, codes, snippet, origin, tokens):
+        self.key = key
+        self.ns = ns
+        self.answer = answer
+        self.shingles = shingles
+        self.sig = sig
+        self.masked = masked
+        self.codes = codes
+        self.snippet = snippet
+        self.ts = time.time()
+        self.hits = 0
+        self.origin = origin
+        self.tokens = tokens
+
+class SimilarityCache:
+    def __init__(self, threshold: float = DEFAULT_SIMILARITY, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, _Item]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[str]]] = [dict() for _ in range(BANDS)]
+        self._stats = {"lookups": 0, "exact": 0, "similar": 0, "stores": 0, "evictions": 0,
+                       "prefetch_stores": 0, "prefetch_served": 0, "prefetch_tokens_served": 0}
+
+    @staticmethod
+    def _key(ns: str, folded: str) -> str:
+        return hashlib.sha1(f"{ns}\x00{folded}".encode("utf-8")).hexdigest()
+
+    def lookup(self, text: str, ns: str = "", record: bool = True) -> Optional[CacheHit]:
+        """Best match for text; record=False peeks without touching stats, LRU order or the audit."""
+        folded = fold(text)
+        if not folded:
+            return None
+        key = self._key(ns, folded)
+        with self._lock:
+            if record:
+                self._stats["lookups"] += 1
+            item = self._items.get(key)
+            if item is not None:
+                if record:
+                    self._served(item)
+                    self._stats["exact"] += 1
+                return CacheHit(item.answer, "exact", 1.0, time.time() - item.ts, item.origin)
+        norm, masked, codes = _mask(text)
+        # Differing numbers only pass when they are a small part of a longer selection
+        n_tokens = len(_TOKEN.findall(norm))
+        strict = n_tokens < LOOSE_MIN_TOKENS or len(masked) > MAX_MASKED_SHARE * n_tokens
+        sh = _shingles(norm)
+        sig = _simhash(sh)
+        with self._lock:
+            cands: Set[str] = set()
+            for i, b in enumerate(_bands(sig)):
+                cands |= self._buckets[i].get(b, set())
+            best, best_sim = None, 0.0
+            for k in cands:
+                it = self._items.get(k)
+                if it is None or it.ns != ns or it.codes != codes or (strict and it.masked != masked):
+                    continue
+                sim = _jaccard(sh, it.shingles)
+                if sim > best_sim:
+                    best, best_sim = it, sim
+            if best is None or best_sim < self.threshold:
+                return None
+            hit = CacheHit(best.answer, "similar", best_sim, time.time() - best.ts, best.origin)
+            if not record:
+                return hit
+            self._served(best)
+            self._stats["similar"] += 1
+            cached_snippet = best.snippet
+        _audit(ns, best_sim, text, cached_snippet)
+        return hit
+
+    def _served(self, item: _Item) -> None:
+        self._items.move_to_end(item.key)
+        if item.origin == "prefetch" and not item.hits:
+            self._stats["prefetch_served"] += 1
+            self._stats["prefetch_tokens_served"] += item.tokens
+        item.hits += 1
+
+    def store(self, text: str, answer: str, ns: str = "", origin: str = "llm", tokens: int = 0) -> None:
+        folded = fold(text)
+        if not folded or not answer:
+            return
+        key = self._key(ns, folded)
+        norm, masked, codes = _mask(text)
+        sh = _shingles(norm)
+        item = _Item(key, ns, answer, sh, _simhash(sh), masked, codes, (text or "").strip()[:SNIPPET_CHARS],
+                     origin, tokens)
+        with self._lock:
+            if key in self._items:
+                self._unindex(self._items.pop(key))
+            self._items[key] = item
+            for i, b in enumerate(_bands(item.sig)):
+                self._buckets[i].setdefault(b, set()).add(key)
+            self._stats["stores"] += 1
+            if origin == "prefetch":
+                self._stats["prefetch_stores"] += 1
+            while len(self._items) > self.max_entries:
+                _k, old = self._items.popitem(last=False)
+                self._unindex(old)
+                self._stats["evictions"] += 1
+
+    def _unindex(self, item: _Item) -> None:
+        for i, b in enumerate(_bands(item.sig)):
+            bucket = self._buckets[i].get(b)
+            if bucket is not None:
+                bucket.discard(item.key)
+                if not bucket:
+                    del self._buckets[i][b]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._buckets = [dict() for _ in range(BANDS)]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            s = dict(self._stats)
+            s["entries"] = len(self._items)
+        s["hit_rate"] = ((s["exact"] + s["similar"]) / s["lookups"]) if s["lookups"] else 0.0
+        return s
+
+# -------------------- audit log --------------------
+_audit_log = logging.getLogger("clip_llm_tray.cache_audit")
+_audit_log.propagate = False
+_audit_ready = False
+
+def _audit(ns: str, sim: float, query: str, cached_snippet: str) -> None:
+    """One JSON line per similar-tier hit; review these for false positives."""
+    global _audit_ready
+    try:
+        if not _audit_ready:
+            path = os.path.join(os.path.dirname(telemetry.telemetry_path()), "cache_audit.jsonl")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            h = logging.handlers.RotatingFileHandler(path, maxBytes=2 * 1024 * 1024, backupCount=2,
+                                                     encoding="utf-8", delay=True)
+            h.setFormatter(logging.Formatter("%(message)s"))
+            _audit_log.addHandler(h)
+            _audit_log.setLevel(logging.INFO)
+            _audit_ready = True
+        _audit_log.info(json.dumps({
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "ns": ns, "similarity": round(sim, 3),
+            "query": (query or "").strip()[:SNIPPET_CHARS], "cached": cached_snippet,
+        }, ensure_ascii=False))
+    except Exception:
+        log.debug("cache audit write failed", exc_info=True)
+
+# -------------------- shared instance --------------------
+_default: Optional[SimilarityCache] = None
+_default_lock = threading.Lock()
+
+def default_cache() -> Optional[SimilarityCache]:
+    """The app-wide cache, or None when disabled in settings."""
+    global _default
+    cfg = settings.load_settings() or {}
+    if not cfg.get("semantic_cache", True):
+        return None
+    with _default_lock:
+        if _default is None:
+            sim = cfg.get("cache_similarity") or os.getenv("CLIPLLM_CACHE_SIMILARITY") or DEFAULT_SIMILARITY
+            size = cfg.get("cache_max_entries") or os.getenv("CLIPLLM_CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES
+            _default = SimilarityCache(threshold=float(sim), max_entries=int(size))
+        return _default
@@ -0,0 +1,163 @@
+# llm_toast_chat_queue.py
+"""
+Per-conversation send queue for the chat window.
+
+- submit() returns immediately, so the user can keep typing while a reply is pending.
+- Queued messages are sent one at a time, in order, each chained to the previous
+  turn's response id (previous_response_id).
+- Side questions (parallel=True) start right away alongside the queue. They see the
+  conversation so far but do not advance the chain.
+- Queue depth, in-flight count and the oldest wait are reported through on_state;
+  per-message queue wait and model time are logged.
+
+No UI code here: callbacks run on worker threads and the window marshals them to Tk.
+"""
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+__all__ = ["ChatSendQueue", "PendingMessage"]
+
+log = logging.getLogger("clip_llm_tray")
+
+class PendingMessage:
+    __slots__ = ("text", "parallel", "t_submit", "t_start", "generation")
+
+    def __init__(self, text: str, parallel: bool, generation: int) -> None:
+        self.text = text
+        self.parallel = parallel
+        self.generation = generation
+        self.t_submit = time.perf_counter()
+        self.t_start: Optional[float] = None
+
+    @property
+    def wait_s(self) -> float:
+        return ((self.t_start or time.perf_counter()) - self.t_submit)
+
+def _spawn_thread(fn: Callable[[], None], name: str) -> None:
+    threading.Thread(target=fn, daemon=True, name=name).start()
+
+class ChatSendQueue:
+    def __init__(self,
+                 send_fn: Callable[[str, Optional[str]], Tuple[str, Optional[str]]],
+                 on_reply: Callable[[PendingMessage, str], None],
+                 on_state: Optional[Callable[[int, int, float], None]] = None,
+                 spawn: Callable[[Callable[[], None], str], None] = _spawn_thread) -> None:
+        """
+        send_fn(text, prev_response_id) -> (reply, response_id)
+        on_reply(message, reply)              # worker thread
+        on_state(queued, in_flight, oldest_wait_s)
+        spawn(fn, name)                       # runs fn in the background; may raise if refused
+        """
+        self._send_fn = send_fn
+        self._on_reply = on_reply
+        self._on_state = on_state
+        self._spawn = spawn
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._draining = False
+        self._in_flight = 0
+        self._generation = 0
+        self.prev_response_id: Optional[str] = None
+
+    # -------- public --------
+    def submit(self, text: str, parallel: bool = False) -> PendingMessage:
+        with self._lock:
+            msg = PendingMessage(text, parallel, self._generation)
+            if parallel:
+                self._in_flight += 1
+                start_drain = False
+            else:
+                self._queue.append(msg)
+                start_drain = not self._draining
+                self._draining = True
+        try:
+            if parallel:
+                self._spawn(lambda: self._run_side(msg), "ChatSideQuestion")
+            elif start_drain:
+                self._spawn(self._drain, "ChatSendQueue")
+        except Exception as e:
+            # Executor refused the work (saturated or shutting down): fail this message only
+            log.warning("Chat send not scheduled: %s", e)
+            with self._lock:
+                if parallel:
+                    self._in_flight -= 1
+                else:
+                    self._queue.remove(msg)
+                    self._draining = False  # only the drain spawn can fail here
+            self._deliver(msg, f"Error: {e}")
+        self._report()
+        return msg
+
+    def reset(self) -> None:
+        """Forget the conversation: drop queued messages and the response chain."""
+        with self._lock:
+            self._generation += 1
+            self._queue.clear()
+            self.prev_response_id = None
+        self._report()
+
+    def state(self) -> Tuple[int, int, float]:
+        with self._lock:
+            oldest = self._queue[0].wait_s if self._queue else 0.0
+            return len(self._queue), self._in_flight, oldest
+
+    # -------- workers --------
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._draining = False
+                    break
+                msg = self._queue.popleft()
+                self._in_flight += 1
+                prev = self.prev_response_id
+            self._report()
+            reply, rid = self._send(msg, prev)
+            with self._lock:
+                self._in_flight -= 1
+                if rid and msg.generation == self._generation:
+                    self.prev_response_id = rid
+            self._deliver(msg, reply)
+        self._report()
+
+    def _run_side(self, msg: PendingMessage) -> None:
+        with self._lock:
+            prev = self.prev_response_id
+        reply, _rid = self._send(msg, prev)  # side questions never advance the chain
+        with self._lock:
+            self._in_flight -= 1
+        self._deliver(msg, reply)
+        self._report()
+
+    def _send(self, msg: PendingMessage, prev: Optional[str]) -> Tuple[str, Optional[str]]:
+        msg.t_start = time.perf_counter()
+        try:
+            reply, rid = self._send_fn(msg.text, prev)
+        except Exception as e:
+            log.exception("Chat send failed")
+            reply, rid = f"Error: {e}", None
+        log.info("[chat] %s reply: waited %.2fs in queue, %.2fs for the model",
+                 "side" if msg.parallel else "queued", msg.wait_s, time.perf_counter() - msg.t_start)
+        return reply, rid
+
+    def _deliver(self, msg: PendingMessage, reply: str) -> None:
+        if msg.generation != self._generation:
+            log.debug("Dropping chat reply from a reset conversation")
+            return
+        try:
+            self._on_reply(msg, reply)
+        except Exception:
+            log.exception("Chat reply callback failed")
+
+    def _report(self) -> None:
+        if self._on_state:
+            try:
+                self._on_state(*self.state())
+            except Exception:
+                log.exception("Chat queue state callback failed")
@@ -2,31 +2,84 @@
 llm_toast_core.py
 Core logic that uses llm_toast_io for keyboard + clipboard.
 Keeps the public API the UI depends on: register_first_available, unregister_hotkey,
-attempt_copy_via_wmcopy_and_sendinput, ask_llm, set_clipboard_text, get_clipboard_text,
-and exposes log, user32, WM_HOTKEY.
+capture_selection, attempt_copy_via_wmcopy_and_sendinput, ask_llm, set_clipboard_text,
+get_clipboard_text, and exposes log, user32, WM_HOTKEY.
 """
 
-import os, sys, time, ctypes, traceback, logging, platform
+import os, sys, time, ctypes, traceback, logging, logging.handlers, platform, queue, gzip, shutil, atexit
 from ctypes import wintypes
+from typing import NamedTuple, Optional, Dict
 
 import llm_toast_io as io  # <-- NEW split
 import llm_toast_llm as llm
+import llm_toast_settings as settings
 
 # --------------------------- Logging ---------------------------
+# Callers only enqueue records; a background QueueListener formats and writes them.
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+DEFAULT_LOG_LEVEL = "INFO"
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the raw record; message formatting happens on the listener thread."""
+    def prepare(self, record):
+        return record
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as sf, gzip.open(dest, "wb") as df:
+        shutil.copyfileobj(sf, df)
+    os.remove(source)
+
+def _log_level(raw=None) -> int:
+    # Import time reads the env var only: settings.json is applied later (apply_settings_log_level)
+    raw = raw or os.getenv("CLIPLLM_LOG_LEVEL") or DEFAULT_LOG_LEVEL
+    level = logging.getLevelName(str(raw).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+def apply_settings_log_level():
+    """Apply settings.json "log_level" once the app is up (CLIPLLM_LOG_LEVEL still wins)."""
+    if os.getenv("CLIPLLM_LOG_LEVEL"):
+        return
+    raw = (settings.load_settings() or {}).get("log_level")
+    if raw:
+        level = _log_level(raw)
+        if level != log.level:
+            log.setLevel(level)
+            log.info("Log level %s (settings)", logging.getLevelName(level))
+
+_log_listener = None
+
 def _setup_logger():
+    global _log_listener
     log_dir = os.path.join(os.environ.get("LOCALAPPDATA", os.getcwd()), "ClipLLM")
     os.makedirs(log_dir, exist_ok=True)
     log_path = os.path.join(log_dir, "clip_llm_tray.log")
 
     logger = logging.getLogger("clip_llm_tray")
     if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
+        level = _log_level()
+        logger.setLevel(level)
+        logger.propagate = False
         fmt = logging.Formatter("%(asctime)s.%(msecs)03d [%(levelname)s] %(threadName)s :: %(message)s",
                                 datefmt="%Y-%m-%d %H:%M:%S")
-        sh = logging.StreamHandler(sys.stdout); sh.setLevel(logging.DEBUG); sh.setFormatter(fmt)
-        fh = logging.FileHandler(log_path, encoding="utf-8"); fh.setLevel(logging.DEBUG); fh.setFormatter(fmt)
-        logger.addHandler(sh); logger.addHandler(fh)
-        logger.debug("==== ClipLLM Core starting ====")
+        # Size-based rotation; rotated files are gzip-compressed (clip_llm_tray.log.1.gz, ...)
+        fh = logging.handlers.RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                  encoding="utf-8", delay=True)
+        fh.namer = lambda name: name + ".gz"
+        fh.rotator = _gzip_rotator
+        fh.setFormatter(fmt)
+        handlers = [fh]
+        if sys.stdout is not None:  # --windowed builds have no console
+            sh = logging.StreamHandler(sys.stdout); sh.setFormatter(fmt)
+            handlers.append(sh)
+
+        q = queue.SimpleQueue()
+        logger.addHandler(_DeferredQueueHandler(q))
+        _log_listener = logging.handlers.QueueListener(q, *handlers)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+
+        logger.info("==== ClipLLM Core starting (log level %s) ====", logging.getLevelName(level))
         logger.debug("Python: %s", sys.version.replace("\n", " "))
         logger.debug("Platform: %s", platform.platform())
         logger.debug("Log file: %s", log_path)
@@ -95,24 +148,13 @@ def focused_info_for_log():
     return hwnd_fg, hwnd_focus, cls
 
 
-# ---- tiny safe wrappers for SendInput + sleep ----
+# ---- tiny safe sleep ----
 def _sleep_ms(ms: int):
     try:
         time.sleep(ms / 1000.0)
     except Exception:
         pass
 
-def _safe_sendkey(vk: int, down: bool):
-    try:
-        io.sendinput_key(vk, down=down)
-    except Exception:
-        log_exc(f"sendinput_key(vk=0x{vk:X}, down={down}) threw")
-
-def _tap_key(vk: int, down_up_delay_ms: int = 5):
-    _safe_sendkey(vk, True)
-    _sleep_ms(down_up_delay_ms)
-    _safe_sendkey(vk, False)
-
 # --------------------------- Public: Hotkeys (wrappers to io) ---------------------------
 # Hotkeys to try (UI text shows whichever succeeds)
 MOD_ALT, MOD_CONTROL, MOD_SHIFT, MOD_WIN = 0x1, 0x2, 0x4, 0x8
@@ -139,34 +181,138 @@ def get_clipboard_text():
 def set_clipboard_text(text: str):
     return io.set_clipboard_text(text)
 
+def read_clipboard_text(max_chars: int):
+    return io.read_clipboard_text(max_chars)
+
+def clipboard_sequence() -> int:
+    return GetClipboardSequenceNumber()
+
+def clipboard_excluded() -> bool:
+    return io.clipboard_excluded_from_monitoring()
+
 # --------------------------- LLM stub ---------------------------
-def ask_llm(prompt: str) -> str:
-    # Delegate to the real LLM client (falls back to helpful message if no key)
-    return llm.explain_selection(prompt)
+def ask_llm(prompt: str, on_delta=None) -> str:
+    # Delegate to the real LLM client (falls back to helpful message if no key).
+    # on_delta(chunk) receives streamed text as it arrives (called on the worker thread).
+    return llm.explain_selection(prompt, on_delta=on_delta)
+
+def explain(prompt: str, on_delta=None) -> "llm.Explanation":
+    # Like ask_llm, but also says whether the answer was computed locally.
+    return llm.explain(prompt, on_delta=on_delta)
 
 # --------------------------- Selection via clipboard (robust) ---------------------------
+DEFAULT_MAX_SELECTION_CHARS = 20000
+
+class Capture(NamedTuple):
+    text: Optional[str]         # the selection (head + tail if truncated), or None if nothing was copied
+    restored: bool              # the user's clipboard was written back
+    timings: Dict[str, float]   # ms spent: snapshot, copy, read, restore
+    total_chars: int = 0        # length of the full selection
+    truncated: bool = False     # longer than max_selection_chars; text is head + marker + tail
+
+def max_selection_chars() -> int:
+    cfg = settings.load_settings() or {}
+    return int(cfg.get("max_selection_chars") or os.getenv("CLIPLLM_MAX_SELECTION_CHARS") or DEFAULT_MAX_SELECTION_CHARS)
+
+# (sequence number, text) of the clipboard as we last left it; a later snapshot at the
+# same sequence number needs no read
+_last_clipboard = (None, None)
+
+def capture_selection(max_wait_ms=2000) -> Capture:
+    """
+    Copy the current selection and hand the user's clipboard back right away.
+
+    The original text is snapshotted only if the clipboard holds text (and is not read
+    again if it is still what we restored last time). It is restored as soon as the
+    selection has been read, not after the LLM answers, and not at all when the
+    selection equals it or nothing was copied.
+
+    The selection is read size-guarded (max_selection_chars): a huge selection comes
+    back as head + tail, and only those parts are ever copied out of the clipboard.
+    """
+    global _last_clipboard
+    timings: Dict[str, float] = {}
+    t = time.perf_counter()
+    def lap(name):
+        nonlocal t
+        now = time.perf_counter()
+        timings[name] = round((now - t) * 1000.0, 1)
+        t = now
+
+    seq_before = GetClipboardSequenceNumber()
+    if _last_clipboard[0] == seq_before:
+        original = _last_clipboard[1]
+    else:
+        original = get_clipboard_text() if io.clipboard_has_text() else None
+    lap("snapshot")
+
+    changed = _trigger_copy(seq_before, max_wait_ms)
+    lap("copy")
+    if not changed:
+        log.info("Clipboard did not change after WM_COPY/SendInput Ctrl+C")
+        _last_clipboard = (seq_before, original)
+        return Capture(None, False, timings)
+
+    clip = io.read_clipboard_text(max_selection_chars())
+    sel = clip.text if clip is not None else None
+    lap("read")
+    restored = False
+    if original is not None and (clip is None or clip.truncated or sel != original):
+        set_clipboard_text(original)
+        restored = True
+        lap("restore")
+        _last_clipboard = (GetClipboardSequenceNumber(), original)
+    elif clip is not None and not clip.truncated:
+        _last_clipboard = (GetClipboardSequenceNumber(), sel)
+    else:
+        _last_clipboard = (None, None)   # full text unknown: read it next time
+    log.info("[select] clipboard io ms: %s", " ".join(f"{k}={v:.1f}" for k, v in timings.items()))
+    if not sel:
+        log.info("Clipboard changed but no text format present")
+        return Capture(None, restored, timings)
+    if clip.truncated:
+        log.info("[select] Selection of %d chars truncated to head+tail (%d chars)", clip.total_chars, len(sel))
+    log.info("[select] Clipboard path succeeded (len=%d, restored=%s)", len(sel), restored)
+    return Capture(sel, restored, timings, clip.total_chars, clip.truncated)
+
 def attempt_copy_via_wmcopy_and_sendinput(max_wait_ms=2000):
     """
     Try WM_COPY to the focused control first; if that doesn't change the clipboard,
     send Ctrl+C via SendInput BUT first temporarily release Shift/Alt/Win.
-    Returns (selected_text or None, original_clipboard_text).
+    Returns (selected_text or None, original_clipboard_text); the caller restores.
+    Prefer capture_selection(), which restores the clipboard itself right away.
     """
-    focused_info_for_log()
-    ks = {
-        "SHIFT": io.is_key_down(VK_SHIFT),
-        "ALT":   io.is_key_down(VK_MENU),
-        "LWIN":  io.is_key_down(VK_LWIN),
-        "RWIN":  io.is_key_down(VK_RWIN),
-        "CTRL":  io.is_key_down(VK_CONTROL),
-    }
-    log.debug("Key states before copy: %s", ks)
-
     seq_before = GetClipboardSequenceNumber()
     original = get_clipboard_text()
 
+    if not _trigger_copy(seq_before, max_wait_ms):
+        log.info("Clipboard did not change after WM_COPY/SendInput Ctrl+C")
+        return None, original
+
+    sel = get_clipboard_text()
+    if not sel:
+        log.info("Clipboard changed but no text format present")
+        return None, original
+
+    log.info("[select] Clipboard path succeeded (len=%d)", len(sel))
+    return sel, original
+
+def _trigger_copy(seq_before: int, max_wait_ms: int) -> bool:
+    """WM_COPY, then Ctrl+C; True once the clipboard sequence number moves past seq_before."""
+    # Focus/key-state probes exist only for the log; skip them unless DEBUG is on.
+    if log.isEnabledFor(logging.DEBUG):
+        focused_info_for_log()
+        ks = {
+            "SHIFT": io.is_key_down(VK_SHIFT),
+            "ALT":   io.is_key_down(VK_MENU),
+            "LWIN":  io.is_key_down(VK_LWIN),
+            "RWIN":  io.is_key_down(VK_RWIN),
+            "CTRL":  io.is_key_down(VK_CONTROL),
+        }
+        log.debug("Key states before copy: %s", ks)
+
     # 1) WM_COPY directly to focused control (if any)
     _, hwnd_focus, _ = _focused_hwnd_and_class()
-    changed = False
     if hwnd_focus:
         io.send_wm_copy(hwnd_focus)
 
@@ -174,47 +320,22 @@ def attempt_copy_via_wmcopy_and_sendinput(max_wait_ms=2000):
         deadline = time.time() + (max_wait_ms / 1000.0) * 0.4
         while time.time() < deadline:
             if GetClipboardSequenceNumber() != seq_before:
-                changed = True; break
+                return True
             time.sleep(0.02)
 
-    # 2) If still no change, SendInput Ctrl+C; ensure Shift/Alt/Win are UP temporarily
-    if not changed:
-        lifted = []
-        for vk, name in [(VK_SHIFT, "SHIFT"), (VK_MENU, "ALT"), (VK_LWIN, "LWIN"), (VK_RWIN, "RWIN")]:
-            if io.is_key_down(vk):
-                log.debug("Temporarily releasing %s", name)
-                _safe_sendkey(vk, False)
-                _sleep_ms(10)
-                lifted.append(vk)
-
-        ctrl_was_down = io.is_key_down(VK_CONTROL)
-        if not ctrl_was_down:
-            _safe_sendkey(VK_CONTROL, True)
-            _sleep_ms(10)
-        _tap_key(VK_C, down_up_delay_ms=5)
-        _safe_sendkey(VK_CONTROL, False)
-        _sleep_ms(10)
-        if ctrl_was_down:
-            _safe_sendkey(VK_CONTROL, True)
-
-        for vk in lifted:
-            io.sendinput_key(vk, down=True); time.sleep(0.005)
-
-        # Poll for change (~60% budget)
-        deadline = time.time() + (max_wait_ms / 1000.0) * 0.6
-        while time.time() < deadline:
-            if GetClipboardSequenceNumber() != seq_before:
-                changed = True; break
-            _sleep_ms(20)
-
-    if not changed:
-        log.info("Clipboard did not change after WM_COPY/SendInput Ctrl+C")
-        return None, original
-
-    sel = get_clipboard_text()
-    if not sel:
-        log.info("Clipboard changed but no text format present")
-        return None, original
-
-    log.info("[select] Clipboard path succeeded (len=%d)", len(sel))
-    return sel, original
+    # 2) Still no change: SendInput Ctrl+C with Shift/Alt/Win lifted meanwhile, as one
+    #    batch so the sequence cannot interleave with the user's own keystrokes
+    seq = io.copy_key_sequence(io.is_key_down)
+    try:
+        ms = io.send_key_sequence(seq)
+        log.info("[select] Ctrl+C sequence injected in %.2f ms (%d events)", ms, len(seq))
+    except Exception:
+        log_exc("send_key_sequence threw")
+
+    # Poll for change (~60% budget)
+    deadline = time.time() + (max_wait_ms / 1000.0) * 0.6
+    while time.time() < deadline:
+        if GetClipboardSequenceNumber() != seq_before:
+            return True
+        _sleep_ms(20)
+    return False
@@ -0,0 +1,110 @@
+# llm_toast_dispatch.py
+"""
+Event-driven task dispatcher for the Tk thread.
+
+- Any thread may post(fn, priority); the UI thread runs tasks in drain().
+- Instead of polling, the dispatcher calls a `wake` callable when the queue goes
+  from idle to pending (the UI binds this to a Tk virtual event), so an idle app
+  never wakes up and a posted task starts as soon as Tk is free.
+- Lower priority value runs first; ties run in post order.
+- Queue-wait and run time are measured per task.
+
+No Tk imports here: the wake hook is injected, so the dispatcher can be driven
+without a display.
+"""
+
+from __future__ import annotations
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import Callable, Optional, Dict, Any
+
+__all__ = ["TaskDispatcher", "PRIORITY_HIGH", "PRIORITY_NORMAL", "PRIORITY_LOW"]
+
+log = logging.getLogger("clip_llm_tray")
+
+PRIORITY_HIGH = 0      # hotkey capture: user is waiting
+PRIORITY_NORMAL = 10   # tray/menu actions, window toggles
+PRIORITY_LOW = 20      # background UI refreshes
+
+class TaskDispatcher:
+    def __init__(self, wake: Callable[[], None]) -> None:
+        self._wake = wake
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._stats: Dict[str, Any] = {"tasks": 0, "failed": 0, "wakes": 0,
+                                       "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    # -------- producer side (any thread) --------
+    def post(self, fn: Callable[[], Any], priority: int = PRIORITY_NORMAL, name: Optional[str] = None) -> None:
+        """Queue fn for the UI thread; wakes the UI loop if it is idle."""
+        item = (priority, next(self._seq), time.perf_counter(), fn, name or getattr(fn, "__name__", repr(fn)))
+        with self._lock:
+            heapq.heappush(self._heap, item)
+        self._request_wake()
+
+    def _request_wake(self) -> None:
+        with self._lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self._wake()
+            with self._lock:
+                self._stats["wakes"] += 1
+        except Exception:
+            # UI loop not running yet (or shutting down); the initial drain picks tasks up.
+            with self._lock:
+                self._wake_pending = False
+            log.debug("Dispatcher wake failed; %d task(s) stay queued", self.pending())
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    # -------- consumer side (UI thread) --------
+    def drain(self, max_tasks: Optional[int] = None) -> int:
+        """Run queued tasks in priority order; returns how many ran."""
+        with self._lock:
+            # Clear first so anything posted while we run triggers a fresh wake.
+            self._wake_pending = False
+        ran = 0
+        debug = log.isEnabledFor(logging.DEBUG)
+        while max_tasks is None or ran < max_tasks:
+            with self._lock:
+                if not self._heap:
+                    break
+                priority, _seq, t_post, fn, name = heapq.heappop(self._heap)
+            t_start = time.perf_counter()
+            wait_ms = (t_start - t_post) * 1000.0
+            failed = False
+            try:
+                fn()
+            except Exception:
+                failed = True
+                log.exception("Task %s failed", name)
+            ran += 1
+            with self._lock:
+                self._stats["failed"] += failed
+                self._stats["tasks"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+            if debug:
+                log.debug("Task %s (prio %d): waited %.1f ms, ran %.1f ms",
+                          name, priority, wait_ms, (time.perf_counter() - t_start) * 1000.0)
+        if max_tasks is not None and self.pending():
+            # Budget exhausted; ask for another turn instead of starving the UI.
+            self._request_wake()
+        return ran
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s["pending"] = len(self._heap)
+        s["wait_ms_avg"] = (s["wait_ms_total"] / s["tasks"]) if s["tasks"] else 0.0
+        return s
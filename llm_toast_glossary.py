@@ -0,0 +1,406 @@
+# llm_toast_glossary.py
+"""
+Offline glossary for team jargon: instant lookups before the LLM is asked.
+
+- Source: a user-supplied CSV (term,definition) or JSON ({term: definition} or
+  [{"term": ..., "definition": ...}]) named by settings "glossary_path" or
+  CLIPLLM_GLOSSARY.
+- The source is compiled into a compact binary index (<source>.idx) that is
+  memory-mapped, so lookups do not load the glossary into Python objects.
+  Compilation happens in preload() (warm-up) and again whenever the source changes
+  (checked at most every RELOAD_CHECK_S); a recompile runs on a background thread
+  while lookups keep using the old index, which is swapped out once the new one is built.
+- Keys are case-folded with whitespace collapsed. lookup() answers offline, trying:
+    exact   the selection is a term
+    prefix  the selection starts a single term (e.g. "Kubern" -> "Kubernetes")
+- near(text) is the only term one edit away (insert/delete/substitute/transpose), via a
+  delete-variant table (symmetric delete), for keys of MIN_FUZZY_LEN+ characters. A
+  typo match is a guess ("craft" is one edit from "RAFT"), so it is only offered to the
+  LLM as context, never answered offline.
+- grounding(text) returns the entries for terms that occur in a longer text, for
+  injecting as context when the LLM is still called.
+
+Each lookup is a handful of binary searches over the mapped file: microseconds,
+independent of glossary size.
+
+Index layout (little endian):
+  header   magic(8) n_terms(u32) n_variants(u32) terms_off(u32) variants_off(u32) blob_off(u32)
+  terms    n_terms  x (key_off u32, key_len u16, term_off u32, term_len u16, def_off u32, def_len u32)
+  variants n_variants x (var_off u32, var_len u16, term_index u32)   sorted by variant bytes
+  blob     utf-8 strings
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import csv
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+from typing import Optional, List, Dict, Tuple, NamedTuple, Iterable
+
+import llm_toast_settings as settings
+
+__all__ = ["Entry", "lookup", "near", "grounding", "preload", "compile_index", "stats"]
+
+log = logging.getLogger("clip_llm_tray")
+
+MAGIC = b"CLGLOSS1"
+_HEADER = struct.Struct("<8sIIIII")
+_TERM = struct.Struct("<IHIHII")
+_VAR = struct.Struct("<IHI")
+
+RELOAD_CHECK_S = 2.0
+MAX_QUERY_CHARS = 64
+MIN_PREFIX_LEN = 3
+MIN_FUZZY_LEN = 4
+MAX_FUZZY_KEY_LEN = 32
+GROUNDING_LIMIT = 8
+
+class Entry(NamedTuple):
+    term: str
+    definition: str
+    match: str   # exact | prefix | fuzzy
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[\w][\w.+#/&-]*", re.UNICODE)
+
+def fold(s: str) -> str:
+    return _WS_RE.sub(" ", (s or "").strip().strip(".,;:!?\"'()[]")).casefold()
+
+# -------------------- compile --------------------
+
+def _read_source(path: str) -> Iterable[Tuple[str, str]]:
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return [(str(k), str(v)) for k, v in data.items()]
+        return [(str(d.get("term", "")), str(d.get("definition", ""))) for d in data if isinstance(d, dict)]
+    rows = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for i, row in enumerate(csv.reader(f)):
+            if len(row) < 2:
+                continue
+            if i == 0 and row[0].strip().lower() == "term":
+                continue  # header
+            rows.append((row[0], row[1]))
+    return rows
+
+def _deletes(key: str) -> List[str]:
+    return [key[:i] + key[i + 1:] for i in range(len(key))]
+
+def compile_index(source: str, index_path: str) -> int:
+    """Build the binary index for source at index_path (atomically). Returns the term count."""
+    terms: Dict[str, Tuple[str, str]] = {}
+    for term, definition in _read_source(source):
+        key = fold(term)
+        if key and definition.strip():
+            terms[key] = (term.strip(), definition.strip())
+    keys = sorted(terms, key=lambda k: k.encode("utf-8"))
+
+    blob = bytearray()
+    def put(s: str) -> Tuple[int, int]:
+        b = s.encode("utf-8")
+        off = len(blob)
+        blob.extend(b)
+        return off, len(b)
+
+    term_rows = []
+    for k in keys:
+        term, definition = terms[k]
+        ko, kl = put(k)
+        to, tl = put(term[:1000])
+        do, dl = put(definition)
+        term_rows.append((ko, min(kl, 0xFFFF), to, min(tl, 0xFFFF), do, dl))
+
+    variants = set()
+    for idx, k in enumerate(keys):
+        if MIN_FUZZY_LEN <= len(k) <= MAX_FUZZY_KEY_LEN:
+            for v in _deletes(k):
+                variants.add((v.encode("utf-8"), idx))
+    var_rows = []
+    var_offsets: Dict[bytes, int] = {}
+    for vb, idx in sorted(variants):
+        off = var_offsets.get(vb)
+        if off is None:
+            off = len(blob)
+            blob.extend(vb)
+            var_offsets[vb] = off
+        var_rows.append((off, len(vb), idx))
+
+    terms_off = _HEADER.size
+    variants_off = terms_off + _TERM.size * len(term_rows)
+    blob_off = variants_off + _VAR.size * len(var_rows)
+    tmp = index_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(term_rows), len(var_rows), terms_off, variants_off, blob_off))
+        for row in term_rows:
+            f.write(_TERM.pack(*row))
+        for row in var_rows:
+            f.write(_VAR.pack(*row))
+        f.write(blob)
+    os.replace(tmp, index_path)
+    return len(term_rows)
+
+# -------------------- mapped index --------------------
+
+class _Index:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_terms, self.n_vars, self.terms_off, self.vars_off, self.blob_off = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a glossary index")
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        finally:
+            self._f.close()
+
+    def _str(self, off: int, n: int) -> bytes:
+        start = self.blob_off + off
+        return self._mm[start:start + n]
+
+    def _key(self, i: int) -> bytes:
+        ko, kl = _TERM.unpack_from(self._mm, self.terms_off + i * _TERM.size)[:2]
+        return self._str(ko, kl)
+
+    def entry(self, i: int, match: str) -> Entry:
+        _ko, _kl, to, tl, do, dl = _TERM.unpack_from(self._mm, self.terms_off + i * _TERM.size)
+        return Entry(self._str(to, tl).decode("utf-8"), self._str(do, dl).decode("utf-8"), match)
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def exact(self, key: bytes) -> Optional[int]:
+        i = self._lower_bound(key)
+        return i if i < self.n_terms and self._key(i) == key else None
+
+    def prefix(self, key: bytes) -> Optional[int]:
+        """
+        Index of the only term starting with key (None if none or ambiguous). The key must
+        cover at least half of the term, so short words do not complete to long terms.
+        """
+        i = self._lower_bound(key)
+        if i >= self.n_terms:
+            return None
+        k = self._key(i)
+        if not k.startswith(key) or len(key) * 2 < len(k):
+            return None
+        if i + 1 < self.n_terms and self._key(i + 1).startswith(key):
+            return None
+        return i
+
+    def _var(self, j: int) -> Tuple[bytes, int]:
+        vo, vl, idx = _VAR.unpack_from(self._mm, self.vars_off + j * _VAR.size)
+        return self._str(vo, vl), idx
+
+    def variant_hits(self, variant: bytes) -> List[int]:
+        lo, hi = 0, self.n_vars
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._var(mid)[0] < variant:
+                lo = mid + 1
+            else:
+                hi = mid
+        out = []
+        while lo < self.n_vars:
+            v, idx = self._var(lo)
+            if v != variant:
+                break
+            out.append(idx)
+            lo += 1
+        return out
+
+    def fuzzy(self, key: str) -> List[int]:
+        """Terms one edit away from key (symmetric delete: query deletes vs key deletes)."""
+        kb = key.encode("utf-8")
+        # query == a key's delete-variant  -> the key has one extra char
+        # a query delete == a key           -> the key is missing one char
+        # a query delete == a key delete    -> substitution / transposition
+        found = set(self.variant_hits(kb))
+        for d in _deletes(key):
+            db = d.encode("utf-8")
+            i = self.exact(db)
+            if i is not None:
+                found.add(i)
+            found.update(self.variant_hits(db))
+        return sorted(found)
+
+# -------------------- loader / hot reload --------------------
+
+_lock = threading.Lock()
+_index: Optional[_Index] = None
+_source: Optional[str] = None
+_source_stamp = None
+_last_check = 0.0
+_builder: Optional[threading.Thread] = None     # background compile in progress
+_failed: Optional[Tuple[str, tuple]] = None      # (source, stamp) that last failed to compile
+_stats = {"lookups": 0, "exact": 0, "prefix": 0, "fuzzy": 0, "reloads": 0}
+
+def _source_path() -> Optional[str]:
+    cfg = settings.load_settings() or {}
+    p = cfg.get("glossary_path") or os.getenv("CLIPLLM_GLOSSARY")
+    return os.path.expandvars(os.path.expanduser(p)) if p else None
+
+def _current() -> Optional[_Index]:
+    """
+    The mapped index for the configured source. Call with _lock held.
+    A changed source is recompiled on a background thread; lookups keep using the
+    old index until the new one is swapped in (None on first use until preload()).
+    """
+    global _last_check, _builder
+    now = time.monotonic()
+    if _index is not None and now - _last_check < RELOAD_CHECK_S:
+        return _index
+    _last_check = now
+    src = _source_path()
+    if not src:
+        return None
+    try:
+        st = os.stat(src)
+    except OSError:
+        return _index if src == _source else None
+    stamp = (st.st_mtime_ns, st.st_size)
+    current = _index is not None and src == _source and stamp == _source_stamp
+    if not current and _builder is None and _failed != (src, stamp):
+        try:
+            fresh = os.stat(src + ".idx").st_mtime_ns >= st.st_mtime_ns
+        except OSError:
+            fresh = False
+        if fresh and _index is None:
+            _swap(src, stamp, None)   # compiled by an earlier run: mapping it is cheap
+        else:
+            _builder = threading.Thread(target=_rebuild, args=(src, stamp), name="GlossaryCompile", daemon=True)
+            _builder.start()
+    return _index if src == _source else None
+
+def _rebuild(src: str, stamp: tuple) -> None:
+    """Compile src next to the live index, then swap it in (background thread)."""
+    global _builder, _failed
+    new_path = src + ".idx.new"
+    try:
+        t0 = time.perf_counter()
+        n = compile_index(src, new_path)
+        log.info("[glossary] compiled %d terms from %s in %.0f ms", n, src, (time.perf_counter() - t0) * 1000.0)
+    except Exception:
+        log.exception("Failed to compile glossary %s", src)
+        with _lock:
+            _failed, _builder = (src, stamp), None
+        return
+    with _lock:
+        if not _swap(src, stamp, new_path):
+            _failed = (src, stamp)
+        _builder = None
+
+def _swap(src: str, stamp: tuple, new_path: Optional[str]) -> bool:
+    """Map src's index (moving new_path into place first) instead of the current one.
+    Call with _lock held; on failure the current index is kept if its file is intact."""
+    global _index, _source, _source_stamp
+    idx_path = src + ".idx"
+    old = _index
+    try:
+        if old is not None:
+            old.close()  # must be unmapped before the file can be replaced (Windows)
+        if new_path:
+            os.replace(new_path, idx_path)
+        _index = _Index(idx_path)
+    except Exception:
+        log.exception("Failed to load glossary %s", src)
+        _index = None
+        if old is not None:
+            try:
+                _index = _Index(old.path)
+            except Exception:
+                log.warning("Previous glossary index %s is no longer usable", old.path)
+        return False
+    _source, _source_stamp = src, stamp
+    _stats["reloads"] += 1
+    return True
+
+def preload() -> bool:
+    """Compile/map the index ahead of the first lookup (warm-up). True if a glossary is loaded."""
+    with _lock:
+        _current()
+        builder = _builder
+    if builder is not None:
+        builder.join()
+    with _lock:
+        return _current() is not None
+
+def lookup(text: str) -> Optional[Entry]:
+    """Glossary entry for a short selection (exact or unambiguous prefix), or None."""
+    key = fold(text)
+    if not key or len(key) > MAX_QUERY_CHARS:
+        return None
+    with _lock:
+        idx = _current()
+        if idx is None or not idx.n_terms:
+            return None
+        _stats["lookups"] += 1
+        kb = key.encode("utf-8")
+        i = idx.exact(kb)
+        match = "exact"
+        if i is None and len(key) >= MIN_PREFIX_LEN:
+            i, match = idx.prefix(kb), "prefix"
+        if i is None:
+            return None
+        _stats[match] += 1
+        return idx.entry(i, match)
+
+def near(text: str) -> Optional[Entry]:
+    """The single term one edit away from a short selection; None if none or several are."""
+    key = fold(text)
+    if not MIN_FUZZY_LEN <= len(key) <= MAX_FUZZY_KEY_LEN:
+        return None
+    with _lock:
+        idx = _current()
+        if idx is None or not idx.n_terms:
+            return None
+        hits = idx.fuzzy(key)
+        if len(hits) != 1:
+            return None
+        _stats["fuzzy"] += 1
+        return idx.entry(hits[0], "fuzzy")
+
+def grounding(text: str, limit: int = GROUNDING_LIMIT) -> List[Entry]:
+    """Exact glossary entries for words and two/three-word phrases occurring in text."""
+    words = [w.casefold() for w in _WORD_RE.findall(text or "")][:2000]
+    if not words:
+        return []
+    found: Dict[str, Entry] = {}
+    with _lock:
+        idx = _current()
+        if idx is None or not idx.n_terms:
+            return []
+        for n in (3, 2, 1):
+            for i in range(len(words) - n + 1):
+                key = " ".join(words[i:i + n]).strip(".,;:!?")
+                if key in found or len(key) < 2:
+                    continue
+                j = idx.exact(key.encode("utf-8"))
+                if j is not None:
+                    found[key] = idx.entry(j, "exact")
+                    if len(found) >= limit:
+                        return list(found.values())
+    return list(found.values())
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,166 @@
+# llm_toast_history.py
+"""
+Bounded in-memory ring of recent hotkey selections, for "what was that again?".
+
+- add(text) records a selection; the same text again (SHA-1 of the stripped text) moves
+  the existing entry to the front instead of storing a copy.
+- attach_answer() links the answer shown for a selection to its entry, so re-explaining
+  from the picker needs no request (and no cache lookup).
+- Capped by total bytes (text + answer + a fixed per-entry overhead) and by item count;
+  the oldest entries go first. Texts and answers of COMPRESS_MIN_BYTES or more are kept
+  zlib-compressed and only inflated when read.
+- Memory only: nothing is written to disk.
+
+settings.json: "history" (default true), "history_max_bytes" (4 MiB),
+"history_max_items" (100).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any
+
+import llm_toast_settings as settings
+
+__all__ = ["HistoryEntry", "SelectionHistory", "from_settings"]
+
+log = logging.getLogger("clip_llm_tray")
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_ITEMS = 100
+COMPRESS_MIN_BYTES = 512
+ENTRY_OVERHEAD_BYTES = 256   # rough cost of the entry object itself
+PREVIEW_CHARS = 80
+
+def _pack(text: str) -> bytes:
+    raw = text.encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"r" + raw
+
+def _unpack(blob: bytes) -> str:
+    if not blob:
+        return ""
+    data = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return data.decode("utf-8")
+
+class HistoryEntry:
+    __slots__ = ("id", "key", "ts", "chars", "preview", "hits", "source", "_text", "_answer")
+
+    def __init__(self, entry_id: int, key: str, text: str) -> None:
+        self.id = entry_id
+        self.key = key
+        self.ts = time.time()
+        self.chars = len(text)
+        self.preview = " ".join(text.split())[:PREVIEW_CHARS]
+        self.hits = 1
+        self.source: Optional[str] = None
+        self._text = _pack(text)
+        self._answer = b""
+
+    @property
+    def text(self) -> str:
+        return _unpack(self._text)
+
+    @property
+    def answer(self) -> Optional[str]:
+        return _unpack(self._answer) if self._answer else None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._text) + len(self._answer) + ENTRY_OVERHEAD_BYTES
+
+class SelectionHistory:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_items: int = DEFAULT_MAX_ITEMS) -> None:
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, HistoryEntry]" = OrderedDict()   # oldest first
+        self._bytes = 0
+        self._next_id = 1
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+
+    def add(self, text: str) -> Optional[HistoryEntry]:
+        """Record a selection (newest first); returns its entry, or None if it cannot fit."""
+        if not text or not text.strip():
+            return None
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.hits += 1
+                entry.ts = time.time()
+                self._entries.move_to_end(key)
+                return entry
+            entry = HistoryEntry(self._next_id, key, text.strip())
+            if entry.nbytes > self.max_bytes:
+                log.info("[history] selection too large to keep (%d chars)", entry.chars)
+                return None
+            self._next_id += 1
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._trim()
+            return entry
+
+    def attach_answer(self, entry: HistoryEntry, answer: str, source: str) -> None:
+        with self._lock:
+            if self._entries.get(entry.key) is not entry:
+                return   # evicted meanwhile
+            self._bytes -= entry.nbytes
+            entry._answer = _pack(answer) if answer else b""
+            entry.source = source
+            self._bytes += entry.nbytes
+            self._trim(keep=entry.key)
+
+    def _trim(self, keep: Optional[str] = None) -> None:
+        """Drop the oldest entries (never `keep`) until both caps hold."""
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes and len(self._entries) <= self.max_items:
+                break
+            if key != keep:
+                self._bytes -= self._entries.pop(key).nbytes
+
+    def recent(self, limit: Optional[int] = None) -> List[HistoryEntry]:
+        """Entries, newest first."""
+        with self._lock:
+            out = list(reversed(self._entries.values()))
+        return out[:limit] if limit else out
+
+    def get(self, entry_id: int) -> Optional[HistoryEntry]:
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.id == entry_id:
+                    return entry
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            raw = sum(e.chars for e in self._entries.values())
+            return {"items": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "text_chars": raw,
+                    "answered": sum(1 for e in self._entries.values() if e._answer)}
+
+def from_settings() -> Optional[SelectionHistory]:
+    """A history sized from settings, or None when disabled."""
+    cfg = settings.load_settings() or {}
+    if not cfg.get("history", True):
+        return None
+    max_bytes = cfg.get("history_max_bytes") or os.getenv("CLIPLLM_HISTORY_MAX_BYTES") or DEFAULT_MAX_BYTES
+    max_items = cfg.get("history_max_items") or DEFAULT_MAX_ITEMS
+    return SelectionHistory(max_bytes=int(max_bytes), max_items=int(max_items))
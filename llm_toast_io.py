@@ -2,10 +2,16 @@
 llm_toast_io.py
 Keyboard (SendInput, key state, hotkey register/unregister) and clipboard helpers.
 No UI here. The core module will import this and wire up logging.
+
+Key injection goes through a backend: Win32KeyBackend submits a whole key sequence
+as one SendInput call; RecordingKeyBackend records sequences instead, so the
+sequence logic can be checked off Windows (tests/test_io_keys.py).
+ctypes prototypes are bound once at import (Windows only).
 """
 
-import ctypes, time, logging
+import sys, ctypes, time, logging
 from ctypes import wintypes
+from typing import NamedTuple, Optional, List, Sequence, Callable
 
 # -------- logger wiring (set by core) --------
 _log = logging.getLogger("clip_llm_tray")
@@ -14,7 +20,12 @@ def set_logger(logger: logging.Logger):
     _log = logger
 
 # -------- Win32 setup --------
-user32 = ctypes.WinDLL("user32", use_last_error=True)
+_WIN32 = sys.platform == "win32"
+if _WIN32:
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+else:  # importable elsewhere for RecordingKeyBackend; Win32 calls are unavailable
+    user32 = kernel32 = None
 
 # Pointer-sized type (Python 3.13: wintypes.ULONG_PTR may not exist)
 try:
@@ -65,23 +76,92 @@ class INPUT(ctypes.Structure):
 INPUT_KEYBOARD = 1
 KEYEVENTF_KEYUP = 0x0002
 
+if _WIN32:
+    _SendInput = user32.SendInput
+    _SendInput.argtypes = [wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int]
+    _SendInput.restype = wintypes.UINT
+    _GetAsyncKeyState = user32.GetAsyncKeyState
+    _GetAsyncKeyState.argtypes = [ctypes.c_int]
+    _GetAsyncKeyState.restype = ctypes.c_short
+
+class KeyEvent(NamedTuple):
+    vk: int
+    down: bool
+
+class Win32KeyBackend:
+    """Real injection: a whole sequence becomes one INPUT array and one SendInput call."""
+
+    def send(self, events: Sequence[KeyEvent]) -> int:
+        n = len(events)
+        arr = (INPUT * n)()
+        for i, ev in enumerate(events):
+            arr[i].type = INPUT_KEYBOARD
+            arr[i].union.ki.wVk = ev.vk
+            arr[i].union.ki.dwFlags = 0 if ev.down else KEYEVENTF_KEYUP
+        sent = _SendInput(n, arr, ctypes.sizeof(INPUT))
+        if sent != n:
+            _log.debug("SendInput injected %d of %d events err=%d", sent, n, ctypes.get_last_error())
+        return sent
+
+    def is_down(self, vk: int) -> bool:
+        return (_GetAsyncKeyState(vk) & 0x8000) != 0
+
+class RecordingKeyBackend:
+    """Records sequences instead of injecting them, and tracks the resulting key state."""
+
+    def __init__(self, held: Sequence[int] = ()) -> None:
+        self.held = set(held)
+        self.batches: List[List[KeyEvent]] = []
+
+    def send(self, events: Sequence[KeyEvent]) -> int:
+        self.batches.append(list(events))
+        for ev in events:
+            (self.held.add if ev.down else self.held.discard)(ev.vk)
+        return len(events)
+
+    def is_down(self, vk: int) -> bool:
+        return vk in self.held
+
+_backend = Win32KeyBackend() if _WIN32 else RecordingKeyBackend()
+
+def set_key_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+def key_backend():
+    return _backend
+
+def send_key_sequence(events: Sequence[KeyEvent]) -> float:
+    """Inject events as one batch; returns the time spent injecting, in ms."""
+    t0 = time.perf_counter()
+    if events:
+        _backend.send(events)
+    return (time.perf_counter() - t0) * 1000.0
+
+def copy_key_sequence(is_down: Optional[Callable[[int], bool]] = None) -> List[KeyEvent]:
+    """
+    Ctrl+C that works while the hotkey's modifiers are still held: lift Shift/Alt/Win,
+    press Ctrl (unless already down) + C, release what we pressed, re-press what we lifted.
+    """
+    is_down = is_down or _backend.is_down
+    lifted = [vk for vk in (VK_SHIFT, VK_MENU, VK_LWIN, VK_RWIN) if is_down(vk)]
+    ctrl_held = is_down(VK_CONTROL)
+    seq = [KeyEvent(vk, False) for vk in lifted]
+    if not ctrl_held:
+        seq.append(KeyEvent(VK_CONTROL, True))
+    seq += [KeyEvent(VK_C, True), KeyEvent(VK_C, False)]
+    if not ctrl_held:
+        seq.append(KeyEvent(VK_CONTROL, False))
+    seq += [KeyEvent(vk, True) for vk in lifted]
+    return seq
+
 def sendinput_key(vk: int, down: bool = True):
     """Inject a single keyboard event via SendInput."""
-    flags = 0 if down else KEYEVENTF_KEYUP
-    inp = INPUT()
-    inp.type = INPUT_KEYBOARD
-    inp.union.ki.wVk = vk
-    inp.union.ki.wScan = 0
-    inp.union.ki.dwFlags = flags
-    inp.union.ki.time = 0
-    inp.union.ki.dwExtraInfo = 0
-    n = user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(INPUT))
-    if n != 1:
-        _log.debug("SendInput failed for vk=0x%X down=%s err=%d", vk, down, ctypes.get_last_error())
+    send_key_sequence([KeyEvent(vk, down)])
 
 def is_key_down(vk: int) -> bool:
     """Return True if the given virtual-key is currently down."""
-    return (user32.GetAsyncKeyState(vk) & 0x8000) != 0
+    return _backend.is_down(vk)
 
 # --------------------------- Hotkeys ---------------------------
 def register_first_available(hotkey_options):
@@ -116,9 +196,9 @@ def get_clipboard_text():
     text = None
     try:
         win32clipboard.OpenClipboard()
-        fmt_text = win32clipboard.IsClipboardFormatAvailable(win32con.CF_TEXT)
         fmt_uni  = win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT)
-        _log.debug("Clipboard formats: CF_TEXT=%s CF_UNICODETEXT=%s", fmt_text, fmt_uni)
+        fmt_text = fmt_uni or win32clipboard.IsClipboardFormatAvailable(win32con.CF_TEXT)
+        _log.debug("Clipboard formats: CF_UNICODETEXT=%s CF_TEXT=%s", fmt_uni, fmt_text)
         if fmt_uni:
             text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
         elif fmt_text:
@@ -133,6 +213,91 @@ def get_clipboard_text():
     _log.debug("Clipboard text length: %s", (len(text) if text else 0))
     return text
 
+CF_TEXT, CF_UNICODETEXT = 1, 13
+
+def clipboard_has_text() -> bool:
+    """Cheap probe (no OpenClipboard): is any text format on the clipboard?"""
+    return bool(user32.IsClipboardFormatAvailable(CF_UNICODETEXT) or user32.IsClipboardFormatAvailable(CF_TEXT))
+
+# --------------------------- Size-guarded clipboard read ---------------------------
+# Raw Win32 (not pywin32) so the size is known before anything is copied into Python:
+# GlobalSize on the clipboard handle, wcsnlen for the real length, then only the head
+# and tail are materialized straight from the locked buffer.
+class ClipText(NamedTuple):
+    text: str            # whole text, or head + omission marker + tail
+    total_chars: int     # length of the full clipboard text
+    truncated: bool
+
+OMISSION_MARKER = "\n\n[… {omitted:,} characters omitted …]\n\n"
+HEAD_SHARE = 2 / 3       # of max_chars kept from the start; the rest from the end
+
+if _WIN32:
+    _open_clipboard = user32.OpenClipboard; _open_clipboard.argtypes = [wintypes.HWND]; _open_clipboard.restype = wintypes.BOOL
+    _close_clipboard = user32.CloseClipboard; _close_clipboard.restype = wintypes.BOOL
+    _get_clipboard_data = user32.GetClipboardData; _get_clipboard_data.argtypes = [wintypes.UINT]; _get_clipboard_data.restype = wintypes.HANDLE
+    _global_size = kernel32.GlobalSize; _global_size.argtypes = [wintypes.HGLOBAL]; _global_size.restype = ctypes.c_size_t
+    _global_lock = kernel32.GlobalLock; _global_lock.argtypes = [wintypes.HGLOBAL]; _global_lock.restype = ctypes.c_void_p
+    _global_unlock = kernel32.GlobalUnlock; _global_unlock.argtypes = [wintypes.HGLOBAL]; _global_unlock.restype = wintypes.BOOL
+    _wcsnlen = ctypes.cdll.msvcrt.wcsnlen; _wcsnlen.argtypes = [ctypes.c_void_p, ctypes.c_size_t]; _wcsnlen.restype = ctypes.c_size_t
+    _strnlen = ctypes.cdll.msvcrt.strnlen; _strnlen.argtypes = [ctypes.c_void_p, ctypes.c_size_t]; _strnlen.restype = ctypes.c_size_t
+
+def _read_ansi(addr: int, size: int) -> str:
+    return ctypes.string_at(addr, size).decode("mbcs", errors="replace")
+
+def _trim_surrogates(head: str, tail: str):
+    # A cut can split a UTF-16 surrogate pair; a lone half cannot be encoded later
+    if head and "\ud800" <= head[-1] <= "\udbff":
+        head = head[:-1]
+    if tail and "\udc00" <= tail[0] <= "\udfff":
+        tail = tail[1:]
+    return head, tail
+
+def _open_clipboard_retry(attempts: int = 5) -> bool:
+    for _ in range(attempts):
+        if _open_clipboard(None):
+            return True
+        time.sleep(0.01)   # another process holds it briefly
+    return False
+
+def read_clipboard_text(max_chars: int) -> Optional[ClipText]:
+    """
+    Clipboard text bounded by max_chars: texts that are longer come back as their head
+    and tail around an omission marker, without materializing the middle.
+    None when there is no text (or the clipboard could not be opened).
+    """
+    if not clipboard_has_text() or not _open_clipboard_retry():
+        return None
+    t0 = time.perf_counter()
+    try:
+        wide = bool(user32.IsClipboardFormatAvailable(CF_UNICODETEXT))
+        h = _get_clipboard_data(CF_UNICODETEXT if wide else CF_TEXT)
+        if not h:
+            return None
+        ptr = _global_lock(h)
+        if not ptr:
+            return None
+        try:
+            unit = 2 if wide else 1
+            n = (_wcsnlen if wide else _strnlen)(ptr, _global_size(h) // unit)
+            read = ctypes.wstring_at if wide else _read_ansi
+            if n <= max_chars:
+                clip = ClipText(read(ptr, n), n, False)
+            else:
+                n_head = int(max_chars * HEAD_SHARE)
+                n_tail = max_chars - n_head
+                head, tail = _trim_surrogates(read(ptr, n_head), read(ptr + (n - n_tail) * unit, n_tail))
+                clip = ClipText(head + OMISSION_MARKER.format(omitted=n - n_head - n_tail) + tail, n, True)
+        finally:
+            _global_unlock(h)
+    except Exception:
+        _log.exception("read_clipboard_text failed")
+        return None
+    finally:
+        _close_clipboard()
+    _log.debug("Clipboard read: %d of %d chars in %.1f ms", len(clip.text), clip.total_chars,
+               (time.perf_counter() - t0) * 1000.0)
+    return clip
+
 def set_clipboard_text(text: str):
     import win32clipboard, win32con
     try:
@@ -147,16 +312,32 @@ def set_clipboard_text(text: str):
         except Exception: pass
 
 # --------------------------- WM_COPY helper ---------------------------
+if _WIN32:
+    _SendMessageTimeoutW = user32.SendMessageTimeoutW
+    _SendMessageTimeoutW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM,
+                                     wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_ulong)]
+
 def send_wm_copy(hwnd_focus) -> bool:
     """Send WM_COPY to the given hwnd (returns True if SendMessageTimeoutW didn't error)."""
-    SendMessageTimeoutW = user32.SendMessageTimeoutW
-    SendMessageTimeoutW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM,
-                                    wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_ulong)]
     res = ctypes.c_ulong(0)
     try:
-        ok = SendMessageTimeoutW(hwnd_focus, WM_COPY, 0, 0, SMTO_ABORTIFHUNG, 300, ctypes.byref(res))
+        ok = _SendMessageTimeoutW(hwnd_focus, WM_COPY, 0, 0, SMTO_ABORTIFHUNG, 300, ctypes.byref(res))
         _log.debug("WM_COPY to hwnd_focus -> ok=%d res=%d", ok, res.value)
         return bool(ok)
     except Exception:
         _log.exception("WM_COPY send failed")
         return False
+
+# --------------------------- Clipboard monitor opt-out ---------------------------
+# Password managers and similar apps tag sensitive clipboard content with these formats
+_MONITOR_OPT_OUT_FORMATS = ("ExcludeClipboardContentFromMonitorProcessing", "Clipboard Viewer Ignore")
+_opt_out_ids = None
+
+def clipboard_excluded_from_monitoring() -> bool:
+    """True if the clipboard owner asked monitors/history tools to ignore the current content."""
+    global _opt_out_ids
+    if _opt_out_ids is None:
+        user32.RegisterClipboardFormatW.argtypes = [wintypes.LPCWSTR]
+        user32.RegisterClipboardFormatW.restype = wintypes.UINT
+        _opt_out_ids = [user32.RegisterClipboardFormatW(name) for name in _MONITOR_OPT_OUT_FORMATS]
+    return any(fid and user32.IsClipboardFormatAvailable(fid) for fid in _opt_out_ids)
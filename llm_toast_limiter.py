@@ -0,0 +1,230 @@
+# llm_toast_limiter.py
+"""
+Adaptive (AIMD) concurrency limit for provider requests, per (api_base, model).
+
+Chat, the explain hotkey, prefetch and batch runs share one provider quota. Rather than a
+fixed worker count, every request takes a permit from the limiter for its endpoint and
+model; requests beyond the current limit wait in line (bounded by their Deadline).
+
+- Additive increase: each request that finishes ok while the limit was in full use raises
+  it by 1/limit (about +1 per limit's worth of requests), up to the configured maximum.
+- Multiplicative decrease: a 429 / 503 / 529 response, a transport timeout, or a latency
+  spike cuts it by DECREASE_FACTOR, at most once per cooldown so a burst of concurrent
+  failures counts once. Latency is only sampled from streamed calls (time to response
+  headers, about the time to first token); a non-streamed call's time covers the whole
+  generation and tracks answer length, so it is not a load signal.
+- Priority: requests made inside a background() block (prefetch, batch runs) wait while
+  an interactive request (hotkey explain, chat) is waiting for a slot.
+- Metrics: stats() / snapshot() give the current limit, in-flight, waiting, queue-delay
+  percentiles and decrease reasons; each call's queue_ms and the limit it saw go into its
+  telemetry record (python -m llm_toast_telemetry shows queue_p90_ms).
+
+settings.json: "adaptive_concurrency" (default true; env CLIPLLM_ADAPTIVE_CONCURRENCY=0
+disables), "concurrency_initial" (4), "concurrency_max" (16).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, Iterator
+
+import llm_toast_settings as settings
+
+__all__ = ["AimdLimiter", "Permit", "for_endpoint", "snapshot", "background", "is_background",
+           "OK", "THROTTLED", "TIMEOUT", "ERROR"]
+
+log = logging.getLogger("clip_llm_tray")
+
+OK = "ok"
+THROTTLED = "throttled"
+TIMEOUT = "timeout"
+ERROR = "error"             # neither a success nor an overload signal: the limit is left alone
+THROTTLE_STATUS = (429, 503, 529)
+
+DEFAULT_INITIAL = 4
+DEFAULT_MIN = 1
+DEFAULT_MAX = 16
+DECREASE_FACTOR = 0.5
+SPIKE_RATIO = 2.5
+SPIKE_MIN_MS = 250.0        # ignore "spikes" that are small in absolute terms
+BASELINE_ALPHA = 0.1
+COOLDOWN_MIN_S = 1.0
+WAIT_SLICE_S = 0.1          # how often a waiting request re-checks its cancel event
+QUEUE_SAMPLES = 256
+
+_local = threading.local()
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Requests made on this thread inside the block yield their turn to interactive ones."""
+    prev = getattr(_local, "background", False)
+    _local.background = True
+    try:
+        yield
+    finally:
+        _local.background = prev
+
+def is_background() -> bool:
+    return getattr(_local, "background", False)
+
+class Permit:
+    """One admitted request; release() exactly once with its outcome."""
+    __slots__ = ("limiter", "queue_ms", "limit", "_saturated", "_released")
+
+    def __init__(self, limiter: "AimdLimiter", queue_ms: float, limit: int, saturated: bool) -> None:
+        self.limiter = limiter
+        self.queue_ms = queue_ms
+        self.limit = limit
+        self._saturated = saturated
+        self._released = False
+
+    def release(self, outcome: str = OK, latency_ms: Optional[float] = None) -> None:
+        if not self._released:
+            self._released = True
+            self.limiter._release(self, outcome, latency_ms)
+
+class AimdLimiter:
+    def __init__(self, name: str, initial: float = DEFAULT_INITIAL, min_limit: int = DEFAULT_MIN,
+                 max_limit: int = DEFAULT_MAX) -> None:
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._waiting_interactive = 0
+        self._baseline_ms: Optional[float] = None
+        self._last_decrease = 0.0
+        self._queue_ms: "deque[float]" = deque(maxlen=QUEUE_SAMPLES)
+        self._counts: Dict[str, int] = {"admitted": 0, "gave_up": 0, "increases": 0, "ok": 0,
+                                        THROTTLED: 0, TIMEOUT: 0, ERROR: 0, "spikes": 0}
+
+    def _cap(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def limit(self) -> int:
+        with self._cond:
+            return self._cap()
+
+    def acquire(self, timeout_s: Optional[float] = None, cancel: Optional[threading.Event] = None,
+                interactive: Optional[bool] = None) -> Optional[Permit]:
+        """
+        Wait for a slot; None if timeout_s passes or cancel is set first. Non-interactive
+        requests (default: inside background()) also wait while an interactive one is waiting.
+        """
+        if interactive is None:
+            interactive = not is_background()
+        t0 = time.monotonic()
+        with self._cond:
+            self._waiting += 1
+            self._waiting_interactive += int(interactive)
+            try:
+                while self._in_flight >= self._cap() or (not interactive and self._waiting_interactive):
+                    left = None if timeout_s is None else timeout_s - (time.monotonic() - t0)
+                    if (left is not None and left <= 0) or (cancel is not None and cancel.is_set()):
+                        self._counts["gave_up"] += 1
+                        return None
+                    self._cond.wait(WAIT_SLICE_S if left is None else min(WAIT_SLICE_S, left))
+            finally:
+                self._waiting -= 1
+                self._waiting_interactive -= int(interactive)
+                if interactive:
+                    self._cond.notify_all()   # background waiters may go now
+            self._in_flight += 1
+            self._counts["admitted"] += 1
+            queue_ms = (time.monotonic() - t0) * 1000.0
+            self._queue_ms.append(queue_ms)
+            cap = self._cap()
+            return Permit(self, round(queue_ms, 1), cap, saturated=self._in_flight >= cap)
+
+    def _release(self, permit: Permit, outcome: str, latency_ms: Optional[float]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._counts[outcome if outcome in self._counts else ERROR] += 1
+            if outcome in (THROTTLED, TIMEOUT):
+                self._decrease(outcome)
+            elif outcome == OK:
+                self._on_ok(latency_ms, permit._saturated)
+            self._cond.notify_all()
+
+    def _spike(self, latency_ms: float) -> bool:
+        base = self._baseline_ms
+        if base is None:
+            self._baseline_ms = latency_ms
+            return False
+        # Clip the sample so one spike does not drag the baseline up; a lasting shift still does
+        self._baseline_ms = base + BASELINE_ALPHA * (min(latency_ms, SPIKE_RATIO * base) - base)
+        return latency_ms > SPIKE_RATIO * base and latency_ms - base > SPIKE_MIN_MS
+
+    def _on_ok(self, latency_ms: Optional[float], saturated: bool) -> None:
+        """latency_ms: time to first token of a streamed call; None when there is no such signal."""
+        if latency_ms is not None and self._spike(latency_ms):
+            self._counts["spikes"] += 1
+            self._decrease("latency")
+        elif saturated and self._limit < self.max_limit:
+            before = self._cap()
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            self._counts["increases"] += 1
+            if self._cap() != before:
+                log.debug("[limiter] %s: limit %d -> %d", self.name, before, self._cap())
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        cooldown = max(COOLDOWN_MIN_S, (self._baseline_ms or 0.0) / 1000.0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        before = self._cap()
+        self._limit = max(float(self.min_limit), self._limit * DECREASE_FACTOR)
+        log.info("[limiter] %s: %s, limit %d -> %d", self.name, reason, before, self._cap())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = sorted(self._queue_ms)
+            out: Dict[str, Any] = dict(self._counts)
+            out.update(limit=self._cap(), in_flight=self._in_flight, waiting=self._waiting,
+                       waiting_interactive=self._waiting_interactive,
+                       baseline_ms=round(self._baseline_ms, 1) if self._baseline_ms is not None else None)
+        out["queue_p50_ms"] = round(waits[len(waits) // 2], 1) if waits else 0.0
+        out["queue_p90_ms"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.9))], 1) if waits else 0.0
+        out["queue_max_ms"] = round(waits[-1], 1) if waits else 0.0
+        return out
+
+# -------------------- per-endpoint registry --------------------
+_limiters: Dict[Tuple[str, str], AimdLimiter] = {}
+_registry_lock = threading.Lock()
+
+def _enabled(cfg: Dict[str, Any]) -> bool:
+    v = cfg.get("adaptive_concurrency")
+    if v is None:
+        v = os.getenv("CLIPLLM_ADAPTIVE_CONCURRENCY", "1")
+    return str(v).strip().lower() not in ("0", "false", "no", "off")
+
+def for_endpoint(api_base: str, model: str) -> Optional[AimdLimiter]:
+    """The limiter for this provider and model, or None when adaptive concurrency is off."""
+    key = (api_base.rstrip("/"), model or "")
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        return limiter
+    cfg = settings.load_settings() or {}
+    if not _enabled(cfg):
+        return None
+    with _registry_lock:
+        if key not in _limiters:
+            initial = cfg.get("concurrency_initial") or os.getenv("CLIPLLM_CONCURRENCY_INITIAL") or DEFAULT_INITIAL
+            maximum = cfg.get("concurrency_max") or os.getenv("CLIPLLM_CONCURRENCY_MAX") or DEFAULT_MAX
+            _limiters[key] = AimdLimiter(f"{key[0]} {key[1]}", initial=float(initial), max_limit=int(maximum))
+        return _limiters[key]
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """stats() of every limiter created so far, keyed "api_base model"."""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {lim.name: lim.stats() for lim in limiters}
@@ -3,16 +3,55 @@
 Thin, resilient LLM client for ClipLLM.
 
 - Reads API key from llm_toast_settings (Credential Manager/DPAPI).
-- Optional config in %APPDATA%\ClipLLM\settings.json (api_base, model, timeout_s).
+- Optional config in %APPDATA%\ClipLLM\settings.json (api_base, model, timeout_s,
+  explain_deadline_s).
 - Public helpers:
-    * explain_selection(text) -> str       # single-sentence explain (system prompt)
-    * chat(user_text, system_prompt=...)   # one-off chat turn
+    * explain(text, on_delta=None) -> Explanation     # text + where it came from ("local" / "cache" / "llm")
+    * explain_selection(text, on_delta=None) -> str  # single-sentence explain; streams via on_delta
+    * chat(user_text, system_prompt=..., web_search=None)   # one-off chat turn;
+                                           # web search gated per turn (llm_toast_search_gate)
+    * prefetch(text, cancel=None) -> (status, tokens)   # speculative explain into the answer cache
+    * answer_offline(text, profile) -> Explanation|None  # the no-request tiers only (batch jobs)
+    * warm_up(cancel=None)                 # pre-resolve config/key and open a pooled connection
+    * resume_background(on_result)         # collect background /responses left over from a restart
+                                           # (or from a chat turn that ran out of time)
 
 Auto-adapts across OpenAI-style providers:
   1) POST /chat/completions with max_completion_tokens
   2) ...with max_output_tokens
   3) ...with legacy max_tokens
   4) POST /responses with max_output_tokens (tries 'text' then 'input_text')
+
+Trivial selections (timestamps, numbers, byte counts, units, HTTP status, errno) are
+answered by llm_toast_local without a request (settings "local_answers": false disables).
+Team jargon found in the user glossary (llm_toast_glossary, settings "glossary_path") is
+answered from it (exact term or unambiguous prefix); otherwise matching glossary entries,
+or the one term a short selection is a likely typo of, are added to the prompt as context
+(settings "glossary_grounding": false disables).
+LLM answers are kept in llm_toast_cache; the same selection again, or a near-duplicate
+(masked numbers/ids/timestamps, different boundaries), reuses the answer (settings
+"semantic_cache": false disables, "cache_similarity" sets the threshold).
+
+Explain calls run under a latency profile (llm_toast_profiles: fast / balanced /
+thorough, or auto by selection length) that sets model, reasoning effort, verbosity,
+token budget and deadline.
+
+Each explain/chat call gets one Deadline (explain: the profile's, or explain_deadline_s
+when configured; chat: timeout_s). Every attempt in the fallback chain draws its connect/read timeouts
+from what is left of it, and the chain stops once it has passed.
+
+Chat turns on /responses can run in background mode (settings "background_responses"
+or CLIPLLM_BACKGROUND_RESPONSES=1): the request returns a response id at once, which is
+polled with growing intervals and persisted in llm_toast_pending until it finishes.
+If the turn's deadline passes first, chat(on_background=...) hands the id back so the
+caller can keep polling it with resume_background(response_ids=[...]) in the same session.
+
+Requests to the provider take a slot from an adaptive (AIMD) concurrency limit per
+(api_base, model) (llm_toast_limiter; settings "adaptive_concurrency": false disables);
+time spent waiting for one is recorded as queue_ms.
+
+Every explain/chat call writes one structured record to llm_toast_telemetry
+(summarize with: python -m llm_toast_telemetry).
 """
 
 from __future__ import annotations
@@ -21,11 +60,18 @@ import os
 import time
 import json
 import logging
-from typing import Optional, Tuple, Any, Dict
-
-import requests  # pip install requests
+import threading
+from typing import Optional, Tuple, Any, Dict, Callable, Iterable, NamedTuple
 
 import llm_toast_settings as settings
+import llm_toast_telemetry as telemetry
+import llm_toast_search_gate as search_gate
+import llm_toast_pending as pending
+import llm_toast_profiles as profiles
+import llm_toast_local as local_eval
+import llm_toast_glossary as glossary
+import llm_toast_cache as answer_cache
+import llm_toast_limiter as limiter
 try:
     import llm_toast_session_log as slog
 except Exception:
@@ -41,7 +87,9 @@ DEFAULT_CHAT_MODEL = "gpt-5-2025-08-07"        # used for chat window
 DEFAULT_CHAT_MODE = DEFAULT_CHAT_MODEL
 
 DEFAULT_API_BASE = "https://api.openai.com/v1"  # override via ettings/env if needed
-DEFAULT_TIMEOUT_S = 360
+DEFAULT_TIMEOUT_S = 360            # chat: total budget per call (all attempts together)
+DEFAULT_EXPLAIN_DEADLINE_S = 20    # explain hotkey: total budget per call
+CONNECT_TIMEOUT_S = 5
 DEFAULT_TEMPERATURE = 1  # <-- per request, keep temperature at 1
 
 # Separate token budgets (can be adjusted later or wired to settings if desired)
@@ -75,65 +123,338 @@ def _load_config() -> Tuple[str, str, str, int]:
               api_base, model, chat_model, timeout)
     return api_base, model, chat_model, timeout
 
+def _explain_deadline_s(default: float = DEFAULT_EXPLAIN_DEADLINE_S) -> float:
+    cfg = settings.load_settings() or {}
+    v = cfg.get("explain_deadline_s") or os.getenv("CLIPLLM_EXPLAIN_DEADLINE_S") or default
+    try:
+        return float(v)
+    except Exception:
+        return float(default)
+
+# -------------------- deadlines --------------------
+class DeadlineExceeded(RuntimeError):
+    """The call's time budget ran out (or it was cancelled) before an answer arrived."""
+
+class Deadline:
+    """
+    Time budget for one logical call, shared by every attempt in the fallback chain.
+    timeouts() turns what is left into a requests (connect, read) timeout.
+    """
+    __slots__ = ("seconds", "expires", "cancel")
+
+    def __init__(self, seconds: float, cancel: Optional[threading.Event] = None) -> None:
+        self.seconds = float(seconds)
+        self.expires = time.monotonic() + self.seconds
+        self.cancel = cancel
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0 or (self.cancel is not None and self.cancel.is_set())
+
+    def check(self, stage: str = "") -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            raise DeadlineExceeded(f"cancelled before {stage or 'request'}")
+        if self.remaining() <= 0.0:
+            raise DeadlineExceeded(f"no answer within {self.seconds:.0f}s (stopped before {stage or 'request'})")
+
+    def timeouts(self, cap_s: Optional[float] = None) -> Tuple[float, float]:
+        left = self.remaining()
+        if cap_s is not None:
+            left = min(left, cap_s)
+        return min(CONNECT_TIMEOUT_S, left), left
+
 # -------------------- public API --------------------
-def explain_selection(text: str) -> str:
-    """Single-sentence explanation of a selection using a fixed system prompt."""
+def warm_up(cancel: Optional[threading.Event] = None, prime_cache: Optional[bool] = None) -> Dict[str, float]:
+    """
+    Pay first-call costs ahead of time: settings parse, API key lookup, requests import,
+    DNS + TCP + TLS to api_base (kept in the shared connection pool) and, optionally,
+    one minimal explain request to prime the provider's prompt cache.
+    Stops between steps once `cancel` is set. Returns per-step timings in ms.
+    """
+    timings: Dict[str, float] = {}
+    t_start = time.perf_counter()
+
+    def step(name, fn):
+        if cancel is not None and cancel.is_set():
+            raise _WarmupCancelled()
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            timings[name] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    try:
+        api_base, model, _chat_model, _timeout = step("config", _load_config)
+        step("glossary", glossary.preload)
+        key = step("key", settings.get_api_key)
+        if not key:
+            log.info("[warmup] no API key configured; skipping network warm-up")
+            return timings
+        try:
+            step("connect", lambda: _http_session().head(api_base, timeout=(5, 10)))
+        except _WarmupCancelled:
+            raise
+        except Exception as e:
+            log.info("[warmup] connect to %s failed: %s", api_base, e)
+        if prime_cache is None:
+            prime_cache = bool((settings.load_settings() or {}).get("warmup_prime_cache"))
+        if prime_cache:
+            trace = telemetry.CallTrace("warmup", api_base, model)
+            try:
+                step("prime", lambda: _request_with_fallbacks(
+                    api_base, key, model, SYSTEM_PROMPT, "warm-up",
+                    Deadline(_explain_deadline_s(), cancel=cancel),
+                    token_budget=16, trace=trace))
+                trace.finish("ok")
+            except _WarmupCancelled:
+                raise
+            except Exception as e:
+                trace.finish("error", e)
+                log.info("[warmup] prime request failed: %s", e)
+    except _WarmupCancelled:
+        log.info("[warmup] cancelled after %s", list(timings))
+        timings["cancelled"] = 1.0
+    timings["total"] = round((time.perf_counter() - t_start) * 1000.0, 1)
+    log.info("[warmup] %s", " ".join(f"{k}={v:.0f}ms" for k, v in timings.items() if k != "cancelled"))
+    return timings
+
+class Explanation(NamedTuple):
+    text: str
+    source: str             # "local" (computed in-process), "glossary", "cache", "prefetch", "llm",
+                            # or "incomplete" (error / cut-off answer; not cached)
+    detail: Optional[str]   # evaluator name / match kind ("exact", "similar 0.82"), or the profile used
+
+def explain(text: str, on_delta: Optional[Callable[[str], None]] = None,
+            deadline_s: Optional[float] = None,
+            cancel: Optional[threading.Event] = None,
+            profile: Optional[str] = None) -> Explanation:
+    """
+    Explain a selection: local evaluators, the glossary and the answer cache first
+    (no request), then the LLM. Arguments as for explain_selection().
+    """
+    cfg = settings.load_settings() or {}
+    prof = profiles.resolve(text, profile)
+    offline = answer_offline(text, prof, cfg)
+    if offline is not None:
+        return _answered_offline(offline, on_delta, prof)
+    cache = answer_cache.default_cache()
+    out, complete, _tokens = _explain_llm(text, on_delta, deadline_s, cancel, prof, _grounded_prompt(text, cfg))
+    if cache is not None and complete:
+        cache.store(text, out, ns=prof.name)
+    return Explanation(out, "llm" if complete else "incomplete", prof.name)
+
+def answer_offline(text: str, prof: profiles.Profile,
+                   cfg: Optional[Dict[str, Any]] = None) -> Optional[Explanation]:
+    """The answer explain() would give without a request (local, glossary, cache), or None."""
+    if cfg is None:
+        cfg = settings.load_settings() or {}
+    if cfg.get("local_answers", True):
+        hit = local_eval.evaluate(text)
+        if hit is not None:
+            return Explanation(hit.text, "local", hit.evaluator)
+    entry = glossary.lookup(text)
+    if entry is not None:
+        return Explanation(f"{entry.term}: {entry.definition}", "glossary", entry.match)
+    cache = answer_cache.default_cache()
+    if cache is not None:
+        reused = cache.lookup(text, ns=prof.name)
+        if reused is not None:
+            detail = "exact" if reused.kind == "exact" else f"similar {reused.similarity:.2f}"
+            return Explanation(reused.answer, "prefetch" if reused.origin == "prefetch" else "cache", detail)
+    return None
+
+def prefetch(text: str, cancel: Optional[threading.Event] = None) -> Tuple[str, int]:
+    """
+    Speculatively explain text into the answer cache (clipboard prefetch, llm_toast_prefetch).
+    Returns (status, tokens spent): "stored", "cached" / "offline" (nothing to fetch),
+    "incomplete" (error, truncated or cancelled via cancel), or "disabled" (no cache).
+    Cache hit statistics are left alone; only the hotkey's lookups count.
+    """
+    cache = answer_cache.default_cache()
+    if cache is None:
+        return "disabled", 0
+    cfg = settings.load_settings() or {}
+    if cfg.get("local_answers", True) and local_eval.evaluate(text) is not None:
+        return "offline", 0
+    if glossary.lookup(text) is not None:
+        return "offline", 0
+    prof = profiles.resolve(text)
+    if cache.lookup(text, ns=prof.name, record=False) is not None:
+        return "cached", 0
+    # Streaming (output discarded) so a cancel stops the read at the next chunk; a hotkey
+    # explain waiting on the concurrency limit goes first
+    with limiter.background():
+        out, complete, tokens = _explain_llm(text, lambda _chunk: None, None, cancel, prof,
+                                             _grounded_prompt(text, cfg), prefetch=True)
+    if not complete:
+        return "incomplete", tokens
+    cache.store(text, out, ns=prof.name, origin="prefetch", tokens=tokens)
+    return "stored", tokens
+
+def _grounded_prompt(text: str, cfg: Dict[str, Any]) -> str:
+    system_prompt = SYSTEM_PROMPT
+    if cfg.get("glossary_grounding", True):
+        context = glossary.grounding(text)
+        if context:
+            system_prompt += "\n\nInternal glossary (use these meanings):\n" + \
+                "\n".join(f"- {e.term}: {e.definition}" for e in context)
+        else:
+            typo = glossary.near(text)
+            if typo is not None:
+                system_prompt += ("\n\nThe selection is one letter away from this internal glossary term; "
+                                  f"use it only if the selection is a typo for it:\n- {typo.term}: {typo.definition}")
+    return system_prompt
+
+def _answered_offline(result: Explanation, on_delta: Optional[Callable[[str], None]],
+                      prof: Optional[profiles.Profile] = None) -> Explanation:
+    # api_base / model stay the configured ones so --by model is not split by answer source;
+    # the source is in endpoint, dialect and "offline"
+    api_base, model, chat_model, _timeout = _load_config()
+    trace = telemetry.CallTrace("explain", api_base, profiles.model_for(prof, model, chat_model))
+    trace.extra["offline"] = result.source
+    if prof is not None:
+        trace.extra["profile"] = prof.name
+    trace.attempt(result.source, f"{result.source}:{str(result.detail).split()[0]}")
+    trace.finish("ok")
+    log.info("Answered without LLM (%s: %s)", result.source, result.detail)
+    if on_delta is not None:
+        on_delta(result.text)
+    return result
+
+def explain_selection(text: str, on_delta: Optional[Callable[[str], None]] = None,
+                      deadline_s: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None,
+                      profile: Optional[str] = None) -> str:
+    """
+    Single-sentence explanation of a selection using a fixed system prompt.
+    With on_delta, the answer is streamed (SSE) and on_delta receives text chunks as they
+    arrive; if streaming is unavailable the full answer is delivered as one chunk.
+    The complete answer is returned either way.
+    profile names a latency profile (default: the one selected in settings, "auto" by length).
+    deadline_s bounds the whole call (default: explain_deadline_s if configured, else the
+    profile's); setting cancel stops it.
+    Trivial selections are answered locally (see explain()).
+    """
+    return explain(text, on_delta, deadline_s, cancel, profile).text
+
+def _explain_llm(text: str, on_delta: Optional[Callable[[str], None]], deadline_s: Optional[float],
+                 cancel: Optional[threading.Event], prof: profiles.Profile,
+                 system_prompt: str = SYSTEM_PROMPT, prefetch: bool = False) -> Tuple[str, bool, int]:
+    """Returns (text, complete, tokens spent); only complete answers are worth caching."""
     key = settings.get_api_key()
     if not key:
         log.info("No API key configured; returning helper message")
-        return f"No API key set. Open Options → paste your LLM API key. (Selection length: {len(text)} chars)"
+        return f"No API key set. Open Options → paste your LLM API key. (Selection length: {len(text)} chars)", False, 0
 
-    api_base, model, _chat_model, timeout = _load_config()
+    api_base, model, chat_model, _timeout = _load_config()
+    model = profiles.model_for(prof, model, chat_model)
+    deadline = Deadline(deadline_s or _explain_deadline_s(default=prof.deadline_s), cancel=cancel)
+    trace = telemetry.CallTrace("explain", api_base, model)
+    trace.extra["profile"] = prof.name
+    if prefetch:
+        trace.extra["prefetch"] = True
     try:
-        return _request_with_fallbacks(
-            api_base, key, model, SYSTEM_PROMPT, text, timeout,
-            token_budget=EXPLAIN_MAX_TOKENS
-        )
+        out = None
+        if on_delta is not None:
+            out = _try_stream_chat_completions(
+                api_base, key, model, system_prompt, text, deadline,
+                token_budget=prof.max_tokens, on_delta=on_delta, trace=trace, profile=prof
+            )
+        if out is None:
+            out = _request_with_fallbacks(
+                api_base, key, model, system_prompt, text, deadline,
+                token_budget=prof.max_tokens, trace=trace, profile=prof
+            )
+            if on_delta is not None:
+                on_delta(out)
+        trace.finish("ok")
+        return out, "truncated" not in trace.extra and out != "(empty response)", _spent(trace)
+    except DeadlineExceeded as e:
+        log.warning("Explain stopped: %s", e)
+        trace.finish("timeout", e)
+        return f"LLM error: {str(e)}", False, _spent(trace)
     except Exception as e:
         log.exception("LLM request failed")
-        return f"LLM error: {str(e)}"
+        trace.finish("error", e)
+        return f"LLM error: {str(e)}", False, _spent(trace)
+
+def _spent(trace: telemetry.CallTrace) -> int:
+    return (trace.tokens.get("prompt_tokens") or 0) + (trace.tokens.get("completion_tokens") or 0)
 
 def chat(user_text: str,
          system_prompt: str = DEFAULT_CHAT_SYSTEM_PROMPT,
          prev_response_id: Optional[str] = None,
-         session: Optional["slog.SessionLogger"] = None) -> tuple[str, Optional[str]]:
-    """One-off chat turn: system + user → single assistant reply."""
+         session: Optional["slog.SessionLogger"] = None,
+         web_search: Optional[bool] = None,
+         deadline_s: Optional[float] = None,
+         on_background: Optional[Callable[[str], None]] = None) -> tuple[str, Optional[str]]:
+    """
+    One-off chat turn: system + user → single assistant reply.
+    web_search=True/False forces the hosted search tool on/off for this turn; by default
+    llm_toast_search_gate decides (a leading /web or /noweb in user_text also overrides).
+    deadline_s bounds the whole turn (default: timeout_s).
+    on_background(response_id) is called when a background response outlives deadline_s;
+    the caller can then collect it with resume_background(response_ids=[response_id]).
+    """
     key = settings.get_api_key()
     if not key:
         log.info("No API key configured; returning helper message")
         return "No API key set. Open Options and paste your LLM API key.", None
     
     api_base, _model, chat_model, timeout = _load_config()
+    deadline = Deadline(deadline_s or timeout)
+    trace = telemetry.CallTrace("chat", api_base, chat_model)
+    gate = search_gate.decide(user_text, override=web_search)
+    user_text = gate.text
     
     try:
-        # Prefer GPT-5 Responses API with hosted web search (no custom tooling needed)
+        # Prefer GPT-5 Responses API; hosted web search only on turns the gate lets through
         if "gpt-5" in (chat_model or ""):
-            return _chat_with_gpt5_websearch(
-                api_base, key, chat_model, system_prompt, user_text, timeout,
+            trace.extra.update(web_search=gate.web_search, gate_reason=gate.reason)
+            log.info("[chat] web_search=%s (%s)", "on" if gate.web_search else "off", gate.reason)
+            out = _chat_with_gpt5_websearch(
+                api_base, key, chat_model, system_prompt, user_text, deadline,
                 token_budget=CHAT_MAX_TOKENS,
                 previous_response_id=prev_response_id,
-                session=session
+                session=session, trace=trace, web_search=gate.web_search
             )
+            trace.finish("ok")
+            return out
         # Otherwise, keep legacy tool-less path (no session id available here)
         text = _request_with_fallbacks(
-            api_base, key, chat_model, system_prompt, user_text, timeout,
+            api_base, key, chat_model, system_prompt, user_text, deadline,
             token_budget=CHAT_MAX_TOKENS,
-            session=session
+            session=session, trace=trace
         )
+        trace.finish("ok")
         return text, None
     except Exception as e:
-        log.exception("LLM chat request failed")
+        if isinstance(e, BackgroundPending) and on_background is not None:
+            log.warning("Chat turn still running in the background: %s", e)
+            trace.finish("timeout", e)
+            on_background(e.response_id)
+            return BG_STILL_RUNNING_TEXT, None
+        if isinstance(e, DeadlineExceeded):
+            log.warning("Chat turn stopped: %s", e)
+            trace.finish("timeout", e)
+        else:
+            log.exception("LLM chat request failed")
+            trace.finish("error", e)
         if session:
             session.log_error(e, context="chat()")
         return f"LLM error: {str(e)}", None
    
     
 def _chat_with_gpt5_websearch(api_base: str, key: str, model: str, system_prompt: str,
-                              user_text: str, timeout_s: int, token_budget: int,
+                              user_text: str, deadline: Deadline, token_budget: int,
                               previous_response_id: Optional[str] = None,
-                              session: Optional["slog.SessionLogger"] = None) -> tuple[str, Optional[str]]:
+                              session: Optional["slog.SessionLogger"] = None,
+                              trace: Optional[telemetry.CallTrace] = None,
+                              web_search: bool = True) -> tuple[str, Optional[str]]:
     """
-    Use GPT-5 Responses API with the hosted 'web_search' tool.
+    Use GPT-5 Responses API, with the hosted 'web_search' tool when web_search is set.
     No external search code required; OpenAI executes the tool server-side.
     """
     headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
@@ -148,25 +469,47 @@ def _chat_with_gpt5_websearch(api_base: str, key: str, model: str, system_prompt
         # Use 'instructions' for system-level guidance and a simple input string
         "instructions": system_prompt,
         "input": user_text,
-        # Enable hosted web search; allow the model to call it automatically
-        "tools": [{"type": "web_search"}],
-        "tool_choice": "auto",
     }
+    if web_search:
+        # Enable hosted web search; allow the model to call it automatically
+        payload["tools"] = [{"type": "web_search"}]
+        payload["tool_choice"] = "auto"
+    dialect = "responses+web_search" if web_search else "responses"
+    background = _background_enabled()
+    if background:
+        # Provider keeps working after we hang up; we poll for the result by id
+        payload["background"] = True
+        payload["store"] = True
+        dialect += ":background"
     
     if previous_response_id:
         payload["previous_response_id"] = previous_response_id
     
-    log.debug("POST %s (gpt5 responses + web_search, budget=%d)", url, token_budget)
+    log.debug("POST %s (gpt5 %s, budget=%d)", url, dialect, token_budget)
     t0 = time.perf_counter()
     if session:
         session.log_request("/responses", {
             "model": model,
             "max_output_tokens": token_budget,
-            "has_web_search": True,
-        }, tool_choice="auto", prev_id=previous_response_id)
+            "has_web_search": web_search,
+        }, tool_choice="auto" if web_search else None, prev_id=previous_response_id)
+    if trace:
+        trace.attempt("/responses", dialect)
     try:
-        data = _post_json(url, headers, payload, timeout_s)
-        _log_token_usage(data, context="responses(gpt5+web_search)", token_budget=token_budget)
+        if background:
+            data = _post_json(url, headers, payload, deadline, cap_s=BG_SUBMIT_TIMEOUT_S, trace=trace)
+            if data.get("status") not in _BG_TERMINAL:
+                rid = data.get("id")
+                pending.add(rid, kind="chat", api_base=api_base, model=model, prompt=user_text[:200])
+                try:
+                    data = _poll_background(api_base, headers, rid, deadline)
+                except DeadlineExceeded as e:
+                    raise BackgroundPending(rid, str(e)) from e
+        else:
+            data = _post_json(url, headers, payload, deadline, trace=trace)
+        _log_token_usage(data, context=f"{dialect}(gpt5)", token_budget=token_budget)
+        if trace:
+            trace.response(data)
 
         # Prefer Responses API extract; fall back to chat-style if provider proxies formats
         text = _extract_text_responses(data) or _extract_text_chat_completions(data)
@@ -192,22 +535,157 @@ def _chat_with_gpt5_websearch(api_base: str, key: str, model: str, system_prompt
         if session:
             session.log_error("responses() failed; falling back to chat/completions")
         text = _request_with_fallbacks(
-            api_base, key, model, system_prompt, user_text, timeout_s,
+            api_base, key, model, system_prompt, user_text, deadline,
             token_budget=token_budget,
-            session=session
+            session=session, trace=trace
         )
         return text, previous_response_id
     except Exception as e:
         raise
 
 
+# -------------------- background responses --------------------
+BG_SUBMIT_TIMEOUT_S = 30     # the submit call only has to return an id
+BG_POLL_START_S = 0.5
+BG_POLL_FACTOR = 1.5
+BG_POLL_MAX_S = 5.0
+BG_RESUME_MAX_S = 30 * 60    # same-session follow-up of a response that outlived its turn
+BG_STILL_RUNNING_TEXT = "(Still running in the background; the reply will be added here when it finishes.)"
+_BG_TERMINAL = ("completed", "failed", "cancelled", "incomplete")
+_resuming = set()            # response ids a resume_background() call is polling right now
+_resuming_lock = threading.Lock()
+
+class BackgroundPending(DeadlineExceeded):
+    """The deadline expired while a background response was still running on the provider."""
+    def __init__(self, response_id: str, message: str) -> None:
+        super().__init__(message)
+        self.response_id = response_id
+
+def _background_enabled() -> bool:
+    cfg = settings.load_settings() or {}
+    v = cfg.get("background_responses")
+    if v is None:
+        v = os.getenv("CLIPLLM_BACKGROUND_RESPONSES", "")
+    return str(v).strip().lower() in ("1", "true", "yes", "on")
+
+def _get_json(url: str, headers: Dict[str, str], timeout) -> Dict[str, Any]:
+    r = _http_session().get(url, headers=headers, timeout=timeout)
+    return _raise_for_status(r)
+
+def _poll_background(api_base: str, headers: Dict[str, str], response_id: str,
+                     deadline: Deadline) -> Dict[str, Any]:
+    """
+    Poll GET /responses/{id} until it reaches a terminal status. Intervals start at
+    BG_POLL_START_S and grow by BG_POLL_FACTOR up to BG_POLL_MAX_S. The pending entry
+    is removed on a terminal status; network errors and an expired deadline leave it
+    for resume_background().
+    """
+    if not response_id:
+        raise RuntimeError("Background response has no id")
+    url = _join(api_base, f"/responses/{response_id}")
+    interval = BG_POLL_START_S
+    polls = 0
+    t0 = time.perf_counter()
+    while True:
+        deadline.check("background poll")
+        data = _get_json(url, headers, deadline.timeouts(cap_s=30))
+        polls += 1
+        status = data.get("status")
+        if status in _BG_TERMINAL or status is None:
+            break
+        if interval >= deadline.remaining():
+            raise DeadlineExceeded(f"background response {response_id} still {status} after {deadline.seconds:.0f}s")
+        if deadline.cancel is not None:
+            deadline.cancel.wait(interval)
+        else:
+            time.sleep(interval)
+        interval = min(interval * BG_POLL_FACTOR, BG_POLL_MAX_S)
+    pending.remove(response_id)
+    log.info("[background] %s %s after %d poll(s), %.1fs", response_id, status or "done",
+             polls, time.perf_counter() - t0)
+    if status in ("failed", "cancelled"):
+        msg = _extract_error_message(data) or status
+        raise RuntimeError(f"Background response {status}: {msg}")
+    return data
+
+def resume_background(on_result: Callable[[Dict[str, Any], str], None],
+                      cancel: Optional[threading.Event] = None,
+                      response_ids: Optional[Iterable[str]] = None,
+                      deadline_s: Optional[float] = None) -> int:
+    """
+    Collect background responses that are still pending: those left over from the last
+    run, or (response_ids) ones whose chat turn ran out of time in this session.
+    on_result(entry, text) is called for each finished one; returns how many were delivered.
+    Each id is polled for deadline_s (default: timeout_s); an id another call is already
+    polling is skipped.
+    """
+    entries = pending.load()
+    if response_ids is not None:
+        wanted = set(response_ids)
+        entries = {rid: e for rid, e in entries.items() if rid in wanted}
+    if not entries:
+        return 0
+    key = settings.get_api_key()
+    if not key:
+        return 0
+    headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+    _api_base, _model, _chat_model, timeout = _load_config()
+    delivered = 0
+    for rid, entry in entries.items():
+        if cancel is not None and cancel.is_set():
+            break
+        with _resuming_lock:
+            if rid in _resuming:
+                continue
+            _resuming.add(rid)
+        try:
+            text = _resume_one(rid, entry, headers, _api_base, _chat_model, deadline_s or timeout, cancel)
+        finally:
+            with _resuming_lock:
+                _resuming.discard(rid)
+        if text is None:
+            if cancel is not None and cancel.is_set():
+                break
+            continue
+        delivered += 1
+        try:
+            on_result(entry, text)
+        except Exception:
+            log.exception("resume_background callback failed")
+    return delivered
+
+def _resume_one(rid: str, entry: Dict[str, Any], headers: Dict[str, str], _api_base: str,
+                _chat_model: str, deadline_s: float, cancel: Optional[threading.Event]) -> Optional[str]:
+    """Poll one pending response; its text, or None if it is not available (yet)."""
+    api_base = entry.get("api_base") or _api_base
+    trace = telemetry.CallTrace(entry.get("kind") or "chat", api_base, entry.get("model") or _chat_model)
+    trace.extra["resumed"] = True
+    trace.attempt("/responses/{id}", "responses:background")
+    try:
+        data = _poll_background(api_base, headers, rid, Deadline(deadline_s, cancel=cancel))
+    except DeadlineExceeded as e:
+        trace.finish("timeout", e)
+        return None
+    except Exception as e:
+        log.warning("Could not resume background response %s: %s", rid, e)
+        trace.finish("error", e)
+        if "HTTP 404" in str(e):
+            pending.remove(rid)  # expired or unknown on the provider side
+        return None
+    trace.response(data)
+    trace.finish("ok")
+    return _extract_text_responses(data) or "(empty response)"
+
 # -------------------- fallback strategy --------------------
 class _RetryableParamError(RuntimeError): ...
 class _RetryableEndpointError(RuntimeError): ...
+class _WarmupCancelled(Exception): ...
 
 def _request_with_fallbacks(api_base: str, key: str, model: str,
-                            system_prompt: str, user_text: str, timeout_s: int,
-                            token_budget: int, session: Optional["slog.SessionLogger"] = None) -> str:
+                            system_prompt: str, user_text: str, deadline: Deadline,
+                            token_budget: int, session: Optional["slog.SessionLogger"] = None,
+                            trace: Optional[telemetry.CallTrace] = None,
+                            profile: Optional[profiles.Profile] = None) -> str:
     headers = {
         "Authorization": f"Bearer {key}",
         "Content-Type": "application/json",
@@ -217,8 +695,9 @@ def _request_with_fallbacks(api_base: str, key: str, model: str,
     # 1) /chat/completions with max_completion_tokens
     try:
         return _chat_completions(api_base, headers, model, system_prompt, user_text,
-                                 timeout_s, token_param="max_completion_tokens",
-                                 token_budget=token_budget, session=session)
+                                 deadline, token_param="max_completion_tokens",
+                                 token_budget=token_budget, session=session, trace=trace,
+                                 profile=profile)
     except _RetryableParamError:
         pass
     except _RetryableEndpointError:
@@ -227,8 +706,9 @@ def _request_with_fallbacks(api_base: str, key: str, model: str,
     # 2) /chat/completions with max_output_tokens
     try:
         return _chat_completions(api_base, headers, model, system_prompt, user_text,
-                                 timeout_s, token_param="max_output_tokens",
-                                 token_budget=token_budget, session=session)
+                                 deadline, token_param="max_output_tokens",
+                                 token_budget=token_budget, session=session, trace=trace,
+                                 profile=profile)
     except _RetryableParamError:
         pass
     except _RetryableEndpointError:
@@ -237,8 +717,9 @@ def _request_with_fallbacks(api_base: str, key: str, model: str,
     # 3) /chat/completions with legacy max_tokens
     try:
         return _chat_completions(api_base, headers, model, system_prompt, user_text,
-                                 timeout_s, token_param="max_tokens",
-                                 token_budget=token_budget, session=session)
+                                 deadline, token_param="max_tokens",
+                                 token_budget=token_budget, session=session, trace=trace,
+                                 profile=profile)
     except _RetryableParamError:
         pass
     except _RetryableEndpointError:
@@ -246,14 +727,121 @@ def _request_with_fallbacks(api_base: str, key: str, model: str,
 
     # 4) /responses with max_output_tokens
     return _responses(api_base, headers, model, system_prompt, user_text,
-                      timeout_s, token_param="max_output_tokens",
-                      token_budget=token_budget, session=session)
+                      deadline, token_param="max_output_tokens",
+                      token_budget=token_budget, session=session, trace=trace,
+                      profile=profile)
 
 # -------------------- HTTP variants --------------------
+def _cut_stream(parts: list, on_delta: Callable[[str], None],
+                trace: Optional[telemetry.CallTrace]) -> None:
+    """Keep what already reached the user rather than failing the call; marks it incomplete."""
+    log.info("Stream cut at deadline after %d chunk(s)", len(parts))
+    if trace:
+        trace.extra["truncated"] = "deadline"
+    parts.append(" …")
+    on_delta(" …")
+
+def _try_stream_chat_completions(api_base: str, key: str, model: str,
+                                 system_prompt: str, user_text: str, deadline: Deadline,
+                                 token_budget: int, on_delta: Callable[[str], None],
+                                 trace: Optional[telemetry.CallTrace] = None,
+                                 profile: Optional[profiles.Profile] = None) -> Optional[str]:
+    """
+    Streamed /chat/completions (SSE). Returns the full text, or None if the provider
+    rejected the streaming request before any text arrived (caller falls back).
+    A throttle status (429 / 503 / 529) raises instead: the non-streaming fallbacks
+    would only hit the same limit again at once.
+    """
+    url = _join(api_base, "/chat/completions")
+    headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+    payload = {
+        "model": model,
+        "temperature": DEFAULT_TEMPERATURE,
+        "max_completion_tokens": token_budget,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_text}
+        ],
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    payload.update(profiles.chat_params(model, profile))
+    log.debug("POST %s (stream, model=%s, budget=%d, text_len=%d)", url, model, token_budget, len(user_text))
+    if trace:
+        trace.attempt("/chat/completions", "chat:stream")
+    t0 = time.perf_counter()
+    parts = []
+    final: Dict[str, Any] = {}
+    permit = None
+    outcome, latency_ms = limiter.ERROR, None
+    try:
+        deadline.check("/chat/completions (stream)")
+        permit = _admit(url, payload, deadline, trace)
+        try:
+            r = _http_session().post(url, headers=headers, data=json.dumps(payload),
+                                     timeout=deadline.timeouts(), stream=True)
+        except Exception as e:
+            outcome = _failure_outcome(e)
+            raise
+        outcome, latency_ms = _response_outcome(r, streamed=True)
+        with r:
+            if r.status_code >= 400:
+                _raise_for_status(r)
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                body = line[5:].strip()
+                if body == "[DONE]":
+                    break
+                if deadline.expired():
+                    if not parts:
+                        deadline.check("first token")
+                    _cut_stream(parts, on_delta, trace)
+                    break
+                try:
+                    chunk = json.loads(body)
+                except ValueError:
+                    continue
+                final["id"] = chunk.get("id") or final.get("id")
+                if chunk.get("usage"):
+                    final["usage"] = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    if choice.get("finish_reason"):
+                        final["choices"] = [{"finish_reason": choice["finish_reason"]}]
+                    delta = (choice.get("delta") or {}).get("content")
+                    if isinstance(delta, str) and delta:
+                        if not parts and trace:
+                            trace.extra["ttft_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+                        parts.append(delta)
+                        on_delta(delta)
+    except RuntimeError as e:
+        if parts or outcome == limiter.THROTTLED or isinstance(e, DeadlineExceeded):
+            raise
+        log.debug("Streaming unavailable (%s); using non-streaming fallbacks", e)
+        return None
+    except Exception as e:
+        if not deadline.expired():
+            raise
+        if not parts:
+            raise _deadline_error(deadline, e) from e
+        # Read timed out at the deadline mid-stream: same as the in-loop cut above
+        _cut_stream(parts, on_delta, trace)
+    finally:
+        if permit is not None:
+            permit.release(outcome, latency_ms)
+
+    _log_token_usage(final, context="chat_completions(stream)", token_budget=token_budget)
+    if trace:
+        trace.response(final)
+    text = "".join(parts).strip()
+    return text or "(empty response)"
+
 def _chat_completions(api_base: str, headers: Dict[str, str], model: str,
-                      system_prompt: str, user_text: str, timeout_s: int,
+                      system_prompt: str, user_text: str, deadline: Deadline,
                       token_param: str, token_budget: int,
-                      session: Optional["slog.SessionLogger"] = None) -> str:
+                      session: Optional["slog.SessionLogger"] = None,
+                      trace: Optional[telemetry.CallTrace] = None,
+                      profile: Optional[profiles.Profile] = None) -> str:
     url = _join(api_base, "/chat/completions")
     payload = {
         "model": model,
@@ -264,13 +852,18 @@ def _chat_completions(api_base: str, headers: Dict[str, str], model: str,
             {"role": "user", "content": user_text}
         ]
     }
+    payload.update(profiles.chat_params(model, profile))
     log.debug("POST %s (model=%s, %s=%d, text_len=%d)", url, model, token_param, token_budget, len(user_text))
     t0 = time.perf_counter()
     if session:
         session.log_request("/chat/completions", {"model": model, token_param: token_budget})
-    data = _post_json(url, headers, payload, timeout_s)
+    if trace:
+        trace.attempt("/chat/completions", f"chat:{token_param}")
+    data = _post_json(url, headers, payload, deadline, trace=trace)
 
     _log_token_usage(data, context=f"chat_completions({token_param})", token_budget=token_budget)
+    if trace:
+        trace.response(data)
 
     _raise_if_param_unsupported(data, token_param)
     _raise_if_endpoint_unsupported(data)
@@ -287,9 +880,11 @@ def _chat_completions(api_base: str, headers: Dict[str, str], model: str,
     return text
 
 def _responses(api_base: str, headers: Dict[str, str], model: str,
-               system_prompt: str, user_text: str, timeout_s: int,
+               system_prompt: str, user_text: str, deadline: Deadline,
                token_param: str, token_budget: int,
-               session: Optional["slog.SessionLogger"] = None) -> str:
+               session: Optional["slog.SessionLogger"] = None,
+               trace: Optional[telemetry.CallTrace] = None,
+               profile: Optional[profiles.Profile] = None) -> str:
     """
     Try /responses with two content type flavors:
       - 'text' (classic)
@@ -298,7 +893,7 @@ def _responses(api_base: str, headers: Dict[str, str], model: str,
     url = _join(api_base, "/responses")
 
     def build_payload(content_type: str) -> Dict[str, Any]:
-        return {
+        payload = {
             "model": model,
             "temperature": DEFAULT_TEMPERATURE,
             token_param: token_budget,  # typically 'max_output_tokens'
@@ -307,6 +902,8 @@ def _responses(api_base: str, headers: Dict[str, str], model: str,
                 {"role": "user",   "content": [{"type": content_type, "text": user_text}]},
             ]
         }
+        payload.update(profiles.responses_params(model, profile))
+        return payload
 
     last_err = None
     for ctype in ("text", "input_text"):
@@ -317,8 +914,12 @@ def _responses(api_base: str, headers: Dict[str, str], model: str,
             t0 = time.perf_counter()
             if session:
                 session.log_request("/responses", {"model": model, token_param: token_budget, "ctype": ctype})
-            data = _post_json(url, headers, payload, timeout_s)
+            if trace:
+                trace.attempt("/responses", f"responses:{ctype}")
+            data = _post_json(url, headers, payload, deadline, trace=trace)
             _log_token_usage(data, context=f"chat_completions({token_param})", token_budget=token_budget)
+            if trace:
+                trace.response(data)
 
         except RuntimeError as e:
             last_err = e
@@ -356,8 +957,27 @@ def _responses(api_base: str, headers: Dict[str, str], model: str,
     raise RuntimeError("Unknown /responses error")
 
 # -------------------- HTTP helpers --------------------
+_http_lock = threading.Lock()
+_http = None
+
+def _http_session():
+    """Process-wide requests.Session so calls reuse pooled keep-alive connections."""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                import requests  # pip install requests; imported on first use to keep cold start lean
+                from requests.adapters import HTTPAdapter
+                sess = requests.Session()
+                sess.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+                sess.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+                _http = sess
+    return _http
+
 def _log_token_usage(data: Dict[str, Any], context: str, token_budget: Optional[int] = None) -> None:
     """Debug-log token usage and finish reason if present."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
     try:
         usage = data.get("usage")
         choice0 = (data.get("choices") or [{}])[0]
@@ -375,8 +995,68 @@ def _log_token_usage(data: Dict[str, Any], context: str, token_budget: Optional[
         # Never fail the request because of logging
         pass
 
-def _post_json(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout_s: int) -> Dict[str, Any]:
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout_s)
+def _post_json(url: str, headers: Dict[str, str], payload: Dict[str, Any],
+               deadline: Deadline, cap_s: Optional[float] = None,
+               trace: Optional[telemetry.CallTrace] = None) -> Dict[str, Any]:
+    deadline.check(url)
+    permit = _admit(url, payload, deadline, trace)
+    outcome, latency_ms = limiter.ERROR, None
+    try:
+        r = _http_session().post(url, headers=headers, data=json.dumps(payload),
+                                 timeout=deadline.timeouts(cap_s))
+        outcome, latency_ms = _response_outcome(r)
+    except Exception as e:
+        outcome = _failure_outcome(e)
+        if deadline.expired():
+            raise _deadline_error(deadline, e) from e
+        raise
+    finally:
+        if permit is not None:
+            permit.release(outcome, latency_ms)
+    return _raise_for_status(r)
+
+# -------------------- adaptive concurrency --------------------
+_ENDPOINT_PATHS = ("/chat/completions", "/responses")
+
+def _admit(url: str, payload: Dict[str, Any], deadline: Deadline,
+           trace: Optional[telemetry.CallTrace]) -> Optional[limiter.Permit]:
+    """Wait (within the deadline) for a slot under the (api_base, model) limit; None when disabled."""
+    api_base = next((url[:-len(p)] for p in _ENDPOINT_PATHS if url.endswith(p)), url)
+    lim = limiter.for_endpoint(api_base, payload.get("model") or "")
+    if lim is None:
+        return None
+    permit = lim.acquire(deadline.remaining(), deadline.cancel)
+    if permit is None:
+        deadline.check(f"{url} (queued behind the concurrency limit)")
+        raise DeadlineExceeded(f"no answer within {deadline.seconds:.0f}s (queued behind the concurrency limit)")
+    if trace:
+        trace.extra["queue_ms"] = round(trace.extra.get("queue_ms", 0.0) + permit.queue_ms, 1)
+        trace.extra["concurrency_limit"] = permit.limit
+    if permit.queue_ms >= 1.0:
+        log.debug("[limiter] waited %.0f ms for a slot (limit %d)", permit.queue_ms, permit.limit)
+    return permit
+
+def _response_outcome(r, streamed: bool = False) -> Tuple[str, Optional[float]]:
+    """
+    Limiter outcome and latency signal for an HTTP response. Only a streamed response's
+    time to headers (about the time to first token) is a load signal; a non-streamed one
+    arrives after the whole answer is generated, so its time tracks answer length.
+    """
+    if r.status_code in limiter.THROTTLE_STATUS:
+        return limiter.THROTTLED, None
+    if r.status_code >= 400:
+        return limiter.ERROR, None
+    return limiter.OK, (r.elapsed.total_seconds() * 1000.0 if streamed else None)
+
+def _failure_outcome(e: BaseException) -> str:
+    return limiter.TIMEOUT if "Timeout" in type(e).__name__ else limiter.ERROR
+
+def _deadline_error(deadline: Deadline, cause: BaseException) -> DeadlineExceeded:
+    """A transport timeout that hit the call's deadline, reported as such."""
+    return DeadlineExceeded(f"no answer within {deadline.seconds:.0f}s ({type(cause).__name__})")
+
+def _raise_for_status(r) -> Dict[str, Any]:
+    """Parse a response body; map HTTP errors onto the fallback exception types."""
     try:
         data = r.json()
     except Exception:
@@ -0,0 +1,234 @@
+# llm_toast_local.py
+"""
+Local fast path for trivial selections: answers computed in-process, no LLM call.
+
+- Evaluators run in registration order; each has a precompiled matcher and returns an
+  answer string or None (fall through). The first answer wins.
+- Built in: Unix timestamps, HTTP status codes (with an HTTP / status prefix or the
+  reason phrase; a bare "200" is a number), errno names/numbers, byte counts,
+  unit quantities (length, mass, temperature, speed), hex/binary/decimal integers.
+- Unit symbols are case-sensitive and the ambiguous one-letter ones (C, F, K, m, g, t)
+  need a space or a degree sign: "4K", "5G", "100m" go to the LLM. Hex needs a 0x
+  prefix (commit ids, "f1" are not numbers) and bare decimals need 5+ digits ("2024").
+- register(name, pattern, fn) adds an evaluator; fn(match, text) -> Optional[str].
+- Per-evaluator attempts, hits and time are counted (stats()).
+
+Only short selections are considered (MAX_CHARS); anything else goes to the LLM.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+import logging
+import threading
+from typing import Callable, Optional, List, Dict, Any, NamedTuple, Pattern
+
+__all__ = ["LocalAnswer", "evaluate", "register", "stats"]
+
+log = logging.getLogger("clip_llm_tray")
+
+MAX_CHARS = 64
+
+class LocalAnswer(NamedTuple):
+    text: str
+    evaluator: str
+    elapsed_us: float
+
+class _Evaluator:
+    __slots__ = ("name", "pattern", "fn", "attempts", "hits", "total_us")
+
+    def __init__(self, name: str, pattern: Pattern, fn: Callable[[re.Match, str], Optional[str]]) -> None:
+        self.name = name
+        self.pattern = pattern
+        self.fn = fn
+        self.attempts = 0
+        self.hits = 0
+        self.total_us = 0.0
+
+_evaluators: List[_Evaluator] = []
+_lock = threading.Lock()
+_calls = 0
+
+def register(name: str, pattern: str, fn: Callable[[re.Match, str], Optional[str]], flags: int = re.IGNORECASE) -> None:
+    """Add an evaluator; pattern is matched (fullmatch) against the stripped selection."""
+    _evaluators.append(_Evaluator(name, re.compile(pattern, flags), fn))
+
+def evaluate(text: str) -> Optional[LocalAnswer]:
+    """Answer text locally, or return None so the caller asks the LLM."""
+    global _calls
+    s = (text or "").strip()
+    if not s or len(s) > MAX_CHARS:
+        return None
+    with _lock:
+        _calls += 1
+    for ev in _evaluators:
+        m = ev.pattern.fullmatch(s)
+        if not m:
+            continue
+        t0 = time.perf_counter()
+        try:
+            answer = ev.fn(m, s)
+        except Exception:
+            log.exception("Local evaluator %s failed", ev.name)
+            answer = None
+        us = (time.perf_counter() - t0) * 1e6
+        with _lock:
+            ev.attempts += 1
+            ev.total_us += us
+            if answer:
+                ev.hits += 1
+        if answer:
+            return LocalAnswer(answer, ev.name, us)
+    return None
+
+def stats() -> Dict[str, Any]:
+    """Per-evaluator attempts/hits and hit rate over all short selections seen."""
+    with _lock:
+        out = {"selections": _calls, "evaluators": {}}
+        for ev in _evaluators:
+            out["evaluators"][ev.name] = {
+                "attempts": ev.attempts, "hits": ev.hits,
+                "hit_rate": (ev.hits / _calls) if _calls else 0.0,
+                "avg_us": (ev.total_us / ev.attempts) if ev.attempts else 0.0,
+            }
+        return out
+
+# -------------------- built-in evaluators --------------------
+
+def _fmt_num(v: float) -> str:
+    if v == int(v) and abs(v) < 1e18:
+        return f"{int(v):,}"
+    return f"{v:,.0f}" if abs(v) >= 1000 else f"{v:.4g}"
+
+def _unix_ts(m: re.Match, _s: str) -> Optional[str]:
+    raw = m.group(0)
+    secs = int(raw) / (1000.0 if len(raw) == 13 else 1.0)
+    if not (315532800 <= secs <= 4102444800):   # 1980 .. 2100: otherwise probably just a number
+        return None
+    utc = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(secs))
+    local = time.strftime("%Y-%m-%d %H:%M:%S %Z", time.localtime(secs))
+    unit = "milliseconds" if len(raw) == 13 else "seconds"
+    return f"Unix timestamp ({unit}): {utc} ({local} local)."
+
+def _http_status(m: re.Match, _s: str) -> Optional[str]:
+    from http import HTTPStatus
+    try:
+        st = HTTPStatus(int(m.group(2)))
+    except ValueError:
+        return None
+    # A bare "200" is just a number: only answer with an HTTP / status prefix or the reason phrase
+    phrase = (m.group(3) or "").strip()
+    if not m.group(1) and phrase.lower() != st.phrase.lower():
+        return None
+    return f"HTTP {st.value} {st.phrase}: {st.description}."
+
+def _errno(m: re.Match, _s: str) -> Optional[str]:
+    import os, errno
+    token = m.group(1) or m.group(2)
+    if token.isdigit():
+        code = int(token)
+        name = errno.errorcode.get(code)
+        if not name:
+            return None
+    else:
+        name = token.upper()
+        code = getattr(errno, name, None)
+        if not isinstance(code, int):
+            return None
+    return f"{name} (errno {code}): {os.strerror(code)}."
+
+_BYTE_UNITS = {
+    "b": 1, "byte": 1, "bytes": 1,
+    "kb": 1000, "mb": 1000**2, "gb": 1000**3, "tb": 1000**4, "pb": 1000**5,
+    "kib": 1024, "mib": 1024**2, "gib": 1024**3, "tib": 1024**4, "pib": 1024**5,
+}
+
+def _human_bytes(n: float) -> str:
+    si, iec = n, n
+    si_u = iec_u = "B"
+    for u in ("kB", "MB", "GB", "TB", "PB"):
+        if si < 1000:
+            break
+        si /= 1000.0
+        si_u = u
+    for u in ("KiB", "MiB", "GiB", "TiB", "PiB"):
+        if iec < 1024:
+            break
+        iec /= 1024.0
+        iec_u = u
+    return f"{si:.4g} {si_u} = {iec:.4g} {iec_u}"
+
+def _bytes(m: re.Match, _s: str) -> Optional[str]:
+    n = float(m.group(1).replace(",", "")) * _BYTE_UNITS[m.group(2).lower()]
+    return f"{_fmt_num(n)} bytes ({_human_bytes(n)})."
+
+# unit -> (dimension, factor to base unit) ; temperature handled separately
+_UNITS = {
+    "mm": ("length", 0.001), "cm": ("length", 0.01), "m": ("length", 1.0), "km": ("length", 1000.0),
+    "in": ("length", 0.0254), "ft": ("length", 0.3048), "yd": ("length", 0.9144), "mi": ("length", 1609.344),
+    "mg": ("mass", 1e-6), "g": ("mass", 0.001), "kg": ("mass", 1.0), "t": ("mass", 1000.0),
+    "oz": ("mass", 0.028349523125), "lb": ("mass", 0.45359237), "lbs": ("mass", 0.45359237),
+    "km/h": ("speed", 1 / 3.6), "kph": ("speed", 1 / 3.6), "mph": ("speed", 0.44704), "m/s": ("speed", 1.0),
+    "kn": ("speed", 0.514444),
+}
+_TARGETS = {
+    "length": {"metric": ("m", "km", "cm"), "imperial": ("ft", "mi", "in")},
+    "mass": {"metric": ("kg", "g"), "imperial": ("lb", "oz")},
+    "speed": {"metric": ("km/h", "m/s"), "imperial": ("mph", "kn")},
+}
+_IMPERIAL = {"in", "ft", "yd", "mi", "oz", "lb", "lbs", "mph", "kn"}
+
+def _units(m: re.Match, _s: str) -> Optional[str]:
+    value = float(m.group(1).replace(",", ""))
+    sym = m.group(2) or m.group(3)
+    unit = sym.lower().replace("°", "")
+    if unit in ("c", "f", "k"):
+        if unit == "c":
+            c = value
+        elif unit == "f":
+            c = (value - 32) * 5 / 9
+        else:
+            c = value - 273.15
+        scale = "K" if unit == "k" else "°" + unit.upper()   # kelvin takes no degree sign
+        return f"{value:g} {scale} = {c:.1f} °C = {c * 9 / 5 + 32:.1f} °F = {c + 273.15:.1f} K."
+    dim, factor = _UNITS[unit]
+    base = value * factor
+    side = "metric" if unit in _IMPERIAL else "imperial"
+    parts = []
+    for target in _TARGETS[dim][side]:
+        v = base / _UNITS[target][1]
+        if 0.1 <= abs(v) < 1e6 or not parts:
+            parts.append(f"{_fmt_num(v)} {target}")
+    return f"{value:g} {sym} = " + " = ".join(parts) + "."
+
+def _integer(m: re.Match, s: str) -> Optional[str]:
+    t = s.replace("_", "").lower()
+    if t.startswith(("0x", "-0x")):
+        n, src = int(t, 16), "hex"
+    elif t.startswith(("0b", "-0b")):
+        n, src = int(t, 2), "binary"
+    elif t.startswith(("0o", "-0o")):
+        n, src = int(t, 8), "octal"
+    else:
+        t = t.replace(",", "")
+        if len(t.lstrip("-")) < 5:
+            return None  # a year, a count, a version: not worth a conversion
+        n, src = int(t), "decimal"
+    parts = [f"{n:,} decimal"] if src != "decimal" else []
+    if src != "hex":
+        parts.append(f"{hex(n)} hex")
+    if abs(n) < 1 << 32:
+        parts.append(f"{bin(n)} binary")
+    if not parts:
+        return None
+    return f"{s} ({src}) = " + " = ".join(parts) + "."
+
+register("unix_timestamp", r"\d{10}|\d{13}", _unix_ts)
+register("http_status", r"((?:HTTP(?:/\d(?:\.\d)?)?\s*)?status(?:\s+code)?\s*[:=]?\s*|HTTP(?:/\d(?:\.\d)?)?\s*)?"
+                        r"([1-5]\d\d)(\s+[A-Za-z][A-Za-z '-]+)?", _http_status)
+register("errno", r"[Ee]rrno\s*[:=]?\s*(\d{1,3})|(?:[Ee]rrno\s*[:=]?\s*)?(E[A-Z][A-Z0-9]+)", _errno, flags=0)
+register("bytes", r"(\d[\d,]*(?:\.\d+)?)\s*(bytes?|[kmgtp]i?b|b)", _bytes)
+register("units", r"(-?\d[\d,]*(?:\.\d+)?)(?:\s*(°[CFK]|km/h|kph|mph|m/s|kn|mm|cm|km|mi|in|ft|yd|mg|kg|oz|lbs?)"
+                 r"|\s+([CFK]|m|g|t))", _units, flags=0)
+register("integer", r"-?0x[0-9a-f_]+|-?0b[01_]+|-?0o[0-7_]+|-?\d{1,3}(?:,\d{3})+|-?\d+", _integer)
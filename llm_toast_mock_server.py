@@ -0,0 +1,324 @@
+"""
+llm_toast_mock_server.py
+Local stand-in for an OpenAI-style provider, for exercising the client without a key
+or network access.
+
+Endpoints (under /v1):
+  POST /chat/completions          echo reply; SSE when "stream": true
+  POST /responses                 echo reply; with "background": true returns a queued
+                                  response that completes after --bg-delay seconds
+  GET  /responses/{id}            status of a background response
+  POST /files                     multipart upload (purpose "batch")
+  GET  /files/{id}/content        file bytes (batch input, output and error files)
+  POST /batches                   batch job over an uploaded /chat/completions JSONL file;
+                                  validating -> in_progress -> finalizing -> completed
+                                  over --batch-delay seconds
+  GET  /batches/{id}              job status, request_counts, output/error file ids
+  POST /batches/{id}/cancel       cancel a job that has not completed
+  HEAD *                          200 (connection warm-up)
+
+With --max-concurrency N, /chat/completions and /responses answer 429 while N requests
+are already in progress (exercises the client's adaptive concurrency limit).
+
+Usage:
+  python llm_toast_mock_server.py [--port 8765] [--bg-delay 3] [--latency 0.2] [--batch-delay 5] [--max-concurrency 0]
+  set CLIPLLM_API_BASE=http://127.0.0.1:8765/v1
+"""
+
+import sys, json, time, uuid, argparse, threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --------------------------- state ---------------------------
+class MockState:
+    def __init__(self, bg_delay_s: float = 3.0, latency_s: float = 0.2, batch_delay_s: float = 5.0,
+                 max_concurrency: int = 0, chunk_delay_s: float = 0.03):
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.throttled = 0
+        self.bg_delay_s = bg_delay_s
+        self.latency_s = latency_s
+        self.chunk_delay_s = chunk_delay_s   # gap between SSE chunks
+        self.batch_delay_s = batch_delay_s
+        self.lock = threading.Lock()
+        self.responses = {}   # id -> {"ready_at": float, "body": dict}
+        self.files = {}       # id -> {"bytes": bytes, "purpose": str, "filename": str}
+        self.batches = {}     # id -> batch object (+ "_ready_at")
+
+    def reply_text(self, text: str) -> str:
+        text = " ".join((text or "").split())
+        return f"[mock] {text[:120]}" if text else "[mock] (empty input)"
+
+def _usage(prompt: str, reply: str) -> dict:
+    pt, ct = max(1, len(prompt) // 4), max(1, len(reply) // 4)
+    return {"prompt_tokens": pt, "completion_tokens": ct, "total_tokens": pt + ct,
+            "input_tokens": pt, "output_tokens": ct}
+
+def _response_body(rid: str, model: str, reply: str, usage: dict, status: str = "completed") -> dict:
+    body = {"id": rid, "object": "response", "model": model, "status": status}
+    if status == "completed":
+        body["output"] = [{"type": "message", "role": "assistant",
+                           "content": [{"type": "output_text", "text": reply}]}]
+        body["output_text"] = reply
+        body["usage"] = usage
+    return body
+
+def _chat_completion(model: str, prompt: str, reply: str) -> dict:
+    return {"id": "chatcmpl-" + uuid.uuid4().hex[:12], "object": "chat.completion", "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                         "finish_reason": "stop"}],
+            "usage": _usage(prompt, reply)}
+
+def _run_batch(state: MockState, batch: dict) -> None:
+    """Answer every line of the input file; fills output/error files. Called with state.lock held."""
+    out, err = [], []
+    raw = state.files.get(batch["input_file_id"], {}).get("bytes", b"")
+    for line in raw.decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+            body = req["body"]
+            prompt = (body.get("messages") or [{}])[-1].get("content") or ""
+        except (ValueError, KeyError, TypeError, AttributeError):
+            err.append({"id": "batch_req_" + uuid.uuid4().hex[:12], "custom_id": None, "response": None,
+                        "error": {"code": "invalid_request", "message": "Malformed request line"}})
+            continue
+        rid = "batch_req_" + uuid.uuid4().hex[:12]
+        if not prompt.strip():
+            err.append({"id": rid, "custom_id": req.get("custom_id"), "response": None,
+                        "error": {"code": "invalid_request", "message": "Empty prompt"}})
+            continue
+        reply = state.reply_text(prompt)
+        out.append({"id": rid, "custom_id": req.get("custom_id"), "error": None,
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                 "body": _chat_completion(body.get("model") or "mock", prompt, reply)}})
+    for key, rows in (("output_file_id", out), ("error_file_id", err)):
+        if rows:
+            fid = "file-" + uuid.uuid4().hex[:24]
+            data = "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+            state.files[fid] = {"bytes": data, "purpose": "batch_output", "filename": fid + ".jsonl"}
+            batch[key] = fid
+    batch["request_counts"] = {"total": len(out) + len(err), "completed": len(out), "failed": len(err)}
+
+# --------------------------- handler ---------------------------
+class Handler(BaseHTTPRequestHandler):
+    state: MockState = None  # set by serve()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write("[mock] " + (fmt % args) + "\n")
+
+    def _send_json(self, code: int, obj: dict):
+        raw = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            return {}
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.startswith("/v1/responses/"):
+            rid = path.rsplit("/", 1)[-1]
+            with self.state.lock:
+                job = self.state.responses.get(rid)
+            if job is None:
+                return self._send_json(404, {"error": {"message": f"No response with id {rid}"}})
+            if time.time() < job["ready_at"]:
+                status = "queued" if time.time() < job["ready_at"] - self.state.bg_delay_s / 2 else "in_progress"
+                return self._send_json(200, {"id": rid, "object": "response", "status": status})
+            return self._send_json(200, job["body"])
+        if path.startswith("/v1/files/") and path.endswith("/content"):
+            fid = path.split("/")[3]
+            with self.state.lock:
+                f = self.state.files.get(fid)
+            if f is None:
+                return self._send_json(404, {"error": {"message": f"No file with id {fid}"}})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(f["bytes"])))
+            self.end_headers()
+            self.wfile.write(f["bytes"])
+            return
+        if path.startswith("/v1/batches/"):
+            return self._batch_status(path.rsplit("/", 1)[-1])
+        self._send_json(404, {"error": {"message": f"Unknown path {path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/v1/files":
+            return self._upload()
+        req = self._read_json()
+        if path == "/v1/batches":
+            return self._create_batch(req)
+        if path.startswith("/v1/batches/") and path.endswith("/cancel"):
+            return self._cancel_batch(path.split("/")[3])
+        if path not in ("/v1/chat/completions", "/v1/responses"):
+            return self._send_json(404, {"error": {"message": f"Unknown path {path}"}})
+        with self.state.lock:
+            busy = 0 < self.state.max_concurrency <= self.state.active
+            if busy:
+                self.state.throttled += 1
+            else:
+                self.state.active += 1
+        if busy:
+            return self._send_json(429, {"error": {"message": "Rate limit reached: too many concurrent requests",
+                                                   "type": "rate_limit_error"}})
+        try:
+            time.sleep(self.state.latency_s)
+            if path == "/v1/chat/completions":
+                return self._chat(req)
+            return self._responses(req)
+        finally:
+            with self.state.lock:
+                self.state.active -= 1
+
+    def _chat(self, req: dict):
+        prompt = ((req.get("messages") or [{}])[-1] or {}).get("content") or ""
+        reply = self.state.reply_text(prompt)
+        model = req.get("model") or "mock"
+        if not req.get("stream"):
+            return self._send_json(200, _chat_completion(model, prompt, reply))
+        cid = "chatcmpl-" + uuid.uuid4().hex[:12]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")   # as the real API: clients see each event on arrival
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(data: str):
+            raw = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+            self.wfile.flush()
+
+        words = reply.split(" ")
+        for i, w in enumerate(words):
+            delta = w if i == 0 else " " + w
+            event(json.dumps({"id": cid, "choices": [{"index": 0, "delta": {"content": delta},
+                                                      "finish_reason": None}]}))
+            time.sleep(self.state.chunk_delay_s)
+        event(json.dumps({"id": cid, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        event(json.dumps({"id": cid, "choices": [], "usage": _usage(prompt, reply)}))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _responses(self, req: dict):
+        prompt = req.get("input") if isinstance(req.get("input"), str) else json.dumps(req.get("input"))
+        reply = self.state.reply_text(prompt)
+        model = req.get("model") or "mock"
+        rid = "resp_" + uuid.uuid4().hex[:16]
+        body = _response_body(rid, model, reply, _usage(prompt or "", reply))
+        if req.get("background"):
+            with self.state.lock:
+                self.state.responses[rid] = {"ready_at": time.time() + self.state.bg_delay_s, "body": body}
+            return self._send_json(200, _response_body(rid, model, reply, {}, status="queued"))
+        if req.get("store", True):
+            with self.state.lock:
+                self.state.responses[rid] = {"ready_at": 0.0, "body": body}
+        self._send_json(200, body)
+
+    # -------- batch API --------
+    def _upload(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        head = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("latin-1")
+        msg = BytesParser(policy=HTTP).parsebytes(head + self.rfile.read(n))
+        fields = {}
+        for part in msg.iter_parts() if msg.is_multipart() else ():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True) or b"")
+        if "file" not in fields:
+            return self._send_json(400, {"error": {"message": "Missing multipart field 'file'"}})
+        filename, data = fields["file"]
+        purpose = (fields.get("purpose") or (None, b""))[1].decode("utf-8").strip()
+        fid = "file-" + uuid.uuid4().hex[:24]
+        with self.state.lock:
+            self.state.files[fid] = {"bytes": data, "purpose": purpose, "filename": filename}
+        self._send_json(200, {"id": fid, "object": "file", "bytes": len(data), "purpose": purpose,
+                              "filename": filename, "created_at": int(time.time())})
+
+    def _create_batch(self, req: dict):
+        fid = req.get("input_file_id")
+        with self.state.lock:
+            if fid not in self.state.files:
+                return self._send_json(400, {"error": {"message": f"No file with id {fid}"}})
+            bid = "batch_" + uuid.uuid4().hex[:24]
+            batch = {"id": bid, "object": "batch", "endpoint": req.get("endpoint"),
+                     "input_file_id": fid, "completion_window": req.get("completion_window") or "24h",
+                     "status": "validating", "output_file_id": None, "error_file_id": None,
+                     "created_at": int(time.time()), "metadata": req.get("metadata") or {},
+                     "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                     "_ready_at": time.time() + self.state.batch_delay_s}
+            self.state.batches[bid] = batch
+            public = {k: v for k, v in batch.items() if not k.startswith("_")}
+        self._send_json(200, public)
+
+    def _batch_status(self, bid: str):
+        with self.state.lock:
+            batch = self.state.batches.get(bid)
+            if batch is None:
+                return self._send_json(404, {"error": {"message": f"No batch with id {bid}"}})
+            if batch["status"] in ("validating", "in_progress", "finalizing"):
+                left = batch["_ready_at"] - time.time()
+                if left <= 0:
+                    _run_batch(self.state, batch)
+                    batch["status"] = "completed"
+                    batch["completed_at"] = int(time.time())
+                else:
+                    frac = left / max(self.state.batch_delay_s, 1e-6)
+                    batch["status"] = "validating" if frac > 0.75 else "in_progress" if frac > 0.1 else "finalizing"
+            public = {k: v for k, v in batch.items() if not k.startswith("_")}
+        self._send_json(200, public)
+
+    def _cancel_batch(self, bid: str):
+        with self.state.lock:
+            batch = self.state.batches.get(bid)
+            if batch is None:
+                return self._send_json(404, {"error": {"message": f"No batch with id {bid}"}})
+            if batch["status"] != "completed":
+                batch["status"] = "cancelled"
+            public = {k: v for k, v in batch.items() if not k.startswith("_")}
+        self._send_json(200, public)
+
+# --------------------------- entry ---------------------------
+def serve(port: int = 8765, bg_delay_s: float = 3.0, latency_s: float = 0.2, host: str = "127.0.0.1",
+          batch_delay_s: float = 5.0, max_concurrency: int = 0):
+    """Create the server (not started); call .serve_forever() or run it in a thread."""
+    Handler.state = MockState(bg_delay_s=bg_delay_s, latency_s=latency_s, batch_delay_s=batch_delay_s,
+                              max_concurrency=max_concurrency)
+    return ThreadingHTTPServer((host, port), Handler)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Mock OpenAI-style provider for ClipLLM")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--bg-delay", type=float, default=3.0, help="seconds until a background response completes")
+    ap.add_argument("--latency", type=float, default=0.2, help="added latency per POST, seconds")
+    ap.add_argument("--batch-delay", type=float, default=5.0, help="seconds until a batch job completes")
+    ap.add_argument("--max-concurrency", type=int, default=0, help="answer 429 beyond this many requests (0: no limit)")
+    args = ap.parse_args(argv)
+    srv = serve(args.port, args.bg_delay, args.latency, batch_delay_s=args.batch_delay,
+                max_concurrency=args.max_concurrency)
+    print(f"Mock provider on http://127.0.0.1:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
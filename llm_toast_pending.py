@@ -0,0 +1,79 @@
+# llm_toast_pending.py
+"""
+Persistent list of in-flight background /responses ids.
+
+A background-mode request is recorded here as soon as the provider accepts it and
+removed once it reaches a terminal status, so an answer that was still running when
+the connection dropped or the tray app exited can be collected on the next start
+(llm_toast_llm.resume_background).
+
+File: %APPDATA%\\ClipLLM\\pending_responses.json  ({response_id: {kind, api_base, model, prompt, ts}})
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any
+
+import llm_toast_settings as settings
+
+__all__ = ["add", "remove", "load", "MAX_AGE_S"]
+
+log = logging.getLogger("clip_llm_tray")
+
+MAX_AGE_S = 24 * 3600   # older entries are dropped on load; nobody is waiting for them
+_FILE_NAME = "pending_responses.json"
+_lock = threading.Lock()
+
+def _path() -> str:
+    return settings.config_file(_FILE_NAME)
+
+def _read() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(_path(), "r", encoding="utf-8") as f:
+            d = json.load(f)
+        return d if isinstance(d, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        log.exception("Failed to read %s", _FILE_NAME)
+        return {}
+
+def _write(d: Dict[str, Dict[str, Any]]) -> None:
+    p = _path()
+    tmp = p + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(d, f, indent=2)
+        os.replace(tmp, p)  # atomic: a crash never leaves a half-written file
+    except Exception:
+        log.exception("Failed to write %s", _FILE_NAME)
+
+def add(response_id: str, **meta: Any) -> None:
+    if not response_id:
+        return
+    with _lock:
+        d = _read()
+        d[response_id] = dict(meta, ts=time.time())
+        _write(d)
+
+def remove(response_id: str) -> None:
+    with _lock:
+        d = _read()
+        if d.pop(response_id, None) is not None:
+            _write(d)
+
+def load() -> Dict[str, Dict[str, Any]]:
+    """Current entries, minus (and pruning) those older than MAX_AGE_S."""
+    with _lock:
+        d = _read()
+        cutoff = time.time() - MAX_AGE_S
+        fresh = {k: v for k, v in d.items() if (v or {}).get("ts", 0) >= cutoff}
+        if len(fresh) != len(d):
+            log.info("Dropping %d stale pending response(s)", len(d) - len(fresh))
+            _write(fresh)
+        return fresh
@@ -0,0 +1,275 @@
+# llm_toast_prefetch.py
+"""
+Speculative explain on clipboard change (opt-in).
+
+Users often copy text seconds before pressing the hotkey. With prefetch on, new
+clipboard text is explained in the background and the answer lands in the answer
+cache (llm_toast_cache), so the hotkey on already-copied text is served at once.
+
+- Change detection: the clipboard sequence number is polled (POLL_S) and a change must
+  settle (SETTLE_S) before it is considered, so bursts of writes count once.
+- Filters: content tagged by its owner as private (password managers), no text,
+  too short / too long ("prefetch_max_chars"), credential-looking single tokens, and
+  the same text as the last prefetch are skipped.
+- Rate limit: a token bucket of "prefetch_per_minute" requests.
+- A newer clipboard change cancels the prefetch in flight (its Deadline's cancel event).
+- pause()/resume() bracket the hotkey's own clipboard writes so they are not prefetched.
+- stats(): per-outcome counts, hit rate (prefetched answers later served) and wasted
+  tokens (spent on prefetches never served). Telemetry: --by prefetch.
+
+settings.json: "prefetch_on_copy" (default false; env CLIPLLM_PREFETCH=1),
+"prefetch_per_minute" (6), "prefetch_max_chars" (4000).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Optional, Dict, Any, Tuple
+
+import llm_toast_settings as settings
+
+__all__ = ["ClipboardPrefetcher", "enabled", "set_enabled"]
+
+log = logging.getLogger("clip_llm_tray")
+
+POLL_S = 0.25
+SETTLE_S = 0.4
+MIN_CHARS = 3
+DEFAULT_MAX_CHARS = 4000
+DEFAULT_PER_MINUTE = 6
+
+_SECRET_PREFIX = re.compile(r"(sk-|ghp_|gho_|github_pat_|xox[abpr]-|AKIA|AIza|eyJ)[\w\-.]{8,}")
+
+def enabled() -> bool:
+    cfg = settings.load_settings() or {}
+    if "prefetch_on_copy" in cfg:
+        return bool(cfg["prefetch_on_copy"])
+    return os.getenv("CLIPLLM_PREFETCH", "").strip().lower() in ("1", "true", "yes", "on")
+
+def set_enabled(on: bool) -> None:
+    """Persist the opt-in (tray menu)."""
+    cfg = settings.load_settings() or {}
+    cfg["prefetch_on_copy"] = bool(on)
+    settings.save_settings(cfg)
+
+def _looks_secret(s: str) -> bool:
+    """A single whitespace-free token that looks like a key, token or password."""
+    if any(c.isspace() for c in s) or not (12 <= len(s) <= 512):
+        return False
+    if _SECRET_PREFIX.match(s):
+        return True
+    classes = sum((any(c.islower() for c in s), any(c.isupper() for c in s),
+                   any(c.isdigit() for c in s), any(not c.isalnum() for c in s)))
+    return classes >= 3 and not s.startswith(("http://", "https://", "/", "\\"))
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+class _Flight:
+    __slots__ = ("key", "cancel", "done")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.cancel = threading.Event()
+        self.done = threading.Event()
+
+class ClipboardPrefetcher:
+    """
+    fetch(text, cancel) -> (status, tokens)   e.g. llm_toast_llm.prefetch
+    read_seq() -> int, excluded() -> bool       clipboard access
+    read_text(max_chars) -> Optional[ClipText]  size-guarded read (llm_toast_io.read_clipboard_text)
+    spawn(fn, name) -> Future                   runs fn off the watcher thread (may raise when busy)
+    cache_stats() -> dict                       answer-cache stats (prefetch_served, ...)
+    """
+
+    def __init__(self, fetch: Callable[[str, threading.Event], Tuple[str, int]],
+                 read_seq: Callable[[], int],
+                 read_text: Callable[[int], Any],
+                 spawn: Callable[[Callable[[], None], str], Any],
+                 excluded: Callable[[], bool] = lambda: False,
+                 cache_stats: Callable[[], Dict[str, Any]] = dict) -> None:
+        cfg = settings.load_settings() or {}
+        self._fetch = fetch
+        self._read_seq = read_seq
+        self._read_text = read_text
+        self._spawn = spawn
+        self._excluded = excluded
+        self._cache_stats = cache_stats
+        self.max_chars = int(cfg.get("prefetch_max_chars") or DEFAULT_MAX_CHARS)
+        self.per_minute = float(cfg.get("prefetch_per_minute") or DEFAULT_PER_MINUTE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._paused = 0
+        self._rebase = False
+        self._flight: Optional[_Flight] = None
+        self._last_key: Optional[str] = None
+        self._bucket = self.per_minute
+        self._bucket_t = time.monotonic()
+        self._counts: Dict[str, int] = {"changes": 0, "started": 0, "tokens_spent": 0}
+
+    # -------------------- lifecycle --------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True, name="ClipboardPrefetch")
+        self._thread.start()
+        log.info("[prefetch] on (%.0f/min, <= %d chars)", self.per_minute, self.max_chars)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            if self._flight is not None:
+                self._flight.cancel.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        log.info("[prefetch] off; %s", self.stats())
+
+    def pause(self) -> None:
+        """Ignore clipboard changes until resume() (the hotkey's own copy/restore)."""
+        with self._lock:
+            self._paused += 1
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused = max(0, self._paused - 1)
+            self._rebase = self._paused == 0   # writes made while paused are not "new"
+
+    def join(self, text: str, timeout_s: float) -> bool:
+        """Wait for an in-flight prefetch of this text; True if one finished in time."""
+        with self._lock:
+            flight = self._flight
+        if flight is None or flight.key != _fingerprint(text):
+            return False
+        return flight.done.wait(timeout_s)
+
+    # -------------------- watcher --------------------
+    def _watch(self) -> None:
+        try:
+            last = self._read_seq()
+        except Exception:
+            log.exception("[prefetch] cannot read clipboard sequence; stopping")
+            return
+        changed_at: Optional[float] = None
+        while not self._stop.wait(POLL_S):
+            try:
+                seq = self._read_seq()
+                with self._lock:
+                    paused = self._paused > 0
+                    rebase, self._rebase = self._rebase, False
+                if rebase:
+                    last, changed_at = seq, None
+                    continue
+                if seq != last:
+                    last = seq
+                    changed_at = None if paused else time.monotonic()
+                    continue
+                if changed_at is not None and time.monotonic() - changed_at >= SETTLE_S:
+                    changed_at = None
+                    if not paused:
+                        self._on_change()
+            except Exception:
+                log.exception("[prefetch] watcher error")
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + n
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._bucket = min(self.per_minute, self._bucket + (now - self._bucket_t) * self.per_minute / 60.0)
+            self._bucket_t = now
+            if self._bucket < 1.0:
+                return False
+            self._bucket -= 1.0
+            return True
+
+    def _on_change(self) -> None:
+        self._count("changes")
+        with self._lock:
+            if self._flight is not None:
+                self._flight.cancel.set()   # superseded by the newer copy
+        text, reason = self._candidate()
+        if text is None:
+            self._count("skipped_" + reason)
+            log.debug("[prefetch] skipped (%s)", reason)
+            return
+        if not self._take_token():
+            self._count("skipped_rate")
+            log.debug("[prefetch] skipped (rate limit)")
+            return
+        flight = _Flight(_fingerprint(text))
+        with self._lock:
+            self._flight = flight
+            self._last_key = flight.key
+        try:
+            fut = self._spawn(lambda: self._run(text, flight), "Prefetch")
+        except Exception:
+            self._land(flight)
+            self._count("skipped_busy")
+            return
+        if hasattr(fut, "add_done_callback"):
+            # Dropped from the pool queue before it ran: nobody should wait for it
+            fut.add_done_callback(lambda f: f.cancelled() and self._land(flight))
+
+    def _land(self, flight: _Flight) -> None:
+        flight.done.set()
+        with self._lock:
+            if self._flight is flight:
+                self._flight = None
+
+    def _candidate(self) -> Tuple[Optional[str], str]:
+        """(text, "") when the clipboard content should be prefetched, else (None, skip reason)."""
+        if self._excluded():
+            return None, "private"
+        clip = self._read_text(self.max_chars)
+        if clip is None or not clip.text.strip():
+            return None, "no_text"
+        if clip.truncated:
+            return None, "too_long"
+        s = clip.text.strip()
+        if len(s) < MIN_CHARS:
+            return None, "too_short"
+        if _looks_secret(s):
+            return None, "secret"
+        if _fingerprint(s) == self._last_key:
+            return None, "duplicate"
+        return s, ""
+
+    def _run(self, text: str, flight: _Flight) -> None:
+        self._count("started")
+        try:
+            status, tokens = self._fetch(text, flight.cancel)
+        except Exception:
+            log.exception("[prefetch] fetch failed")
+            status, tokens = "incomplete", 0
+        finally:
+            self._land(flight)
+        if status == "incomplete" and flight.cancel.is_set():
+            status = "cancelled"
+        self._count(status)
+        self._count("tokens_spent", tokens)
+        log.info("[prefetch] %s (%d chars, %d tokens)", status, len(text), tokens)
+
+    # -------------------- reporting --------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counts)
+        try:
+            cache = self._cache_stats() or {}
+        except Exception:
+            cache = {}
+        served = int(cache.get("prefetch_served", 0))
+        stored = int(cache.get("prefetch_stores", 0)) or out.get("stored", 0)
+        out["served"] = served
+        out["hit_rate"] = round(served / stored, 3) if stored else 0.0
+        out["wasted_tokens"] = max(0, out["tokens_spent"] - int(cache.get("prefetch_tokens_served", 0)))
+        return out
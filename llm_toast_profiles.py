@@ -0,0 +1,119 @@
+# llm_toast_profiles.py
+"""
+Latency profiles for the explain hotkey.
+
+A profile bundles model, reasoning effort, verbosity, token budget and deadline:
+
+    fast       configured explain model, minimal reasoning, low verbosity, 512 tokens, 8 s
+    balanced   configured explain model, low reasoning, low verbosity, 2048 tokens, 20 s
+    thorough   configured chat model, medium reasoning, medium verbosity, 4048 tokens, 60 s
+
+settings.json:
+    "profile": "auto" | "fast" | "balanced" | "thorough"     (env CLIPLLM_PROFILE)
+    "profiles": {"fast": {"max_tokens": 256}, ...}           (per-field overrides)
+
+"auto" picks by selection length (AUTO_FAST_MAX_CHARS / AUTO_BALANCED_MAX_CHARS).
+Reasoning effort and verbosity are only sent to models that accept them (gpt-5, o-series).
+Per-profile latency and tokens: python -m llm_toast_telemetry --by profile
+"""
+
+from __future__ import annotations
+
+import os
+import logging
+from typing import NamedTuple, Optional, Dict, Any, List
+
+import llm_toast_settings as settings
+
+__all__ = ["Profile", "PROFILE_NAMES", "AUTO", "CHAT_MODEL", "resolve", "selected", "select",
+           "model_for", "chat_params", "responses_params"]
+
+log = logging.getLogger("clip_llm_tray")
+
+AUTO = "auto"
+DEFAULT_PROFILE = AUTO
+AUTO_FAST_MAX_CHARS = 280
+AUTO_BALANCED_MAX_CHARS = 2000
+CHAT_MODEL = "chat_model"         # Profile.model: use the configured chat model
+
+class Profile(NamedTuple):
+    name: str
+    model: Optional[str]          # None -> the configured explain model; CHAT_MODEL -> the chat model
+    reasoning_effort: Optional[str]
+    verbosity: Optional[str]
+    max_tokens: int
+    deadline_s: float
+
+_BUILTIN: Dict[str, Profile] = {
+    "fast":     Profile("fast", None, "minimal", "low", 512, 8.0),
+    "balanced": Profile("balanced", None, "low", "low", 2048, 20.0),
+    "thorough": Profile("thorough", CHAT_MODEL, "medium", "medium", 4048, 60.0),
+}
+PROFILE_NAMES: List[str] = list(_BUILTIN)
+
+def selected() -> str:
+    """The profile chosen in settings/env ("auto" or a profile name)."""
+    cfg = settings.load_settings() or {}
+    name = str(cfg.get("profile") or os.getenv("CLIPLLM_PROFILE") or DEFAULT_PROFILE).lower()
+    return name if name == AUTO or name in _BUILTIN else DEFAULT_PROFILE
+
+def select(name: str) -> None:
+    """Persist the chosen profile (tray menu)."""
+    cfg = settings.load_settings() or {}
+    cfg["profile"] = name
+    settings.save_settings(cfg)
+
+def _auto_name(text: str) -> str:
+    n = len(text or "")
+    if n <= AUTO_FAST_MAX_CHARS:
+        return "fast"
+    if n <= AUTO_BALANCED_MAX_CHARS:
+        return "balanced"
+    return "thorough"
+
+def resolve(text: str = "", name: Optional[str] = None) -> Profile:
+    """Profile for this selection: explicit name, else the selected one ("auto" -> by length)."""
+    name = (name or selected()).lower()
+    if name == AUTO:
+        name = _auto_name(text)
+    base = _BUILTIN.get(name, _BUILTIN["balanced"])
+    overrides = ((settings.load_settings() or {}).get("profiles") or {}).get(base.name) or {}
+    if overrides:
+        try:
+            base = base._replace(**{k: v for k, v in overrides.items() if k in Profile._fields and k != "name"})
+        except Exception:
+            log.warning("Ignoring invalid overrides for profile %s", base.name)
+    return base
+
+def model_for(profile: Optional[Profile], explain_model: str, chat_model: str) -> str:
+    """The model a profile runs on, given the configured explain and chat models."""
+    model = profile.model if profile is not None else None
+    if model == CHAT_MODEL:
+        return chat_model
+    return model or explain_model
+
+def _supports_reasoning(model: str) -> bool:
+    m = (model or "").lower()
+    return m.startswith("gpt-5") or (len(m) > 1 and m[0] == "o" and m[1].isdigit())
+
+def chat_params(model: str, profile: Optional[Profile]) -> Dict[str, Any]:
+    """Extra /chat/completions fields for this profile (empty for models that reject them)."""
+    if profile is None or not _supports_reasoning(model):
+        return {}
+    out: Dict[str, Any] = {}
+    if profile.reasoning_effort:
+        out["reasoning_effort"] = profile.reasoning_effort
+    if profile.verbosity and model.lower().startswith("gpt-5"):
+        out["verbosity"] = profile.verbosity
+    return out
+
+def responses_params(model: str, profile: Optional[Profile]) -> Dict[str, Any]:
+    """Extra /responses fields for this profile (empty for models that reject them)."""
+    if profile is None or not _supports_reasoning(model):
+        return {}
+    out: Dict[str, Any] = {}
+    if profile.reasoning_effort:
+        out["reasoning"] = {"effort": profile.reasoning_effort}
+    if profile.verbosity and model.lower().startswith("gpt-5"):
+        out["text"] = {"verbosity": profile.verbosity}
+    return out
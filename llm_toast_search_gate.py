@@ -0,0 +1,105 @@
+# llm_toast_search_gate.py
+"""
+Per-turn decision whether a chat turn should carry the hosted web_search tool.
+
+Sending the tool on every turn costs tool-definition tokens and sometimes a slow
+server-side search, even for "rewrite this sentence". A cheap local heuristic picks
+the turns that plausibly need fresh or external facts:
+
+- explicit per-turn override: a leading "/web" or "/noweb" (stripped from the text)
+- URLs or bare domains
+- recency phrases that only make sense about fresh facts ("today's", "this week",
+  "latest version of", "stock price", a recent year, ...)
+- common time words ("now", "current", "update", "release", "price", "schedule", ...)
+  only next to a named entity, or in a lookup question about something ("what is the
+  price of bitcoin"): "current directory" and "update the release schedule" stay local
+- a lookup-style question about a named entity ("who is Ada Lovelace", "when did Acme ...")
+- anything else (rewrites, translations, code, explanations) -> no web search
+
+Global mode via settings "web_search" / CLIPLLM_WEB_SEARCH: "auto" (default),
+"always" or "never". Per-turn overrides win over the global mode.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import NamedTuple, Optional
+
+import llm_toast_settings as settings
+
+__all__ = ["GateDecision", "decide", "gate_mode"]
+
+DEFAULT_MODE = "auto"
+_MODES = ("auto", "always", "never")
+
+_OVERRIDE_RE = re.compile(r"^\s*/(web|noweb)\b\s*", re.IGNORECASE)
+_URL_RE = re.compile(r"https?://|www\.|\b[a-z0-9-]+\.(?:com|org|net|io|dev|ai|gov|edu)\b", re.IGNORECASE)
+# Enough on their own
+_RECENCY_RE = re.compile(
+    r"\b(today'?s|tonight'?s|yesterday'?s|tomorrow'?s|as of (today|now)|right now|"
+    r"this (week|month|year)|last (week|month|night)|(breaking|latest) news|news (about|on|from)|"
+    r"(latest|newest|current|recent) (version|release|update|price|news|status|ceo|president|results?) (of|for|on|in)|"
+    r"(stock|share|ticker) price|exchange rate|weather (in|for|today|tomorrow)|forecast (for|in)|"
+    r"who won|election results?|live score)\b",
+    re.IGNORECASE,
+)
+# Common in ordinary text; only count next to a lookup question or a named entity
+_TIME_WORDS = (r"(today|tonight|yesterday|tomorrow|now|currently|current|latest|newest|recent(ly)?|"
+               r"news|update[sd]?|release[sd]?|price[sd]?|stock|weather|forecast|score|election|schedule|deadline)")
+_TIME_WORD_RE = re.compile(r"\b" + _TIME_WORDS + r"\b", re.IGNORECASE)
+_TIME_OF_RE = re.compile(r"\b" + _TIME_WORDS + r"\s+(of|for|in|on)\b", re.IGNORECASE)   # "price of bitcoin"
+_LOOKUP_RE = re.compile(r"^\s*(who|when|where|which|what)\b|\b(look up|search for|find out)\b", re.IGNORECASE)
+# Two or more capitalized words in a row, or a single capitalized word not at sentence start
+_ENTITY_RE = re.compile(r"(?:\b[A-Z][a-zA-Z0-9&.-]+(?:\s+[A-Z][a-zA-Z0-9&.-]+)+)|(?<=[a-z,;:]\s)[A-Z][a-zA-Z0-9&-]{2,}")
+# Requests that work on text the user supplied; never worth a search on their own
+_LOCAL_TASK_RE = re.compile(
+    r"^\s*(rewrite|rephrase|reword|translate|summari[sz]e|proofread|fix|format|shorten|expand|"
+    r"refactor|explain this|convert|write)\b",
+    re.IGNORECASE,
+)
+
+class GateDecision(NamedTuple):
+    web_search: bool
+    reason: str   # override:web | override:noweb | mode:always | mode:never | url | recency | entity | local_task | default
+    text: str     # user text with any override prefix removed
+
+def gate_mode() -> str:
+    cfg = settings.load_settings() or {}
+    mode = str(cfg.get("web_search") or os.getenv("CLIPLLM_WEB_SEARCH") or DEFAULT_MODE).lower()
+    return mode if mode in _MODES else DEFAULT_MODE
+
+def _recent_year(text: str) -> bool:
+    this_year = time.localtime().tm_year
+    return any(int(y) >= this_year - 1 for y in re.findall(r"\b(20\d\d)\b", text))
+
+def decide(text: str, override: Optional[bool] = None, mode: Optional[str] = None) -> GateDecision:
+    """Classify one chat turn. override=True/False forces the outcome (e.g. a UI toggle)."""
+    m = _OVERRIDE_RE.match(text or "")
+    if m:
+        stripped = text[m.end():]
+        if override is None:
+            override = m.group(1).lower() == "web"
+        text = stripped
+    if override is not None:
+        return GateDecision(bool(override), "override:web" if override else "override:noweb", text)
+
+    mode = mode or gate_mode()
+    if mode == "always":
+        return GateDecision(True, "mode:always", text)
+    if mode == "never":
+        return GateDecision(False, "mode:never", text)
+
+    if _URL_RE.search(text):
+        return GateDecision(True, "url", text)
+    if _LOCAL_TASK_RE.match(text):
+        return GateDecision(False, "local_task", text)
+    if _RECENCY_RE.search(text) or _recent_year(text):
+        return GateDecision(True, "recency", text)
+    lookup, entity = bool(_LOOKUP_RE.search(text)), bool(_ENTITY_RE.search(text))
+    if (entity and _TIME_WORD_RE.search(text)) or (lookup and _TIME_OF_RE.search(text)):
+        return GateDecision(True, "recency", text)
+    if lookup and entity:
+        return GateDecision(True, "entity", text)
+    return GateDecision(False, "default", text)
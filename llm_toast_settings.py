@@ -2,8 +2,12 @@
 llm_toast_settings.py
 Persist settings and secrets.
 
-- Secrets (API key): Windows Credential Manager via `keyring`, fallback to DPAPI-encrypted file.
+- Secrets (API key): Windows Credential Manager via `keyring`, fallback to DPAPI-encrypted file,
+  then the CLIPLLM_API_KEY environment variable (headless use).
 - Non-secrets: %APPDATA%\\ClipLLM\\settings.json
+
+Import is side-effect free: directories, keyring (with its backend discovery)
+and the DPAPI DLLs are all resolved on first use.
 """
 
 import os, json, logging, ctypes
@@ -12,51 +16,93 @@ from ctypes import wintypes
 log = logging.getLogger("clip_llm_tray")
 
 # ---------- app dirs ----------
+_config_dir_ready = False
+
 def _config_dir() -> str:
+    global _config_dir_ready
     base = os.environ.get("APPDATA") or os.path.expanduser("~")
     path = os.path.join(base, "ClipLLM")
-    os.makedirs(path, exist_ok=True)
+    if not _config_dir_ready:
+        os.makedirs(path, exist_ok=True)
+        _config_dir_ready = True
     return path
 
+def config_file(name: str) -> str:
+    """Path of a file in the app config dir (%APPDATA%\\ClipLLM)."""
+    return os.path.join(_config_dir(), name)
+
 def _settings_path() -> str:
-    return os.path.join(_config_dir(), "settings.json")
+    return config_file("settings.json")
 
 # ---------- settings (non-secret) ----------
+# Parsed settings are cached and re-read only when settings.json's mtime/size changes.
+_settings_cache = (None, {})  # ((mtime_ns, size) | None, dict)
+
 def load_settings() -> dict:
+    global _settings_cache
     p = _settings_path()
     try:
-        if os.path.exists(p):
-            with open(p, "r", encoding="utf-8") as f:
-                return json.load(f) or {}
+        st = os.stat(p)
+    except OSError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _settings_cache[0] == stamp:
+        return dict(_settings_cache[1])
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            d = json.load(f) or {}
+        _settings_cache = (stamp, d)
+        return dict(d)
     except Exception:
         log.exception("Failed to load settings.json")
     return {}
 
 def save_settings(d: dict) -> None:
+    global _settings_cache
     p = _settings_path()
     try:
         with open(p, "w", encoding="utf-8") as f:
             json.dump(d, f, indent=2)
+        _settings_cache = (None, {})
     except Exception:
         log.exception("Failed to save settings.json")
 
 # ---------- secrets (API key) ----------
-try:
-    import keyring  # uses Windows Credential Manager on Windows
-except Exception:
-    keyring = None  # fallback to DPAPI file
-
 SERVICE = "ClipLLM"
 ACCOUNT = "api_key"
-_FALLBACK_SECRET_PATH = os.path.join(_config_dir(), "secret.bin")
+
+_keyring = None
+_keyring_loaded = False
+
+def _get_keyring():
+    """Import keyring (Windows Credential Manager backend) on first use; None if unavailable."""
+    global _keyring, _keyring_loaded
+    if not _keyring_loaded:
+        try:
+            import keyring
+            _keyring = keyring
+        except Exception:
+            _keyring = None  # fallback to DPAPI file
+        _keyring_loaded = True
+    return _keyring
+
+def _fallback_secret_path() -> str:
+    return os.path.join(_config_dir(), "secret.bin")
 
 # DPAPI fallback helpers
 class DATA_BLOB(ctypes.Structure):
     _fields_ = [("cbData", wintypes.DWORD),
                 ("pbData", ctypes.POINTER(ctypes.c_byte))]
 
-_crypt32 = ctypes.windll.crypt32
-_kernel32 = ctypes.windll.kernel32
+_crypt32 = None
+_kernel32 = None
+
+def _dpapi_dlls():
+    global _crypt32, _kernel32
+    if _crypt32 is None:
+        _crypt32 = ctypes.windll.crypt32
+        _kernel32 = ctypes.windll.kernel32
+    return _crypt32, _kernel32
 
 def _bytes_to_blob(b: bytes) -> DATA_BLOB:
     if not b:
@@ -70,26 +116,33 @@ def _blob_to_bytes(blob: DATA_BLOB) -> bytes:
     if not blob.cbData:
         return b""
     data = ctypes.string_at(blob.pbData, blob.cbData)
-    _kernel32.LocalFree(blob.pbData)
+    _dpapi_dlls()[1].LocalFree(blob.pbData)
     return data
 
 def _dpapi_protect(b: bytes) -> bytes:
     inb = _bytes_to_blob(b)
     outb = DATA_BLOB()
-    if not _crypt32.CryptProtectData(ctypes.byref(inb), None, None, None, None, 0, ctypes.byref(outb)):
+    if not _dpapi_dlls()[0].CryptProtectData(ctypes.byref(inb), None, None, None, None, 0, ctypes.byref(outb)):
         raise OSError("CryptProtectData failed")
     return _blob_to_bytes(outb)
 
 def _dpapi_unprotect(b: bytes) -> bytes:
     inb = _bytes_to_blob(b)
     outb = DATA_BLOB()
-    if not _crypt32.CryptUnprotectData(ctypes.byref(inb), None, None, None, None, 0, ctypes.byref(outb)):
+    if not _dpapi_dlls()[0].CryptUnprotectData(ctypes.byref(inb), None, None, None, None, 0, ctypes.byref(outb)):
         raise OSError("CryptUnprotectData failed")
     return _blob_to_bytes(outb)
 
+# The resolved key is memoized: Credential Manager / DPAPI lookups are slow and
+# would otherwise run on every request. set/delete invalidate it.
+_cached_api_key = None
+
 def set_api_key(key: str) -> None:
     """Store the API key securely."""
+    global _cached_api_key
+    _cached_api_key = None
     try:
+        keyring = _get_keyring()
         if keyring:
             keyring.set_password(SERVICE, ACCOUNT, key)
             log.debug("API key saved to Credential Manager")
@@ -100,7 +153,7 @@ def set_api_key(key: str) -> None:
     # Fallback: DPAPI-encrypted file under %APPDATA%\ClipLLM\secret.bin
     try:
         enc = _dpapi_protect(key.encode("utf-8"))
-        with open(_FALLBACK_SECRET_PATH, "wb") as f:
+        with open(_fallback_secret_path(), "wb") as f:
             f.write(enc)
         log.debug("API key saved via DPAPI fallback")
     except Exception:
@@ -108,7 +161,14 @@ def set_api_key(key: str) -> None:
 
 def get_api_key() -> str | None:
     """Retrieve the API key, or None if not set."""
+    global _cached_api_key
+    if _cached_api_key is None:
+        _cached_api_key = _read_api_key()
+    return _cached_api_key
+
+def _read_api_key() -> str | None:
     try:
+        keyring = _get_keyring()
         if keyring:
             val = keyring.get_password(SERVICE, ACCOUNT)
             if val:
@@ -117,17 +177,22 @@ def get_api_key() -> str | None:
         log.exception("keyring.get_password failed, trying DPAPI fallback")
 
     try:
-        if os.path.exists(_FALLBACK_SECRET_PATH):
-            with open(_FALLBACK_SECRET_PATH, "rb") as f:
+        path = _fallback_secret_path()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
                 enc = f.read()
             raw = _dpapi_unprotect(enc)
             return raw.decode("utf-8", errors="replace")
     except Exception:
         log.exception("DPAPI load failed")
-    return None
+    # Headless use (llm_toast_batch on a box without a keyring)
+    return os.getenv("CLIPLLM_API_KEY") or None
 
 def delete_api_key() -> None:
+    global _cached_api_key
+    _cached_api_key = None
     try:
+        keyring = _get_keyring()
         if keyring:
             try:
                 keyring.delete_password(SERVICE, ACCOUNT)
@@ -137,7 +202,8 @@ def delete_api_key() -> None:
         log.exception("keyring.delete_password failed")
 
     try:
-        if os.path.exists(_FALLBACK_SECRET_PATH):
-            os.remove(_FALLBACK_SECRET_PATH)
+        path = _fallback_secret_path()
+        if os.path.exists(path):
+            os.remove(path)
     except Exception:
         log.exception("Failed to remove DPAPI fallback file")
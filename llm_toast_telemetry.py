@@ -0,0 +1,288 @@
+# llm_toast_telemetry.py
+"""
+Structured per-call telemetry for ClipLLM.
+
+- One JSON object per logical LLM call (explain_selection / chat) appended to a
+  size-rotated JSONL file.
+- Record fields: ts, kind, endpoint, dialect, model, prompt/completion/reasoning/
+  cached tokens, latency_ms, retries, cache_hit, outcome (+ error on failure).
+  Chat turns also carry web_search and gate_reason; explain calls carry profile, and
+  speculative explains from clipboard prefetch carry prefetch=true (--by prefetch).
+  Provider calls carry queue_ms (time waiting under the adaptive concurrency limit,
+  llm_toast_limiter) and concurrency_limit.
+  Selections answered without a request keep the configured api_base/model, with
+  endpoint and offline set to the source ("local", "glossary", "cache", "prefetch") and
+  dialect "<source>:<detail>" (hit rate: --by dialect or --by offline).
+- Aggregation:  python -m llm_toast_telemetry [--by model|day|web_search|...] [--file PATH]
+  prints latency percentiles and token totals per group. Offline answers are counted
+  (column "offline") but kept out of the latency and token stats, which describe
+  provider calls; --by offline shows their own latencies.
+
+Telemetry file (Windows):
+  %LOCALAPPDATA%\\ClipLLM\\Logs\\telemetry\\llm_calls.jsonl
+
+On non-Windows systems:
+  ~/.local/state/clipllm/logs/telemetry/llm_calls.jsonl  (or similar XDG path)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import math
+import json
+import time
+import logging
+import logging.handlers
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable
+
+__all__ = ["CallTrace", "emit", "telemetry_path", "aggregate", "main"]
+
+log = logging.getLogger("clip_llm_tray")
+
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# -------------------- paths --------------------
+
+def _base_telemetry_dir() -> str:
+    la = os.getenv("LOCALAPPDATA")
+    if la:
+        return os.path.join(la, "ClipLLM", "Logs", "telemetry")
+    xdg = os.getenv("XDG_STATE_HOME")
+    if xdg:
+        return os.path.join(xdg, "clipllm", "logs", "telemetry")
+    return os.path.join(os.path.expanduser("~"), ".local", "state", "clipllm", "logs", "telemetry")
+
+def telemetry_path() -> str:
+    return os.getenv("CLIPLLM_TELEMETRY_FILE") or os.path.join(_base_telemetry_dir(), "llm_calls.jsonl")
+
+# -------------------- writer --------------------
+# A dedicated, non-propagating logger so records never end up in the app log.
+_tlog = logging.getLogger("clip_llm_tray.telemetry")
+_tlog.propagate = False
+
+def _ensure_handler() -> bool:
+    if _tlog.handlers:
+        return True
+    try:
+        path = telemetry_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fh = logging.handlers.RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT,
+                                                  encoding="utf-8", delay=True)
+        fh.setFormatter(logging.Formatter("%(message)s"))
+        _tlog.addHandler(fh)
+        _tlog.setLevel(logging.INFO)
+        return True
+    except Exception:
+        log.exception("Telemetry handler setup failed; telemetry disabled")
+        return False
+
+def emit(record: Dict[str, Any]) -> None:
+    """Append one record to the telemetry stream. Never raises."""
+    try:
+        if _ensure_handler():
+            _tlog.info(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    except Exception:
+        pass
+
+# -------------------- per-call trace --------------------
+
+def _usage_tokens(usage: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Normalize chat/completions and /responses usage shapes."""
+    usage = usage or {}
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens"))
+    completion = usage.get("completion_tokens", usage.get("output_tokens"))
+    cdet = usage.get("completion_tokens_details") or usage.get("output_tokens_details") or {}
+    pdet = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "reasoning_tokens": cdet.get("reasoning_tokens"),
+        "cached_tokens": pdet.get("cached_tokens"),
+    }
+
+class CallTrace:
+    """
+    Collects facts about one logical LLM call across its fallback attempts.
+
+    Usage (inside llm_toast_llm):
+        trace = CallTrace("explain", api_base, model)
+        trace.attempt("/chat/completions", "chat:max_completion_tokens")
+        trace.response(data)
+        trace.finish("ok")
+    """
+
+    def __init__(self, kind: str, api_base: str, model: str) -> None:
+        self.kind = kind
+        self.api_base = api_base
+        self.model = model
+        self.endpoint: Optional[str] = None
+        self.dialect: Optional[str] = None
+        self.attempts = 0
+        self.tokens: Dict[str, Optional[int]] = {}
+        self.finish_reason: Optional[str] = None
+        self.response_id: Optional[str] = None
+        self.extra: Dict[str, Any] = {}
+        self._t0 = time.perf_counter()
+        self._done = False
+
+    def attempt(self, endpoint: str, dialect: str) -> None:
+        self.attempts += 1
+        self.endpoint, self.dialect = endpoint, dialect
+
+    def response(self, data: Dict[str, Any]) -> None:
+        try:
+            self.tokens = _usage_tokens(data.get("usage") or {})
+            self.response_id = data.get("id") or self.response_id
+            self.finish_reason = ((data.get("choices") or [{}])[0].get("finish_reason")
+                                  or data.get("status") or self.finish_reason)
+        except Exception:
+            pass
+
+    def finish(self, outcome: str, error: Optional[BaseException] = None) -> None:
+        """Write the record once; later calls are ignored."""
+        if self._done:
+            return
+        self._done = True
+        rec = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "kind": self.kind,
+            "endpoint": self.endpoint,
+            "dialect": self.dialect,
+            "api_base": self.api_base,
+            "model": self.model,
+            **{k: self.tokens.get(k) for k in ("prompt_tokens", "completion_tokens",
+                                                "reasoning_tokens", "cached_tokens")},
+            "latency_ms": round((time.perf_counter() - self._t0) * 1000.0, 1),
+            "retries": max(self.attempts - 1, 0),
+            "cache_hit": bool(self.tokens.get("cached_tokens")),
+            "finish_reason": self.finish_reason,
+            "outcome": outcome,
+        }
+        if error is not None:
+            rec["error"] = str(error)[:300]
+        rec.update(self.extra)
+        emit(rec)
+
+# -------------------- aggregation --------------------
+
+def _iter_records(paths: Iterable[str]):
+    for p in paths:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+
+def _percentile(sorted_vals: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_vals:
+        return None
+    k = max(math.ceil(pct / 100.0 * len(sorted_vals)) - 1, 0)
+    return sorted_vals[min(k, len(sorted_vals) - 1)]
+
+def _group_key(rec: Dict[str, Any], by: str) -> str:
+    if by == "day":
+        return (rec.get("ts") or "")[:10] or "(unknown)"
+    val = rec.get(by)
+    return "(unknown)" if val is None or val == "" else str(val)
+
+def aggregate(records: Iterable[Dict[str, Any]], by: str = "model") -> Dict[str, Dict[str, Any]]:
+    """
+    Group records and compute call counts, latency percentiles and token totals.
+    Offline answers count in calls / offline only, except when grouping by offline.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for rec in records:
+        g = groups.setdefault(_group_key(rec, by), {"calls": 0, "errors": 0, "offline": 0, "latencies": [],
+                                                    "queue": [], "prompt_tokens": 0, "completion_tokens": 0,
+                                                    "reasoning_tokens": 0, "cached_tokens": 0})
+        g["calls"] += 1
+        if rec.get("outcome") != "ok":
+            g["errors"] += 1
+        if rec.get("offline"):
+            g["offline"] += 1
+            if by != "offline":
+                continue
+        lat = rec.get("latency_ms")
+        if isinstance(lat, (int, float)):
+            g["latencies"].append(float(lat))
+        q = rec.get("queue_ms")
+        if isinstance(q, (int, float)):
+            g["queue"].append(float(q))
+        for k in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens"):
+            v = rec.get(k)
+            if isinstance(v, int):
+                g[k] += v
+
+    out = {}
+    for key, g in groups.items():
+        lats = sorted(g.pop("latencies"))
+        g["p50_ms"] = _percentile(lats, 50)
+        g["p90_ms"] = _percentile(lats, 90)
+        g["p99_ms"] = _percentile(lats, 99)
+        g["max_ms"] = lats[-1] if lats else None
+        g["queue_p90_ms"] = _percentile(sorted(g.pop("queue")), 90)
+        out[key] = g
+    return out
+
+def _fmt_ms(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.0f}"
+
+_COLS = ("calls", "errors", "offline", "p50_ms", "p90_ms", "p99_ms", "max_ms", "queue_p90_ms",
+         "prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens")
+
+def _col_width(c: str) -> int:
+    return 17 if "tokens" in c else max(7, len(c))
+
+def _print_table(by: str, summary: Dict[str, Dict[str, Any]]) -> None:
+    width = max([len(by)] + [len(k) for k in summary])
+    print(f"{by:<{width}}  " + "  ".join(f"{c:>{_col_width(c)}}" for c in _COLS))
+    for key in sorted(summary):
+        g = summary[key]
+        cells = []
+        for c in _COLS:
+            v = g[c]
+            cells.append(f"{_fmt_ms(v) if c.endswith('_ms') else v:>{_col_width(c)}}")
+        print(f"{key:<{width}}  " + "  ".join(cells))
+
+GROUP_KEYS = ["model", "day", "kind", "dialect", "outcome", "web_search", "gate_reason", "profile", "prefetch", "offline"]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse, glob  # CLI-only; kept out of the app's import path
+    ap = argparse.ArgumentParser(prog="python -m llm_toast_telemetry",
+                                 description="Summarize ClipLLM LLM-call telemetry.")
+    ap.add_argument("--by", action="append", choices=GROUP_KEYS,
+                    help="grouping key; repeatable (default: model and day)")
+    ap.add_argument("--file", default=None, help="telemetry file (default: app telemetry file + rotations)")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of tables")
+    args = ap.parse_args(argv)
+
+    base = args.file or telemetry_path()
+    records = list(_iter_records(glob.glob(base + ".*") + [base]))
+    if not records:
+        print(f"(no records in {base})")
+        return 0
+
+    summaries = {by: aggregate(records, by=by) for by in (args.by or ["model", "day"])}
+    if args.json:
+        json.dump(summaries, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+    for i, (by, summary) in enumerate(summaries.items()):
+        if i:
+            print()
+        _print_table(by, summary)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
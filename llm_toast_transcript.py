@@ -0,0 +1,205 @@
+# llm_toast_transcript.py
+"""
+Bounded, virtualized chat transcript for ClipLLM.
+
+- TranscriptModel: compact per-message records (__slots__) in a capped deque.
+  Older messages fall off the model; the session log on disk keeps the full history.
+- TranscriptView: renders only a window of the model into a tk.Text. When the user
+  scrolls to the top (or bottom) of the rendered window, the next page of messages is
+  materialized and the far side is trimmed, so widget size and insert cost stay flat.
+- A message that arrives while the user is reading history is not rendered; it is
+  materialized when they scroll back down to it, like any other page.
+
+The view never imports tkinter; it only calls methods on the Text widget it is given.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Callable, Optional, List
+
+__all__ = ["Message", "TranscriptModel", "TranscriptView"]
+
+MAX_MESSAGES = 5000     # records kept in memory
+MAX_RENDERED = 120      # messages kept in the Text widget while following the tail
+PAGE = 40               # messages materialized per scroll step
+
+# -------------------- model --------------------
+
+class Message:
+    __slots__ = ("seq", "who", "text", "ts")
+
+    def __init__(self, seq: int, who: str, text: str) -> None:
+        self.seq = seq
+        self.who = who
+        self.text = text
+        self.ts = time.time()
+
+class TranscriptModel:
+    def __init__(self, max_messages: int = MAX_MESSAGES) -> None:
+        self._msgs = deque(maxlen=max_messages)
+        self._next_seq = 0
+
+    def append(self, who: str, text: str) -> Message:
+        m = Message(self._next_seq, who, text)
+        self._next_seq += 1
+        self._msgs.append(m)
+        return m
+
+    @property
+    def first_seq(self) -> int:
+        return self._msgs[0].seq if self._msgs else self._next_seq
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    def get(self, seq: int) -> Optional[Message]:
+        i = seq - self.first_seq
+        if 0 <= i < len(self._msgs):
+            return self._msgs[i]
+        return None
+
+    def range(self, start: int, stop: int) -> List[Message]:
+        lo = max(start, self.first_seq) - self.first_seq
+        hi = min(stop, self._next_seq) - self.first_seq
+        return [self._msgs[i] for i in range(lo, hi)] if hi > lo else []
+
+    def __len__(self) -> int:
+        return len(self._msgs)
+
+# -------------------- view --------------------
+
+def _default_tag(who: str) -> str:
+    return "user" if who.strip().lower().startswith("you") else "assistant"
+
+class TranscriptView:
+    """Renders messages [lo, hi) of a TranscriptModel into a tk.Text."""
+
+    def __init__(self, text, model: TranscriptModel,
+                 scrollbar_set: Optional[Callable[[str, str], None]] = None,
+                 tag_for: Callable[[str], str] = _default_tag,
+                 max_rendered: int = MAX_RENDERED, page: int = PAGE) -> None:
+        self.text = text
+        self.model = model
+        self.tag_for = tag_for
+        self.max_rendered = max_rendered
+        self.page = page
+        self._scrollbar_set = scrollbar_set
+        self._paging = False
+        # Render the tail of whatever the model already holds (e.g. window re-created)
+        self.lo = self.hi = max(model.first_seq, model.next_seq - max_rendered)
+        self._insert_tail(model.range(self.lo, model.next_seq))
+        text.config(yscrollcommand=self._on_yscroll)
+
+    # -------- public --------
+    def append(self, who: str, text: str, jump: bool = False) -> Message:
+        """
+        Add a complete message to the model. It is rendered if the view follows the tail;
+        jump=True (e.g. the user's own message) re-attaches a view scrolled into history.
+        """
+        m = self.model.append(who, text)
+        if self.hi != m.seq:
+            if not jump:
+                return m
+            self.show_tail()
+            return m
+        if not (jump or self._at_bottom()):
+            # Reading history: leave the widget alone (it would grow without bound);
+            # _on_yscroll pages the new message in once the user scrolls down to it
+            return m
+        self._insert_tail([m])
+        self._trim_top(self.max_rendered)
+        self.text.see("end")
+        return m
+
+    def show_tail(self) -> None:
+        """Re-render the newest max_rendered messages and scroll to the end."""
+        self.clear()
+        self.lo = self.hi = max(self.model.first_seq, self.model.next_seq - self.max_rendered)
+        self._insert_tail(self.model.range(self.lo, self.model.next_seq))
+        self.text.see("end")
+
+    def clear(self) -> None:
+        self.text.config(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.config(state="disabled")
+        for seq in range(self.lo, self.hi):
+            self.text.mark_unset(self._mark(seq))
+        self.lo = self.hi = self.model.next_seq
+
+    # -------- rendering internals --------
+    @staticmethod
+    def _mark(seq: int) -> str:
+        return f"msg{seq}"
+
+    def _at_bottom(self) -> bool:
+        try:
+            return float(self.text.yview()[1]) >= 0.999
+        except Exception:
+            return True
+
+    def _insert_tail(self, msgs: List[Message]) -> None:
+        if not msgs:
+            return
+        self.text.config(state="normal")
+        for m in msgs:
+            start = self.text.index("end-1c")
+            self.text.insert("end", f"{m.who}: {m.text}\n", self.tag_for(m.who))
+            self.text.mark_set(self._mark(m.seq), start)
+        self.text.config(state="disabled")
+        self.hi = msgs[-1].seq + 1
+
+    def _insert_head(self, msgs: List[Message]) -> None:
+        if not msgs:
+            return
+        self.text.config(state="normal")
+        for m in reversed(msgs):
+            self.text.insert("1.0", f"{m.who}: {m.text}\n", self.tag_for(m.who))
+            self.text.mark_set(self._mark(m.seq), "1.0")  # right gravity: later head inserts push it down
+        self.text.config(state="disabled")
+        self.lo = msgs[0].seq
+
+    def _trim_top(self, keep: int) -> None:
+        excess = (self.hi - self.lo) - keep
+        if excess <= 0:
+            return
+        new_lo = self.lo + excess
+        self.text.config(state="normal")
+        self.text.delete("1.0", self._mark(new_lo))
+        self.text.config(state="disabled")
+        for seq in range(self.lo, new_lo):
+            self.text.mark_unset(self._mark(seq))
+        self.lo = new_lo
+
+    def _trim_bottom(self, keep: int) -> None:
+        excess = (self.hi - self.lo) - keep
+        if excess <= 0:
+            return
+        new_hi = self.hi - excess
+        self.text.config(state="normal")
+        self.text.delete(self._mark(new_hi), "end-1c")
+        self.text.config(state="disabled")
+        for seq in range(new_hi, self.hi):
+            self.text.mark_unset(self._mark(seq))
+        self.hi = new_hi
+
+    def _on_yscroll(self, first: str, last: str) -> None:
+        if self._scrollbar_set:
+            self._scrollbar_set(first, last)
+        if self._paging:
+            return
+        self._paging = True
+        try:
+            hard_cap = self.max_rendered + 2 * self.page
+            if float(first) <= 0.0 and self.lo > self.model.first_seq:
+                anchor = self._mark(self.lo)
+                self._insert_head(self.model.range(self.lo - self.page, self.lo))
+                self._trim_bottom(hard_cap)
+                self.text.yview(anchor)  # keep the message the user was reading in place
+            elif float(last) >= 1.0 and self.hi < self.model.next_seq:
+                self._insert_tail(self.model.range(self.hi, self.hi + self.page))
+                self._trim_top(hard_cap)
+        finally:
+            self._paging = False
@@ -2,20 +2,32 @@
 llm_toast_ui.py
 UI layer (tray icon + minimal Tk toast) that uses llm_toast_core for logic.
 Run this file to start the app.
+
+pystray/Pillow are imported on the tray thread so Tk setup and hotkey
+registration don't wait for them. Startup milestones (tk_ready, hotkey_ready,
+tray_visible) are logged; see llm_toast_bench_startup.py.
 """
 
-import threading, queue, time, ctypes
+import time
+_T0 = time.perf_counter()  # startup clock: taken before the heavy imports below
+
+import os, json, threading, ctypes, functools
 from ctypes import wintypes
 
-import pystray
-from pystray import MenuItem as Item, Menu as TrayMenu
-from PIL import Image, ImageDraw
 import tkinter as tk
 from tkinter import ttk
 from tkinter import font as tkfont
 
 import llm_toast_core as core
 import llm_toast_llm as llm
+from llm_toast_dispatch import TaskDispatcher, PRIORITY_HIGH, PRIORITY_NORMAL
+from llm_toast_transcript import TranscriptModel, TranscriptView
+from llm_toast_chat_queue import ChatSendQueue
+import llm_toast_workers as workers
+import llm_toast_profiles as profiles
+import llm_toast_prefetch as prefetch
+import llm_toast_cache as answer_cache
+import llm_toast_history as history
 
 # Optional session logger (per-chat-window markdown logs)
 try:
@@ -30,8 +42,13 @@ user32 = core.user32
 WM_HOTKEY = core.WM_HOTKEY
 
 APP_NAME = "ClipLLM Tray"
+WAKE_EVENT = "<<ClipLLMWake>>"
 POPUP_WIDTH_PX = 360
 POPUP_LIFETIME_MS = 8000
+POPUP_POOL_SIZE = 3       # max concurrent toasts; the oldest is recycled beyond this
+POPUP_FADE_START = 0.4
+STREAM_FRAME_MS = 50      # streaming toast re-wraps/re-sizes at most this often
+PREFETCH_JOIN_S = 15.0    # hotkey waits this long for a prefetch of the same text already in flight
 
 # -------- monitor positioning structs --------
 class RECT(ctypes.Structure):
@@ -59,8 +76,70 @@ GetMonitorInfoW.restype  = wintypes.BOOL
 
 MONITOR_DEFAULTTONEAREST = 2
 
+# -------- display-change watcher (hidden top-level window) --------
+# Display/work-area/DPI changes are broadcast only to top-level windows, so the hotkey
+# thread owns a hidden one; its message loop already dispatches to this window proc.
+WM_DISPLAYCHANGE, WM_SETTINGCHANGE, WM_DPICHANGED = 0x007E, 0x001A, 0x02E0
+LRESULT = ctypes.c_ssize_t
+WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+class WNDCLASSW(ctypes.Structure):
+    _fields_ = [("style",         wintypes.UINT),
+                ("lpfnWndProc",   WNDPROC),
+                ("cbClsExtra",    ctypes.c_int),
+                ("cbWndExtra",    ctypes.c_int),
+                ("hInstance",     wintypes.HINSTANCE),
+                ("hIcon",         wintypes.HICON),
+                ("hCursor",       wintypes.HANDLE),
+                ("hbrBackground", wintypes.HBRUSH),
+                ("lpszMenuName",  wintypes.LPCWSTR),
+                ("lpszClassName", wintypes.LPCWSTR)]
+
+DefWindowProcW = user32.DefWindowProcW
+DefWindowProcW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+DefWindowProcW.restype  = LRESULT
+
+RegisterClassW = user32.RegisterClassW
+RegisterClassW.argtypes = [ctypes.POINTER(WNDCLASSW)]
+RegisterClassW.restype  = wintypes.ATOM
+
+CreateWindowExW = user32.CreateWindowExW
+CreateWindowExW.argtypes = [wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+                            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                            wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID]
+CreateWindowExW.restype  = wintypes.HWND
+
+def create_display_watch_window(on_change):
+    """
+    Create a hidden top-level window on the calling thread that calls on_change(msg) for
+    WM_DISPLAYCHANGE / WM_SETTINGCHANGE / WM_DPICHANGED. Returns (hwnd, wndproc); keep
+    wndproc referenced for the window's lifetime.
+    """
+    @WNDPROC
+    def wndproc(hwnd, msg, wparam, lparam):
+        if msg in (WM_DISPLAYCHANGE, WM_SETTINGCHANGE, WM_DPICHANGED):
+            try:
+                on_change(msg)
+            except Exception:
+                pass
+        return DefWindowProcW(hwnd, msg, wparam, lparam)
+
+    hinst = ctypes.windll.kernel32.GetModuleHandleW(None)
+    wc = WNDCLASSW()
+    wc.lpfnWndProc = wndproc
+    wc.hInstance = hinst
+    wc.lpszClassName = "ClipLLMDisplayWatch"
+    RegisterClassW(ctypes.byref(wc))  # fails harmlessly if already registered
+    hwnd = CreateWindowExW(0, wc.lpszClassName, "ClipLLM display watch", 0,
+                           0, 0, 0, 0, None, None, hinst, None)
+    if not hwnd:
+        log.warning("Display watch window creation failed (err=%d)", ctypes.get_last_error())
+    return hwnd, wndproc
+
 # --------------------------- UI helpers ---------------------------
+@functools.lru_cache(maxsize=4)
 def make_tray_icon(size=28):
+    from PIL import Image, ImageDraw
     img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
     d = ImageDraw.Draw(img)
     d.rounded_rectangle((1, 3, size-2, size-5), radius=6, fill=(64, 128, 224, 255))
@@ -68,11 +147,229 @@ def make_tray_icon(size=28):
     d.text((6, 7), "LL", fill=(255, 255, 255, 255))
     return img
 
+class _Toast:
+    """One pre-built toast window; PopupManager reconfigures and re-shows it instead of rebuilding."""
+    BG, FG_TITLE, FG_BODY, BORDER = "#e0e0e0", "#111111", "#222222", "#d4d4d4"
+
+    def __init__(self, mgr: "PopupManager"):
+        self.mgr = mgr
+        w = tk.Toplevel(mgr.root)
+        w.withdraw()
+        w.overrideredirect(True)
+        w.attributes("-topmost", True)
+        try: w.attributes("-alpha", 0.0)
+        except Exception: pass
+        self.win = w
+
+        # A simple frame with a 1px border; title + body (no buttons)
+        frame = tk.Frame(w, bg=self.BG, highlightthickness=1, highlightbackground=self.BORDER, bd=0, padx=8, pady=8)
+        frame.pack(fill="both", expand=True)
+        self.title_lbl = tk.Label(frame, bg=self.BG, fg=self.FG_TITLE, font=mgr.title_font, anchor="w", justify="left")
+        self.title_lbl.pack(fill="x")
+        self.body_lbl = tk.Label(frame, bg=self.BG, fg=self.FG_BODY, wraplength=POPUP_WIDTH_PX, justify="left",
+                                 font=mgr.body_font)
+        self.body_lbl.pack(fill="both", expand=True, pady=(4, 0))
+
+        self.busy = False
+        self.owner = None       # ToastHandle currently streaming into this toast, if any
+        self.shown_at = 0.0
+        self.inside = False
+        self.anchor = (0, 0)    # cursor position the toast was opened at
+        self.size = (0, 0)
+        self._close_job = None
+        self._fade_job = None
+        w.bind("<Enter>", self._on_enter)
+        w.bind("<Leave>", self._on_leave)
+
+    # Auto-close with hover pause
+    def _on_enter(self, _e=None):
+        self.inside = True
+
+    def _on_leave(self, _e=None):
+        self.inside = False
+        if self.owner is None:      # a streaming toast arms its close in ToastHandle._finish
+            self.arm_close()
+
+    def arm_close(self):
+        self._cancel(self._close_job)
+        self._close_job = self.win.after(POPUP_LIFETIME_MS, self._auto_close)
+
+    def _auto_close(self):
+        self._close_job = None
+        if not self.inside:
+            self.hide()
+            log.debug("Popup auto-closed")
+
+    def _cancel(self, job):
+        if job is not None:
+            try: self.win.after_cancel(job)
+            except Exception: pass
+
+    def show(self, title: str, body: str, auto_close: bool = True):
+        self.busy = True
+        self.owner = None
+        self.shown_at = time.perf_counter()
+        self.inside = False
+        self.anchor = self.mgr._get_cursor()
+        self.size = (0, 0)
+        self.title_lbl.config(text=title)
+        self.set_body(body)
+        self.win.deiconify()
+        self.win.lift()
+        if auto_close:
+            self.arm_close()
+        self._fade(POPUP_FADE_START)
+
+    def set_body(self, body: str):
+        """Re-wrap the body; size + monitor clamping are redone only when the size changes."""
+        self.body_lbl.config(text=body)
+        # One layout pass on this toast only
+        self.win.update_idletasks()
+        width = min(POPUP_WIDTH_PX + 16, self.win.winfo_reqwidth())
+        height = max(self.win.winfo_reqheight(), 80)
+        if (width, height) != self.size:
+            self.size = (width, height)
+            px, py = self.mgr.place_at(self.anchor, width, height)
+            self.win.geometry(f"{width}x{height}+{int(px)}+{int(py)}")
+
+    def _fade(self, a):
+        # Starts partly opaque so the toast is readable on the first frame
+        self._fade_job = None
+        try:
+            self.win.attributes("-alpha", a)
+            if a < 1.0:
+                self._fade_job = self.win.after(14, self._fade, min(a + 0.2, 1.0))
+        except Exception:
+            pass
+
+    def hide(self):
+        self._cancel(self._close_job); self._close_job = None
+        self._cancel(self._fade_job); self._fade_job = None
+        self.owner = None
+        try:
+            self.win.withdraw()
+            self.win.attributes("-alpha", 0.0)
+        except Exception:
+            pass
+        self.busy = False
+
+class ToastHandle:
+    """
+    A toast that grows as text arrives. append() may be called from any thread; chunks are
+    rendered at most once per STREAM_FRAME_MS on the Tk thread. finalize()/error() end the
+    stream, and only then does the auto-close timer start.
+    """
+    def __init__(self, mgr: "PopupManager", title: str):
+        self.mgr = mgr
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._text = ""
+        self._scheduled = False
+        self._last_render = 0.0
+        self._t_open = time.perf_counter()
+        self._first_text_logged = False
+        self._toast = mgr._acquire()
+        self._toast.show(title, "…", auto_close=False)
+        self._toast.owner = self
+
+    def _live(self) -> bool:
+        # False once the pool recycled our window for another answer
+        return self._toast.owner is self
+
+    # -------- producer side (any thread) --------
+    def append(self, chunk: str):
+        if not chunk:
+            return
+        with self._lock:
+            self._chunks.append(chunk)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.mgr.post(self._render)
+
+    def finalize(self, text: str = None, title: str = None):
+        """End the stream; text (the full answer), if given, replaces what was streamed."""
+        self.mgr.post(lambda: self._finish(text, title=title))
+
+    def error(self, message: str):
+        self.mgr.post(lambda: self._finish(message, title="LLM error"))
+
+    # -------- Tk thread --------
+    def _take(self) -> str:
+        with self._lock:
+            new = "".join(self._chunks)
+            self._chunks.clear()
+            self._scheduled = False
+        return new
+
+    def _render(self):
+        if not self._live():
+            return
+        wait_ms = STREAM_FRAME_MS - (time.perf_counter() - self._last_render) * 1000.0
+        if wait_ms > 0:
+            self._toast.win.after(int(wait_ms) + 1, self._render)
+            return
+        new = self._take()
+        if not new:
+            return
+        self._text += new
+        self._toast.set_body(self._text)
+        self._last_render = time.perf_counter()
+        if not self._first_text_logged:
+            self._first_text_logged = True
+            log.info("[toast] first text visible %.1f ms after open", (self._last_render - self._t_open) * 1000.0)
+
+    def _finish(self, text: str = None, title: str = None):
+        if not self._live():
+            return
+        self._text += self._take()
+        if text is not None and text.strip() != self._text.strip():
+            self._text = text
+        if title:
+            self._toast.title_lbl.config(text=title)
+        self._toast.set_body(self._text or "(empty response)")
+        self._toast.owner = None
+        self._toast.arm_close()
+        log.info("[toast] stream finished %.1f ms after open", (time.perf_counter() - self._t_open) * 1000.0)
+
 class PopupManager:
-    """A tiny, border-light toast that appears near the cursor and clamps to the active monitor."""
-    def __init__(self, root):
+    """
+    A tiny, border-light toast that appears near the cursor and clamps to the active monitor.
+    Toast windows come from a small pool (at most POPUP_POOL_SIZE visible; the oldest is recycled),
+    fonts are created once, and monitor work areas are cached until the display configuration changes.
+    """
+    def __init__(self, root, post):
         self.root = root
-        self.popups = []
+        self.post = post  # thread-safe: run a callable on the Tk thread
+        self.pool = []
+        self._title_font = None
+        self._body_font = None
+        self._work_areas = {}  # HMONITOR -> (x, y, w, h); cleared by invalidate_monitors()
+
+    @property
+    def title_font(self):
+        if self._title_font is None:
+            self._title_font = tkfont.Font(root=self.root, family="Segoe UI", size=10, weight="bold")
+        return self._title_font
+
+    @property
+    def body_font(self):
+        if self._body_font is None:
+            self._body_font = tkfont.Font(root=self.root, family="Segoe UI", size=9)
+        return self._body_font
+
+    def prewarm(self):
+        """Build the first pooled toast ahead of time (call when the Tk loop is idle)."""
+        try:
+            if not self.pool:
+                self.pool.append(_Toast(self))
+        except Exception:
+            core.log_exc("PopupManager.prewarm failed")
+
+    # -------- monitor geometry --------
+    def invalidate_monitors(self, *_):
+        """Forget cached work areas (display/DPI/work-area change). Safe from any thread."""
+        self._work_areas.clear()
 
     def _get_cursor(self):
         # Use Win32 for global cursor (multi-monitor safe)
@@ -80,106 +377,79 @@ class PopupManager:
         user32.GetCursorPos(ctypes.byref(pt))
         return pt.x, pt.y
 
-    def _place_on_active_monitor(self, w: tk.Toplevel, width: int, height: int):
-        x, y = self._get_cursor()
-
-        # Get monitor work area containing the cursor
+    def work_area_at(self, x: int, y: int):
+        """Work area (x, y, w, h) of the monitor containing the point, or None."""
         hmon = MonitorFromPoint(POINT(x=x, y=y), MONITOR_DEFAULTTONEAREST)
-        mi = MONITORINFO(); mi.cbSize = ctypes.sizeof(MONITORINFO)
-        if not GetMonitorInfoW(hmon, ctypes.byref(mi)):
+        area = self._work_areas.get(hmon)
+        if area is None:
+            mi = MONITORINFO(); mi.cbSize = ctypes.sizeof(MONITORINFO)
+            if not GetMonitorInfoW(hmon, ctypes.byref(mi)):
+                return None
+            area = (mi.rcWork.left, mi.rcWork.top,
+                    mi.rcWork.right - mi.rcWork.left, mi.rcWork.bottom - mi.rcWork.top)
+            self._work_areas[hmon] = area
+        return area
+
+    def place_at(self, anchor, width: int, height: int):
+        x, y = anchor
+        area = self.work_area_at(x, y)
+        if area is None:
             # Fallback: don't clamp, just use cursor with small offset
             return x + 12, y + 12
-
-        wx, wy = mi.rcWork.left, mi.rcWork.top
-        ww, wh = mi.rcWork.right - mi.rcWork.left, mi.rcWork.bottom - mi.rcWork.top
-
+        wx, wy, ww, wh = area
         # Offset a bit from the cursor, then clamp inside work area
         px = min(max(x + 12, wx), wx + ww - width - 8)
         py = min(max(y + 12, wy), wy + wh - height - 8)
         return px, py
 
-    def show(self, title: str, body: str):
+    # -------- toasts --------
+    def _acquire(self) -> _Toast:
+        for t in self.pool:
+            if not t.busy:
+                return t
+        if len(self.pool) < POPUP_POOL_SIZE:
+            t = _Toast(self)
+            self.pool.append(t)
+            return t
+        # Recycle the oldest, preferring toasts that are not mid-stream
+        oldest = min(self.pool, key=lambda t: (t.owner is not None, t.shown_at))
+        oldest.hide()
+        return oldest
+
+    def open_stream(self, title: str) -> ToastHandle:
+        """Show a toast right away and return a handle to stream text into it (Tk thread only)."""
+        return ToastHandle(self, title)
+
+    def show(self, title: str, body: str, t_ready: float = None):
+        """Show a toast. t_ready (perf_counter when the answer became available) enables latency logging."""
         try:
-            # Minimal, border-light toast
-            bg = "#e0e0e0"
-            fg_title = "#111111"
-            fg_body  = "#222222"
-            border   = "#d4d4d4"
-
-            w = tk.Toplevel(self.root)
-            w.overrideredirect(True)
-            w.attributes("-topmost", True)
-            try: w.attributes("-alpha", 0.0)
-            except Exception: pass
-
-            # A simple frame with a 1px border
-            frame = tk.Frame(w, bg=bg, highlightthickness=1, highlightbackground=border, bd=0, padx=8, pady=8)
-            frame.pack(fill="both", expand=True)
-
-            # Title + body (no buttons)
-            title_lbl = tk.Label(frame, text=title, bg=bg, fg=fg_title, font=("Segoe UI", 10, "bold"), anchor="w", justify="left")
-            title_lbl.pack(fill="x")
-            body_lbl  = tk.Label(frame, text=body, bg=bg, fg=fg_body, wraplength=POPUP_WIDTH_PX, justify="left", font=("Segoe UI", 9))
-            body_lbl.pack(fill="both", expand=True, pady=(4, 0))
-
-            # Size + placement near cursor on the active monitor
-            self.root.update_idletasks()
-            w.update_idletasks()
-            width  = min(POPUP_WIDTH_PX + 16, w.winfo_reqwidth())
-            height = max(w.winfo_reqheight(), 80)
-
-            px, py = self._place_on_active_monitor(w, width, height)
-            w.geometry(f"{width}x{height}+{int(px)}+{int(py)}")
-
-            # Track + auto-close with hover pause
-            self.popups.append(w)
-            def on_destroy(_=None):
-                if w in self.popups: self.popups.remove(w)
-            w.bind("<Destroy>", on_destroy)
-
-            state = {"inside": False}
-            def arm():
-                if not state["inside"]:
-                    try:
-                        w.destroy()
-                        log.debug("Popup auto-closed")
-                    except Exception:
-                        pass
-
-            def _on_enter(_e=None): state["inside"] = True
-            def _on_leave(_e=None):
-                state["inside"] = False
-                w.after(POPUP_LIFETIME_MS, arm)
-
-            w.bind("<Enter>", _on_enter)
-            w.bind("<Leave>", _on_leave)
-            w.after(POPUP_LIFETIME_MS, arm)
-
-            # Fade-in
-            def fade(a=0.0):
-                try:
-                    a = min(a + 0.16, 1.0)
-                    w.attributes("-alpha", a)
-                    if a < 1.0:
-                        w.after(14, fade, a)
-                except Exception:
-                    pass
-            fade()
-
+            t0 = t_ready if t_ready is not None else time.perf_counter()
+            self._acquire().show(title, body)
+            log.info("[toast] visible %.1f ms after answer ready", (time.perf_counter() - t0) * 1000.0)
         except Exception:
             core.log_exc("PopupManager.show failed")
             
             
 class ChatWindow:
-    def __init__(self, root, center_cb):
+    def __init__(self, root, center_cb, post, on_background=None):
         self.root = root
         self.center_cb = center_cb
+        self.post = post  # thread-safe: run a callable on the Tk thread
         self.win = None
         self.out = None   # transcript (tk.Text)
         self.inp = None   # entry (tk.Entry)
-        self.sending = False
-        # Session id for GPT-5 Responses API; persists until window is closed
-        self.prev_response_id = None
+        self.transcript = TranscriptModel()  # survives hide/show; reset on close
+        self.view = None  # TranscriptView rendering a bounded window of the transcript
+        self.status = None  # queue status line under the entry
+        # Messages queue while a reply is pending; the queue owns the Responses API
+        # session id (prev_response_id), which persists until the window is closed.
+        self.sendq = ChatSendQueue(
+            # on_background: a background reply that outlives the turn is collected later
+            send_fn=lambda text, prev: llm.chat(text, prev_response_id=prev, on_background=on_background),
+            on_reply=self._on_reply,
+            on_state=self._on_queue_state,
+            spawn=lambda fn, name: workers.default_pool().submit(fn, name=name),
+        )
         # Per-window session logger (markdown transcript)
         self.session = None
 
@@ -267,7 +537,6 @@ class ChatWindow:
             style="Dark.Vertical.TScrollbar" if style else None
         )
         scroll.pack(side="right", fill="y")
-        self.out.config(yscrollcommand=scroll.set)
         
 
         # Color tags for speakers
@@ -279,6 +548,7 @@ class ChatWindow:
             self.out.tag_raise("user")
         except Exception:
            pass
+        self.view = TranscriptView(self.out, self.transcript, scrollbar_set=scroll.set)
 
         self.inp = tk.Entry(
             frame, bg=entry_bg, fg="#ffffff",
@@ -289,7 +559,12 @@ class ChatWindow:
 
         self.inp.pack(fill="x", pady=(8,0))
 
+        self.status = tk.Label(frame, text="", anchor="w", bg=bg_main, fg="#8a8a8a",
+                               font=(ui_font.actual("family"), 9))
+        self.status.pack(fill="x")
+
         self.inp.bind("<Return>", self._on_enter)
+        self.inp.bind("<Control-Return>", lambda e: self._on_enter(e, parallel=True))
         self.inp.bind("<Escape>", lambda e: self.hide())
 
         # position at center of active monitor
@@ -332,7 +607,10 @@ class ChatWindow:
         # Clear session only when the window is actually closed via the titlebar
 
         def _on_close():
-            self.prev_response_id = None
+            self.sendq.reset()
+            self.transcript = TranscriptModel()
+            self.view = None
+            self.status = None
             try:
                 if self.session:
                     try:
@@ -362,80 +640,67 @@ class ChatWindow:
         # Do NOT clear prev_response_id here; keep session across hides
 
     def _append(self, who: str, text: str):
-        if not self.out: return
-        self.out.config(state="normal")
-        
-        start = self.out.index("end-1c")
-        self.out.insert("end", f"{who}: {text}\n")
-        end = self.out.index("end-1c")
-        tag = "user" if who.strip().lower().startswith("you") else "assistant"
-        
-        try:
-            self.out.tag_add(tag, start, end)
-        except Exception:
-            pass
-        self.out.see("end")
-        self.out.config(state="disabled")
+        if not self.view: return
+        # The user's own message always brings the view back to the tail
+        self.view.append(who, text, jump=who.strip().lower().startswith("you"))
 
-    def _on_enter(self, _evt=None):
-        if self.sending or not self.inp: return "break"
+    def _on_enter(self, _evt=None, parallel: bool = False):
+        if not self.inp: return "break"
         msg = self.inp.get().strip()
         if not msg: return "break"
         self.inp.delete(0, "end")
-        self._append("You", msg)
-        
-        
-        
+        # Ctrl+Enter asks a side question: sent right away, outside the queue
+        self._append("You (side)" if parallel else "You", msg)
+
         # Log the user's query to the single append-only chat log
         if self.session:
             try:
                 self.session.log_user(msg)
             except Exception:
                 pass
-        
-        
-        self.sending = True
-        self.inp.config(state="disabled")
-        threading.Thread(target=self._send_worker, args=(msg,), daemon=True).start()
+
+        # Don't pass session into llm.chat—UI owns logging to avoid duplication
+        self.sendq.submit(msg, parallel=parallel)
         return "break"
 
-    def _send_worker(self, msg: str):
-        try:
-            
-            
-            # Don't pass session into llm.chat—UI owns logging to avoid duplication
-            reply, rid = llm.chat(
-                msg,
-                prev_response_id=self.prev_response_id
-            )
-            
-            
-            if rid:
-                self.prev_response_id = rid
-       
-        
-            # Log the assistant reply to file
-            if self.session:
-                try:
-                    self.session.log_assistant(reply)
-                except Exception:
-                    pass
-        
-        
-        
-        except Exception as e:
-            reply = f"Error: {e}"
-            
-        #print(reply)
+    def _on_reply(self, pending, reply: str):
+        # Worker thread: log to file, then hand the reply to Tk
+        if self.session:
+            try:
+                self.session.log_assistant(reply)
+            except Exception:
+                pass
 
         def back():
             if not self.win or not self.win.winfo_exists():
                 return
-            self._append("Assistant", reply)
-            self.inp.config(state="normal")
-            self.inp.focus_set()
-            self.sending = False
-        self.root.after(0, back)
+            self._append("Assistant (side)" if pending.parallel else "Assistant", reply)
+        self.post(back)
+
+    def add_recovered(self, prompt: str, reply: str):
+        """Tk thread: show a reply collected later (background /responses after a restart or a timed-out turn)."""
+        who = "Assistant (recovered)"
+        text = f"[{prompt}] {reply}" if prompt else reply
+        if self.view:
+            self.view.append(who, text)
+        else:
+            self.transcript.append(who, text)  # rendered when the window opens
+
+    def _on_queue_state(self, queued: int, in_flight: int, oldest_wait_s: float):
+        if not queued and not in_flight:
+            text = ""
+        else:
+            parts = []
+            if in_flight:
+                parts.append(f"{in_flight} waiting for reply")
+            if queued:
+                parts.append(f"{queued} queued (oldest {oldest_wait_s:.0f}s)")
+            text = " · ".join(parts)
+
+        def back():
+            if self.status is not None and self.win and self.win.winfo_exists():
+                self.status.config(text=text)
+        self.post(back)
             
           
             
@@ -443,20 +708,105 @@ class ChatWindow:
             
             
 
+# --------------------------- Recent selections picker ---------------------------
+class HistoryPicker:
+    """Small list of recent selections: Explain (Enter / double-click) or Compare two."""
+
+    def __init__(self, root, center_cb, on_explain, on_compare):
+        self.root = root
+        self.center_cb = center_cb
+        self.on_explain = on_explain   # (entry)
+        self.on_compare = on_compare   # (newer_entry, older_entry)
+        self.win = None
+        self.entries = []
+
+    def show(self, entries):
+        self.entries = list(entries)
+        if self.win is None or not self.win.winfo_exists():
+            self._build()
+        self.lst.delete(0, "end")
+        for e in self.entries:
+            when = time.strftime("%H:%M", time.localtime(e.ts))
+            mark = "✓" if e.answer is not None else " "
+            self.lst.insert("end", f"{when} {mark} {e.preview}" + (f"  ({e.chars:,} chars)" if e.chars > 80 else ""))
+        if self.entries:
+            self.lst.selection_set(0)
+        self.win.deiconify(); self.win.lift()
+        try: self.win.focus_force()
+        except Exception: pass
+        self.lst.focus_set()
+
+    def _build(self):
+        w = tk.Toplevel(self.root)
+        self.win = w
+        w.title("Recent selections")
+        w.attributes("-topmost", True)
+        bg = "#efefef"; border = "#cfcfcf"
+        frame = tk.Frame(w, bg=bg, padx=10, pady=10, highlightthickness=1, highlightbackground=border, bd=0)
+        frame.pack(fill="both", expand=True)
+        self.lst = tk.Listbox(frame, width=70, height=12, selectmode="extended", activestyle="none")
+        self.lst.pack(fill="both", expand=True)
+        btn_row = tk.Frame(frame, bg=bg)
+        btn_row.pack(fill="x", pady=(8, 0))
+        tk.Button(btn_row, text="Explain", width=10, command=self._explain).pack(side="left")
+        tk.Button(btn_row, text="Compare", width=10, command=self._compare).pack(side="left", padx=(6, 0))
+        tk.Button(btn_row, text="Close", width=10, command=w.withdraw).pack(side="right")
+        self.lst.bind("<Return>", lambda _e: self._explain())
+        self.lst.bind("<Double-Button-1>", lambda _e: self._explain())
+        w.bind("<Escape>", lambda _e: w.withdraw())
+        w.protocol("WM_DELETE_WINDOW", w.withdraw)
+        w.update_idletasks()
+        width, height = w.winfo_reqwidth(), w.winfo_reqheight()
+        px, py = self.center_cb(width, height)
+        w.geometry(f"{width}x{height}+{int(px)}+{int(py)}")
+
+    def _selected(self):
+        return [self.entries[i] for i in self.lst.curselection() if i < len(self.entries)]
+
+    def _explain(self):
+        sel = self._selected()
+        if sel:
+            self.win.withdraw()
+            self.on_explain(sel[0])
+
+    def _compare(self):
+        sel = self._selected()
+        if len(sel) == 2:
+            self.win.withdraw()
+            self.on_compare(sel[0], sel[1])
+
+def compare_summary(newer: str, older: str, max_lines: int = 12) -> str:
+    """Local, request-free comparison of two selections (similarity + changed lines)."""
+    import difflib
+    a, b = older.splitlines(), newer.splitlines()
+    ratio = difflib.SequenceMatcher(None, older, newer, autojunk=False).quick_ratio()
+    changed = [ln for ln in difflib.unified_diff(a, b, lineterm="", n=0)
+               if ln[:1] in "+-" and not ln.startswith(("+++", "---"))]
+    head = f"~{ratio:.0%} similar; {sum(1 for l in changed if l[0] == '-')} line(s) removed, " \
+           f"{sum(1 for l in changed if l[0] == '+')} added."
+    if not changed:
+        return head
+    more = f"\n… {len(changed) - max_lines} more" if len(changed) > max_lines else ""
+    return head + "\n" + "\n".join(l[:120] for l in changed[:max_lines]) + more
+
 # --------------------------- App (UI) ---------------------------
 class App:
     def __init__(self):
         log.debug("UI App.__init__ (main thread)")
+        self._startup_marks = {}
         # Tk on main thread
         self.root = tk.Tk()
         self.root.withdraw()
         self.root.attributes("-alpha", 0.0)
+        self._mark_startup("tk_ready")
 
-        self.popup_mgr = PopupManager(self.root)
+        # Event-driven task pump: other threads post(), a virtual event wakes Tk to drain
+        self.dispatcher = TaskDispatcher(wake=self._wake_tk)
+        self.root.bind(WAKE_EVENT, lambda _e: self.dispatcher.drain())
+        self.root.after_idle(self.dispatcher.drain)  # anything posted before mainloop started
 
-        # Task queue for moving work to Tk thread
-        self.tasks = queue.Queue()
-        self.root.after(30, self._drain_tasks)
+        self.popup_mgr = PopupManager(self.root, post=self.post)
+        self.root.after_idle(self.popup_mgr.prewarm)
 
         # Hotkey
         self.hotkey_enabled = True
@@ -467,10 +817,29 @@ class App:
         # Chat hotkey (distinct id; choose a combo unlikely to conflict)
         self.chat_hotkey_id = 1002
         self.chat_hotkey_label = "Ctrl+Alt+M"
-        self.chat = ChatWindow(self.root, center_cb=self._center_on_active_monitor)
+        self.chat = ChatWindow(self.root, center_cb=self._center_on_active_monitor, post=self.post,
+                               on_background=self._watch_background)
 
-        # Tray
-        self.icon = pystray.Icon(
+        # Tray (built on the tray thread; see _run_tray)
+        self.icon = None
+
+        # Background warm-up (started once the tray icon is visible)
+        self._warmup_cancel = threading.Event()
+
+        # Opt-in speculative explain of copied text (started once the tray icon is visible)
+        self.prefetcher = None
+
+        # Recent selections ring + picker (Ctrl+Alt+H)
+        self.history = history.from_settings()
+        self.history_hotkey_id = 1003
+        self.history_hotkey_label = "Ctrl+Alt+H"
+        self.picker = HistoryPicker(self.root, center_cb=self._center_on_active_monitor,
+                                    on_explain=self._explain_from_history, on_compare=self._compare_from_history)
+
+    def _build_tray_icon(self):
+        import pystray
+        from pystray import MenuItem as Item, Menu as TrayMenu
+        return pystray.Icon(
             APP_NAME,
             icon=make_tray_icon(),
             title=APP_NAME,
@@ -478,15 +847,70 @@ class App:
             menu=TrayMenu(
                 Item(lambda i: f"Hotkey: {self.hotkey_label or '…'}", None, enabled=False),
                 pystray.Menu.SEPARATOR,
-                Item("Open Chat", self._toggle_chat),
-                Item("Options...", self._open_options),
+                Item("Open Chat", self._on_tk(self._toggle_chat)),
+                Item("Recent selections...", self._on_tk(self._open_history), enabled=lambda i: self.history is not None),
+                Item("Options...", self._on_tk(self._open_options)),
+                Item("Explain profile", TrayMenu(*[
+                    Item(name.capitalize(), self._set_profile(name),
+                         checked=lambda i, n=name: profiles.selected() == n, radio=True)
+                    for name in [profiles.AUTO] + profiles.PROFILE_NAMES
+                ])),
+                Item("Prefetch on copy", self._toggle_prefetch, checked=lambda i: self.prefetcher is not None),
                 Item("Enable Hotkey", self._toggle_hotkey, checked=lambda i: self.hotkey_enabled),
-                Item("Quit", self._quit)
+                Item("Quit", self._on_tk(self._quit))
             )
 
 
         )
 
+    def _set_profile(self, name: str):
+        def cb(icon=None, item=None):
+            profiles.select(name)
+            log.info("Explain profile set to %s", name)
+        return cb
+
+    def _toggle_prefetch(self, icon=None, item=None):
+        on = self.prefetcher is None
+        prefetch.set_enabled(on)
+        if on:
+            self._start_prefetch()
+        else:
+            self._stop_prefetch()
+
+    def _start_prefetch(self):
+        if self.prefetcher is not None:
+            return
+        def spawn(fn, name):
+            # ABORT: a full queue skips the prefetch instead of dropping chat or resume work
+            return workers.default_pool().submit(fn, name=name, policy=workers.ABORT)
+        def cache_stats():
+            cache = answer_cache.default_cache()
+            return cache.stats() if cache is not None else {}
+        self.prefetcher = prefetch.ClipboardPrefetcher(
+            fetch=llm.prefetch, read_seq=core.clipboard_sequence, read_text=core.read_clipboard_text,
+            spawn=spawn, excluded=core.clipboard_excluded, cache_stats=cache_stats)
+        self.prefetcher.start()
+
+    def _stop_prefetch(self):
+        pf, self.prefetcher = self.prefetcher, None
+        if pf is not None:
+            pf.stop()
+
+    # Startup milestones
+    def _mark_startup(self, name: str):
+        """Record a startup milestone (ms since module import began)."""
+        ms = (time.perf_counter() - _T0) * 1000.0
+        self._startup_marks[name] = round(ms, 1)
+        log.info("[startup] %s at %.1f ms", name, ms)
+        bench_path = os.getenv("CLIPLLM_STARTUP_BENCH")
+        if bench_path and {"tray_visible", "hotkey_ready"} <= self._startup_marks.keys():
+            try:
+                with open(bench_path, "w", encoding="utf-8") as f:
+                    json.dump({"marks_ms": self._startup_marks, "epoch_end": time.time()}, f)
+            except Exception:
+                core.log_exc("Writing startup bench file failed")
+            self.post(self._quit)
+
     # Tray actions
     def _toggle_hotkey(self, icon=None, item=None):
         self.hotkey_enabled = not self.hotkey_enabled
@@ -498,7 +922,8 @@ class App:
             self.hotkey_id = None
             self.hotkey_label = "(disabled)"
         try:
-            self.icon.update_menu()
+            if self.icon:
+                self.icon.update_menu()
         except Exception:
             core.log_exc("icon.update_menu failed")
 
@@ -586,23 +1011,29 @@ class App:
     def _center_on_active_monitor(self, width: int, height: int):
         # Center relative to the monitor containing the cursor
         pt = POINT(); user32.GetCursorPos(ctypes.byref(pt))
-        hmon = MonitorFromPoint(POINT(x=pt.x, y=pt.y), MONITOR_DEFAULTTONEAREST)
-        mi = MONITORINFO(); mi.cbSize = ctypes.sizeof(MONITORINFO)
-        if GetMonitorInfoW(hmon, ctypes.byref(mi)):
-            wx, wy = mi.rcWork.left, mi.rcWork.top
-            ww, wh = mi.rcWork.right - mi.rcWork.left, mi.rcWork.bottom - mi.rcWork.top
+        area = self.popup_mgr.work_area_at(pt.x, pt.y)
+        if area:
+            wx, wy, ww, wh = area
             return wx + (ww - width)//2, wy + (wh - height)//2
         return pt.x + 20, pt.y + 20
 
     def _quit(self, icon=None, item=None):
         log.info("Quit requested")
+        self._warmup_cancel.set()
+        self._stop_prefetch()
+        try:
+            # Let in-flight LLM work finish briefly; queued work is cancelled
+            workers.shutdown_default_pool(timeout_s=2.0)
+        except Exception:
+            pass
         try:
             if self.hotkey_id is not None:
                 core.unregister_hotkey(self.hotkey_id)
         except Exception:
             pass
         try:
-            self.icon.stop()
+            if self.icon:
+                self.icon.stop()
         except Exception:
             pass
         try:
@@ -614,6 +1045,7 @@ class App:
     def _register_hotkey(self):
         try:
             self.hotkey_id, self.hotkey_label = core.register_first_available()
+            self._mark_startup("hotkey_ready")
         except SystemExit as e:
             self.hotkey_id, self.hotkey_label = None, "(none)"
             log.error("Hotkey registration failed: %s", e)
@@ -628,15 +1060,28 @@ class App:
             err = ctypes.get_last_error()
             log.warning("[hotkey] Could not register chat hotkey %s (err=%d)", self.chat_hotkey_label, err)
             ctypes.set_last_error(0)
+        VK_H = 0x48
+        if self.history is not None:
+            if user32.RegisterHotKey(None, self.history_hotkey_id, MOD_CONTROL | MOD_ALT | MOD_NOREPEAT, VK_H):
+                log.info("[hotkey] Registered (history): %s (id=%d)", self.history_hotkey_label, self.history_hotkey_id)
+            else:
+                log.warning("[hotkey] Could not register history hotkey %s (err=%d)",
+                            self.history_hotkey_label, ctypes.get_last_error())
+                ctypes.set_last_error(0)
             
         try:
-            self.icon.update_menu()
+            if self.icon:
+                self.icon.update_menu()
         except Exception:
             core.log_exc("icon.update_menu during registration failed")
 
     def _hotkey_loop(self):
         log.debug("Hotkey loop starting (UI)")
         self._register_hotkey()
+        try:
+            self._display_watch = create_display_watch_window(self.popup_mgr.invalidate_monitors)
+        except Exception:
+            core.log_exc("Display watch window setup failed")
         msg = wintypes.MSG()
         while True:
             try:
@@ -649,12 +1094,15 @@ class App:
                     continue
                 if msg.message == WM_HOTKEY and self.hotkey_id and msg.wParam == self.hotkey_id and self.hotkey_enabled:
                     log.info("[hotkey] Triggered")
-                    self.tasks.put(self._on_hotkey)
+                    self.post(self._on_hotkey, PRIORITY_HIGH)
                     
                     
                 elif msg.message == WM_HOTKEY and msg.wParam == self.chat_hotkey_id and self.hotkey_enabled:
                     log.info("[hotkey] Chat triggered")
-                    self.tasks.put(self._toggle_chat)
+                    self.post(self._toggle_chat)
+                elif msg.message == WM_HOTKEY and msg.wParam == self.history_hotkey_id and self.hotkey_enabled:
+                    log.info("[hotkey] History triggered")
+                    self.post(self._open_history)
                     
                 user32.TranslateMessage(ctypes.byref(msg))
                 user32.DispatchMessageW(ctypes.byref(msg))
@@ -665,18 +1113,92 @@ class App:
     # Selection capture on Tk thread
     def _on_hotkey(self):
         log.debug("_on_hotkey (UI) entered")
+        # The capture's copy and restore must not look like new clipboard content
+        pf = self.prefetcher
+        if pf is not None:
+            pf.pause()
         try:
-            sel, original = core.attempt_copy_via_wmcopy_and_sendinput(max_wait_ms=500)
+            # Copies the selection and puts the user's clipboard back before any LLM work
+            cap = core.capture_selection(max_wait_ms=500)
+        except Exception:
+            core.log_exc("_on_hotkey capture failed in UI")
+            return
+        finally:
+            if pf is not None:
+                pf.resume()
+        try:
+            sel = cap.text
             if not sel:
                 log.debug("No selection captured; no popup")
                 return
-            answer = core.ask_llm(sel)
-            self.popup_mgr.show("LLM reply", answer)
-            if original is not None:
-                core.set_clipboard_text(original)
+            entry = self.history.add(sel) if self.history is not None else None
+            # Toast opens now and fills in as tokens stream; the request runs off the Tk thread
+            title = "LLM reply"
+            if cap.truncated:
+                title = f"LLM reply (selection too long: used start and end of {cap.total_chars:,} chars)"
+            toast = self.popup_mgr.open_stream(title)
+            # Newest selection wins: under backlog the oldest queued explain is dropped
+            try:
+                fut = workers.explain_pool().submit(self._explain_worker, sel, toast, pf, entry,
+                                                    name="Explain", policy=workers.DISCARD_OLDEST)
+            except workers.PoolRejected:
+                toast.error("Skipped: too many requests pending")
+                return
+            fut.add_done_callback(lambda f: f.cancelled() and self._explain_dropped(toast))
         except Exception:
             core.log_exc("_on_hotkey failed in UI")
+
+    def _explain_worker(self, sel: str, toast: ToastHandle, pf=None, entry=None):
+        try:
+            if pf is not None and pf.join(sel, timeout_s=PREFETCH_JOIN_S):
+                log.info("[prefetch] hotkey joined the in-flight prefetch")
+            result = core.explain(sel, on_delta=toast.append)
+            if result.source == "local":
+                title = f"Computed locally ({result.detail.replace('_', ' ')})"
+            elif result.source == "glossary":
+                title = "From your glossary" + ("" if result.detail == "exact" else f" ({result.detail} match)")
+            elif result.source == "prefetch":
+                title = "Ready when you asked (prefetched on copy)"
+            elif result.source == "cache":
+                title = "Reused answer" + (" (same selection)" if result.detail == "exact" else f" (similar selection, {result.detail.split()[-1]})")
+            else:
+                title = None
+            toast.finalize(result.text, title=title)
+            if entry is not None and result.source != "incomplete":
+                self.history.attach_answer(entry, result.text, result.source)
+        except Exception as e:
+            core.log_exc("Explain worker failed")
+            toast.error(f"Error: {e}")
             
+    def _explain_dropped(self, toast: ToastHandle):
+        toast.error("Skipped: too many requests pending")
+
+    # Recent selections
+    def _open_history(self):
+        if self.history is None:
+            return
+        entries = self.history.recent()
+        if not entries:
+            self.popup_mgr.show("Recent selections", "Nothing yet: explain a selection with the hotkey first.")
+            return
+        self.picker.show(entries)
+
+    def _explain_from_history(self, entry):
+        answer = entry.answer
+        if answer is not None:
+            # Linked answer: shown again without a request
+            self.popup_mgr.show(f"From history ({time.strftime('%H:%M', time.localtime(entry.ts))})", answer)
+            return
+        toast = self.popup_mgr.open_stream("LLM reply")
+        try:
+            workers.explain_pool().submit(self._explain_worker, entry.text, toast, None, entry,
+                                          name="Explain", policy=workers.DISCARD_OLDEST)
+        except workers.PoolRejected:
+            toast.error("Skipped: too many requests pending")
+
+    def _compare_from_history(self, newer, older):
+        self.popup_mgr.show("Compared recent selections", compare_summary(newer.text, older.text))
+
     def _toggle_chat(self, icon=None, item=None):
         if self.chat.is_visible():
             self.chat.hide()
@@ -684,18 +1206,69 @@ class App:
             self.chat.show()
 
     # Tk task pump
-    def _drain_tasks(self):
+    def post(self, fn, priority=PRIORITY_NORMAL):
+        """Run fn on the Tk thread (callable from any thread)."""
+        self.dispatcher.post(fn, priority)
+
+    def _on_tk(self, fn):
+        """Wrap a tray-menu callback (pystray thread) so it runs on the Tk thread."""
+        def cb(icon=None, item=None):
+            self.post(fn)
+        return cb
+
+    def _wake_tk(self):
+        # Thread-safe: tkinter marshals this onto the Tk thread's event queue.
+        self.root.event_generate(WAKE_EVENT, when="tail")
+
+    def _on_tray_ready(self, icon):
+        # pystray calls this on its own thread once the icon exists; it must make it visible.
+        icon.visible = True
+        self._mark_startup("tray_visible")
+        core.apply_settings_log_level()
+        if (settings.load_settings() or {}).get("warmup", True):
+            try:
+                workers.default_pool().submit(self._warm_up, name="Warmup")
+            except workers.PoolRejected:
+                pass
         try:
-            while True:
-                fn = self.tasks.get_nowait()
-                try:
-                    log.debug("Running task: %s", getattr(fn, "__name__", str(fn)))
-                    fn()
-                except Exception:
-                    core.log_exc("Task execution failed")
-        except queue.Empty:
+            workers.default_pool().submit(self._resume_background, name="ResumeBackground")
+        except workers.PoolRejected:
             pass
-        self.root.after(30, self._drain_tasks)
+        if prefetch.enabled():
+            self._start_prefetch()
+
+    def _warm_up(self):
+        try:
+            llm.warm_up(cancel=self._warmup_cancel)
+        except Exception:
+            core.log_exc("Warm-up failed")
+
+    def _resume_background(self):
+        # Background /responses that were still running when the app last exited
+        try:
+            n = llm.resume_background(self._deliver_recovered, cancel=self._warmup_cancel)
+            if n:
+                log.info("Recovered %d background response(s)", n)
+        except Exception:
+            core.log_exc("Resuming background responses failed")
+
+    def _watch_background(self, response_id):
+        # Chat worker thread: the turn ran out of time but the provider is still working on it
+        def watch():
+            try:
+                llm.resume_background(self._deliver_recovered, cancel=self._warmup_cancel,
+                                      response_ids=[response_id], deadline_s=llm.BG_RESUME_MAX_S)
+            except Exception:
+                core.log_exc("Following background response failed")
+        try:
+            workers.default_pool().submit(watch, name="WatchBackground")
+        except workers.PoolRejected:
+            log.info("Background response %s left for the next start", response_id)
+
+    def _deliver_recovered(self, entry, text):
+        prompt = entry.get("prompt") or ""
+        self.post(lambda: self.chat.add_recovered(prompt, text))
+        self.post(lambda: self.popup_mgr.show("Recovered chat reply", text))
 
     # Run
     def run(self):
@@ -710,8 +1283,9 @@ class App:
 
     def _run_tray(self):
         try:
+            self.icon = self._build_tray_icon()
             log.debug("Tray thread entering icon.run()")
-            self.icon.run()
+            self.icon.run(setup=self._on_tray_ready)
             log.debug("icon.run() returned")
         except Exception:
             core.log_exc("Tray thread crashed")
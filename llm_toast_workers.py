@@ -0,0 +1,252 @@
+# llm_toast_workers.py
+"""
+Shared worker pool for background LLM work (hotkey explains, chat sends, warm-up,
+prefetch/batch jobs).
+
+- A fixed cap on concurrent workers: threads are started on demand up to max_workers,
+  then reused, so there is no per-request thread churn and no runaway concurrency
+  against the provider.
+- A bounded FIFO queue in front of the workers. When it is full, the rejection
+  policy decides what happens:
+    "abort"          -> submit() raises PoolRejected
+    "discard_oldest" -> the oldest queued task is cancelled to make room
+    "caller_runs"    -> the task runs synchronously on the submitting thread
+- Every task gets a name (used for the worker thread name while it runs) and its
+  queue wait / run time are measured.
+- shutdown() stops intake, lets queued work finish until a deadline, then cancels
+  the rest.
+- Two shared pools: default_pool() for chat, warm-up, background polling and
+  prefetch; explain_pool() for hotkey explains only. After shutdown_default_pool()
+  both raise PoolRejected instead of quietly starting new threads.
+
+submit() returns a concurrent.futures.Future; cancelled futures mean the task was
+dropped before it started.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Optional, Dict, Any
+
+import llm_toast_settings as settings
+
+__all__ = ["WorkerPool", "PoolRejected", "default_pool", "explain_pool", "shutdown_default_pool",
+           "ABORT", "DISCARD_OLDEST", "CALLER_RUNS"]
+
+log = logging.getLogger("clip_llm_tray")
+
+ABORT = "abort"
+DISCARD_OLDEST = "discard_oldest"
+CALLER_RUNS = "caller_runs"
+_POLICIES = (ABORT, DISCARD_OLDEST, CALLER_RUNS)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_EXPLAIN_WORKERS = 2
+DEFAULT_EXPLAIN_QUEUE = 4
+
+class PoolRejected(RuntimeError):
+    """Raised by submit() when the queue is full (policy "abort") or the pool is shut down."""
+
+class _Task:
+    __slots__ = ("fn", "name", "future", "t_submit")
+
+    def __init__(self, fn: Callable[[], Any], name: str) -> None:
+        self.fn = fn
+        self.name = name
+        self.future: Future = Future()
+        self.t_submit = time.perf_counter()
+
+class WorkerPool:
+    def __init__(self, name: str = "LLMWorker", max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, policy: str = ABORT) -> None:
+        if policy not in _POLICIES:
+            raise ValueError(f"Unknown rejection policy: {policy!r}")
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.policy = policy
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._threads = []
+        self._idle = 0
+        self._active = 0
+        self._closed = False
+        self._stats: Dict[str, Any] = {"submitted": 0, "completed": 0, "failed": 0,
+                                       "rejected": 0, "discarded": 0, "caller_ran": 0,
+                                       "wait_ms_max": 0.0, "run_ms_max": 0.0}
+
+    # -------- producer side --------
+    def submit(self, fn: Callable[..., Any], *args, name: Optional[str] = None,
+               policy: Optional[str] = None, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs); see the module docstring for the rejection policies."""
+        call = (lambda: fn(*args, **kwargs)) if (args or kwargs) else fn
+        task = _Task(call, name or getattr(fn, "__name__", "task"))
+        policy = policy or self.policy
+        dropped = None
+        with self._cond:
+            if self._closed:
+                self._stats["rejected"] += 1
+                raise PoolRejected(f"{self.name} is shut down")
+            self._stats["submitted"] += 1
+            # Room = queue slots + workers not currently running a task
+            room = self.max_queue + (self.max_workers - self._active)
+            if len(self._queue) >= room:
+                if policy == CALLER_RUNS:
+                    self._stats["caller_ran"] += 1
+                    task = self._run_inline(task)
+                    return task.future
+                if policy == DISCARD_OLDEST and self._queue:
+                    dropped = self._queue.popleft()
+                    self._stats["discarded"] += 1
+                else:
+                    self._stats["rejected"] += 1
+                    raise PoolRejected(f"{self.name} queue is full ({len(self._queue)} pending)")
+            self._queue.append(task)
+            if len(self._queue) > self._idle and len(self._threads) < self.max_workers:
+                self._start_worker()
+            self._cond.notify()
+        if dropped is not None:
+            log.warning("[pool] %s: queue full, dropped oldest task %s", self.name, dropped.name)
+            dropped.future.cancel()
+        return task.future
+
+    def _run_inline(self, task: _Task) -> _Task:
+        # Called with the lock held; release it while the task runs on the caller's thread.
+        self._cond.release()
+        try:
+            self._execute(task)
+        finally:
+            self._cond.acquire()
+        return task
+
+    # -------- workers --------
+    def _start_worker(self) -> None:
+        t = threading.Thread(target=self._worker, daemon=True,
+                             name=f"{self.name}-{len(self._threads) + 1}")
+        self._threads.append(t)
+        t.start()
+
+    def _worker(self) -> None:
+        base_name = threading.current_thread().name
+        while True:
+            with self._cond:
+                self._idle += 1
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                self._idle -= 1
+                if not self._queue:
+                    return  # closed and drained
+                task = self._queue.popleft()
+                self._active += 1
+            threading.current_thread().name = f"{base_name}:{task.name}"
+            try:
+                self._execute(task)
+            finally:
+                threading.current_thread().name = base_name
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def _execute(self, task: _Task) -> None:
+        if not task.future.set_running_or_notify_cancel():
+            return
+        t_start = time.perf_counter()
+        wait_ms = (t_start - task.t_submit) * 1000.0
+        error = None
+        try:
+            result = task.fn()
+        except BaseException as e:
+            error = e
+            log.exception("[pool] %s: task %s failed", self.name, task.name)
+        run_ms = (time.perf_counter() - t_start) * 1000.0
+        # Counted before the future resolves, so a caller waiting on it sees its own task in stats()
+        with self._cond:
+            self._stats["failed" if error is not None else "completed"] += 1
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+            self._stats["run_ms_max"] = max(self._stats["run_ms_max"], run_ms)
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(result)
+        log.debug("[pool] %s: task %s waited %.1f ms, ran %.1f ms", self.name, task.name, wait_ms, run_ms)
+
+    # -------- lifecycle --------
+    def shutdown(self, timeout_s: float = 2.0) -> int:
+        """
+        Stop accepting work, let queued and running tasks finish for up to timeout_s,
+        then cancel whatever is still queued. Returns the number of cancelled tasks.
+        """
+        deadline = time.monotonic() + max(0.0, timeout_s)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while (self._queue or self._active) and time.monotonic() < deadline:
+                self._cond.wait(timeout=max(0.0, deadline - time.monotonic()))
+            leftover = list(self._queue)
+            self._queue.clear()
+            still_running = self._active
+        for task in leftover:
+            task.future.cancel()
+        if leftover or still_running:
+            log.info("[pool] %s: shutdown cancelled %d queued task(s); %d still running",
+                     self.name, len(leftover), still_running)
+        return len(leftover)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            s = dict(self._stats)
+            s.update(queued=len(self._queue), active=self._active, threads=len(self._threads))
+        return s
+
+# -------------------- shared instances --------------------
+# Hotkey explains get their own small pool: chat drains, background polling and prefetch
+# can hold default_pool() workers for minutes, and must not delay (or be dropped for) a
+# selection the user is waiting on.
+
+_default: Optional[WorkerPool] = None
+_explain: Optional[WorkerPool] = None
+_shut_down = False
+_default_lock = threading.Lock()
+
+def default_pool() -> WorkerPool:
+    """The app-wide pool; size comes from settings (max_workers / max_queue) or env."""
+    global _default
+    with _default_lock:
+        if _shut_down:
+            raise PoolRejected("worker pools are shut down")
+        if _default is None:
+            cfg = settings.load_settings() or {}
+            workers = cfg.get("max_workers") or os.getenv("CLIPLLM_MAX_WORKERS") or DEFAULT_MAX_WORKERS
+            queue = cfg.get("max_queue") or os.getenv("CLIPLLM_MAX_QUEUE") or DEFAULT_MAX_QUEUE
+            _default = WorkerPool("LLMWorker", max_workers=int(workers), max_queue=int(queue))
+        return _default
+
+def explain_pool() -> WorkerPool:
+    """The pool reserved for hotkey explains (settings explain_workers, default 2)."""
+    global _explain
+    with _default_lock:
+        if _shut_down:
+            raise PoolRejected("worker pools are shut down")
+        if _explain is None:
+            cfg = settings.load_settings() or {}
+            workers = cfg.get("explain_workers") or os.getenv("CLIPLLM_EXPLAIN_WORKERS") or DEFAULT_EXPLAIN_WORKERS
+            _explain = WorkerPool("ExplainWorker", max_workers=int(workers), max_queue=DEFAULT_EXPLAIN_QUEUE,
+                                  policy=DISCARD_OLDEST)
+        return _explain
+
+def shutdown_default_pool(timeout_s: float = 2.0) -> None:
+    """Shut down the shared pools; later default_pool() / explain_pool() calls raise PoolRejected."""
+    global _default, _explain, _shut_down
+    with _default_lock:
+        _shut_down = True
+        pools = [p for p in (_explain, _default) if p is not None]
+        _default = _explain = None
+    deadline = time.monotonic() + timeout_s
+    for pool in pools:
+        pool.shutdown(max(0.0, deadline - time.monotonic()))
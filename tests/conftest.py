@@ -0,0 +1,42 @@
+# tests/conftest.py
+"""
+Shared test setup: the flat llm_toast_* modules are imported from the repo root, and
+every run gets its own config / telemetry dirs so nothing touches the real profile.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="clipllm_tests_")
+os.environ["APPDATA"] = os.path.join(_TMP, "appdata")
+os.environ["LOCALAPPDATA"] = os.path.join(_TMP, "localappdata")
+os.environ["CLIPLLM_TELEMETRY_FILE"] = os.path.join(_TMP, "telemetry.jsonl")
+os.environ.pop("CLIPLLM_API_KEY", None)
+os.environ.pop("CLIPLLM_API_BASE", None)
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """llm_toast_mock_server on an ephemeral port, with the client pointed at it.
+
+    Yields the server; tune timings through server.RequestHandlerClass.state.
+    """
+    import llm_toast_mock_server as mock
+    srv = mock.serve(0, bg_delay_s=1.0, latency_s=0.0, batch_delay_s=1.0)
+    t = threading.Thread(target=srv.serve_forever, name="MockProvider", daemon=True)
+    t.start()
+    monkeypatch.setenv("CLIPLLM_API_BASE", f"http://127.0.0.1:{srv.server_address[1]}/v1")
+    monkeypatch.setenv("CLIPLLM_API_KEY", "test-key")
+    try:
+        yield srv
+    finally:
+        srv.shutdown()
+        srv.server_close()
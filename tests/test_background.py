@@ -0,0 +1,51 @@
+import requests
+
+import llm_toast_llm as llm
+import llm_toast_pending as pending
+
+
+def _use_background(monkeypatch):
+    monkeypatch.setenv("CLIPLLM_BACKGROUND_RESPONSES", "1")
+    monkeypatch.setenv("CLIPLLM_CHAT_MODEL", "gpt-5-mock")
+
+
+def test_chat_submits_polls_and_completes(mock_api, monkeypatch):
+    _use_background(monkeypatch)
+    mock_api.RequestHandlerClass.state.bg_delay_s = 0.6
+    text, rid = llm.chat("/noweb what is a deadlock", deadline_s=10)
+    assert text == "[mock] what is a deadlock"
+    assert rid and rid.startswith("resp_")
+    assert rid not in pending.load()
+
+
+def test_expired_turn_is_collected_in_the_same_session(mock_api, monkeypatch):
+    _use_background(monkeypatch)
+    mock_api.RequestHandlerClass.state.bg_delay_s = 1.5
+    handed_over = []
+    text, _rid = llm.chat("/noweb slow question", deadline_s=0.4, on_background=handed_over.append)
+    assert text == llm.BG_STILL_RUNNING_TEXT
+    assert len(handed_over) == 1 and handed_over[0] in pending.load()
+
+    got = []
+    n = llm.resume_background(lambda entry, reply: got.append((entry["prompt"], reply)),
+                              response_ids=handed_over, deadline_s=10)
+    assert n == 1
+    assert got == [("slow question", "[mock] slow question")]
+    assert handed_over[0] not in pending.load()
+
+
+def test_resume_collects_a_persisted_pending_id(mock_api, monkeypatch):
+    _use_background(monkeypatch)
+    mock_api.RequestHandlerClass.state.bg_delay_s = 0.3
+    api_base = llm._load_config()[0]
+    r = requests.post(api_base + "/responses", json={"model": "gpt-5-mock", "input": "left over",
+                                                     "background": True}, timeout=5)
+    rid = r.json()["id"]
+    pending.add(rid, kind="chat", api_base=api_base, model="gpt-5-mock", prompt="left over")
+    pending.add("resp_unknown", kind="chat", api_base=api_base, model="gpt-5-mock", prompt="gone")
+
+    got = []
+    assert llm.resume_background(lambda entry, reply: got.append(reply)) == 1
+    assert got == ["[mock] left over"]
+    # Answered and unknown (404) ids are both dropped from the pending file
+    assert pending.load() == {}
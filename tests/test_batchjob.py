@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import llm_toast_batch as batch
+import llm_toast_batchjob as batchjob
+
+
+@pytest.fixture
+def fast_polls(mock_api, monkeypatch):
+    mock_api.RequestHandlerClass.state.batch_delay_s = 0.3
+    monkeypatch.setattr(batchjob, "POLL_START_S", 0.1)
+    monkeypatch.setattr(batchjob, "POLL_MAX_S", 0.2)
+    return mock_api
+
+
+def _items(*texts):
+    return [batch.Item(i, f"item-{i}", t, "explain") for i, t in enumerate(texts)]
+
+
+def _results(name):
+    with open(batchjob._path(name, ".results.jsonl"), "r", encoding="utf-8") as f:
+        return {row["id"]: row for row in map(json.loads, f)}
+
+
+def test_submit_and_collect_map_answers_back_to_ids(fast_polls):
+    job = batchjob.submit(_items("what is a mutex", "0x1f", "explain backpressure"))
+    assert job["offline"] == 1                  # "0x1f" is answered locally, never uploaded
+    assert job["batch_id"] and set(job["items"]) == {"i0", "i2"}
+
+    job = batchjob.collect(job["name"])
+    assert job["status"] == "collected" and job["batch_status"] == "completed"
+    assert job["result_counts"]["ok"] == 2
+    rows = _results(job["name"])
+    assert rows["item-0"]["answer"] == "[mock] what is a mutex"
+    assert rows["item-2"]["answer"] == "[mock] explain backpressure"
+    assert rows["item-1"]["source"] == "local"
+
+
+def test_resume_after_crash_between_pack_and_upload(fast_polls, monkeypatch):
+    def crash(_job):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as m:
+        m.setattr(batchjob, "advance", crash)
+        with pytest.raises(KeyboardInterrupt):
+            batchjob.submit(_items("first question", "second question"), name="crashed")
+    saved = batchjob.load_job("crashed")
+    assert saved["status"] == "packed" and "batch_id" not in saved
+
+    job = batchjob.collect("crashed")           # uploads, creates and waits, from the saved state
+    assert job["status"] == "collected" and job["result_counts"]["ok"] == 2
+    assert [r["answer"] for r in _results("crashed").values()] == ["[mock] first question", "[mock] second question"]
+
+
+def test_job_names_are_unique(fast_polls):
+    a = batchjob.submit(_items("0x10"))
+    b = batchjob.submit(_items("0x10"))
+    assert a["name"] != b["name"]
+    with pytest.raises(FileExistsError):
+        batchjob.submit(_items("0x10"), name=a["name"])
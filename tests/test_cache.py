@@ -0,0 +1,43 @@
+import pytest
+
+from llm_toast_cache import SimilarityCache
+
+TRACE = """Traceback (most recent call last):
+  File "service/worker.py", line {a}, in run
+    result = self.handler.process(message, timeout=self.timeout)
+  File "service/handler.py", line {b}, in process
+    payload = json.loads(message.body)
+json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)
+  at request 2024-05-01T10:{c}:00Z from worker pool main"""
+
+
+@pytest.fixture
+def cache():
+    return SimilarityCache(threshold=0.75, max_entries=100)
+
+
+def test_exact_tier_keeps_numbers(cache):
+    cache.store("HRESULT 0x80070005", "Access denied")
+    assert cache.lookup("hresult  0x80070005").kind == "exact"
+    assert cache.lookup("HRESULT 0x80004005") is None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("connection refused: could not connect to 127.0.0.1 on port 80", "connection refused: could not connect to 127.0.0.1 on port 443"),
+    ("redis connection error on localhost port 6379 after retries", "redis connection error on localhost port 5432 after retries"),
+    ("The operation failed with HRESULT 0x80070005 while opening the file", "The operation failed with HRESULT 0x80004005 while opening the file"),
+])
+def test_differing_codes_in_short_selections_are_not_similar(cache, stored, asked):
+    cache.store(stored, "answer")
+    assert cache.lookup(asked) is None
+
+
+def test_volatile_numbers_in_long_selections_still_match(cache):
+    cache.store(TRACE.format(a=42, b=17, c=11), "Empty message body")
+    hit = cache.lookup(TRACE.format(a=57, b=19, c=12))
+    assert hit is not None and hit.kind == "similar"
+
+
+def test_labelled_codes_must_match_in_long_selections(cache):
+    cache.store(TRACE.format(a=42, b=17, c=11) + "\nprocess exit code 3", "answer")
+    assert cache.lookup(TRACE.format(a=42, b=17, c=11) + "\nprocess exit code 4") is None
@@ -0,0 +1,98 @@
+import threading
+
+from llm_toast_chat_queue import ChatSendQueue
+
+
+class FakeModel:
+    """send_fn that blocks each call until released, and records concurrency."""
+
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.started = threading.Semaphore(0)
+        self.gates = {}
+        self._lock = threading.Lock()
+
+    def gate(self, text):
+        with self._lock:
+            return self.gates.setdefault(text, threading.Event())
+
+    def __call__(self, text, prev):
+        with self._lock:
+            self.calls.append((text, prev))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.release()
+        self.gate(text).wait(5.0)
+        with self._lock:
+            self.active -= 1
+        return f"re: {text}", f"resp-{text}"
+
+
+def _queue(model):
+    replies = []
+    done = threading.Semaphore(0)
+    def on_reply(msg, reply):
+        replies.append((msg.text, reply))
+        done.release()
+    return ChatSendQueue(send_fn=model, on_reply=on_reply), replies, done
+
+
+def test_fifo_one_send_at_a_time_and_chained():
+    model = FakeModel()
+    q, replies, done = _queue(model)
+    for text in ("a", "b", "c"):
+        q.submit(text)
+    for text in ("a", "b", "c"):
+        assert model.started.acquire(timeout=2.0)
+        assert q.state()[1] == 1          # one in flight
+        model.gate(text).set()
+        assert done.acquire(timeout=2.0)
+    assert [r[0] for r in replies] == ["a", "b", "c"]
+    assert model.max_active == 1
+    assert model.calls == [("a", None), ("b", "resp-a"), ("c", "resp-b")]
+    assert q.prev_response_id == "resp-c"
+
+
+def test_side_question_runs_alongside_and_does_not_advance_the_chain():
+    model = FakeModel()
+    q, replies, done = _queue(model)
+    q.submit("main")
+    assert model.started.acquire(timeout=2.0)
+    q.submit("side", parallel=True)
+    assert model.started.acquire(timeout=2.0)
+    assert model.max_active == 2
+    model.gate("side").set()
+    model.gate("main").set()
+    assert done.acquire(timeout=2.0) and done.acquire(timeout=2.0)
+    assert q.prev_response_id == "resp-main"
+
+
+def test_reset_drops_queued_messages_and_stale_replies():
+    model = FakeModel()
+    q, replies, done = _queue(model)
+    q.submit("old-1")
+    q.submit("old-2")
+    assert model.started.acquire(timeout=2.0)
+    q.reset()
+    assert q.state()[0] == 0
+    model.gate("old-1").set()
+    q.submit("new")
+    assert model.started.acquire(timeout=2.0)
+    model.gate("new").set()
+    assert done.acquire(timeout=2.0)
+    assert replies == [("new", "re: new")]
+    assert [c[0] for c in model.calls] == ["old-1", "new"]
+    assert model.calls[1][1] is None           # the old chain is not continued
+    assert q.prev_response_id == "resp-new"
+
+
+def test_refused_spawn_fails_only_that_message():
+    replies = []
+    def refuse(fn, name):
+        raise RuntimeError("pool is shut down")
+    q = ChatSendQueue(send_fn=lambda t, p: ("x", None), on_reply=lambda m, r: replies.append(r), spawn=refuse)
+    q.submit("hello")
+    assert replies == ["Error: pool is shut down"]
+    assert q.state() == (0, 0, 0.0)
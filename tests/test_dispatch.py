@@ -0,0 +1,74 @@
+import threading
+
+from llm_toast_dispatch import TaskDispatcher, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+
+def test_drain_runs_by_priority_then_post_order():
+    d = TaskDispatcher(wake=lambda: None)
+    ran = []
+    d.post(lambda: ran.append("low"), PRIORITY_LOW)
+    d.post(lambda: ran.append("normal-1"), PRIORITY_NORMAL)
+    d.post(lambda: ran.append("high"), PRIORITY_HIGH)
+    d.post(lambda: ran.append("normal-2"), PRIORITY_NORMAL)
+    assert d.drain() == 4
+    assert ran == ["high", "normal-1", "normal-2", "low"]
+
+
+def test_wake_fires_once_until_drained():
+    wakes = []
+    d = TaskDispatcher(wake=lambda: wakes.append(1))
+    d.post(lambda: None)
+    d.post(lambda: None)
+    assert len(wakes) == 1
+    d.drain()
+    d.post(lambda: None)
+    assert len(wakes) == 2
+
+
+def test_failed_wake_is_retried_on_next_post():
+    calls = []
+    def wake():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("no UI loop yet")
+    d = TaskDispatcher(wake=wake)
+    d.post(lambda: None)
+    d.post(lambda: None)
+    assert len(calls) == 2
+    assert d.pending() == 2
+
+
+def test_budgeted_drain_requests_another_turn():
+    wakes = []
+    d = TaskDispatcher(wake=lambda: wakes.append(1))
+    for _ in range(3):
+        d.post(lambda: None)
+    assert d.drain(max_tasks=2) == 2
+    assert d.pending() == 1
+    assert len(wakes) == 2
+
+
+def test_stats_count_tasks_failures_and_wakes():
+    d = TaskDispatcher(wake=lambda: None)
+    d.post(lambda: None)
+    d.post(lambda: 1 / 0, name="boom")
+    d.drain()
+    s = d.stats()
+    assert (s["tasks"], s["failed"], s["wakes"], s["pending"]) == (2, 1, 1, 0)
+    assert s["wait_ms_avg"] >= 0.0
+
+
+def test_posting_from_many_threads_while_draining():
+    d = TaskDispatcher(wake=lambda: None)
+    done = []
+    def producer():
+        for _ in range(200):
+            d.post(lambda: done.append(1))
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        d.drain(max_tasks=50)
+    d.drain()
+    assert len(done) == 800
+    assert d.stats()["tasks"] == 800
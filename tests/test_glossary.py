@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import llm_toast_glossary as glossary
+import llm_toast_llm as llm
+
+
+@pytest.fixture
+def terms(tmp_path, monkeypatch):
+    src = tmp_path / "glossary.csv"
+    src.write_text("term,definition\n"
+                   "RAFT,Consensus algorithm used by the metadata store\n"
+                   "Kubernetes,Container orchestrator\n"
+                   "sidecar,Helper container next to the app\n"
+                   "sidecart,Typo-prone name of the cart service\n", encoding="utf-8")
+    monkeypatch.setenv("CLIPLLM_GLOSSARY", str(src))
+    monkeypatch.setattr(glossary, "_index", None)
+    monkeypatch.setattr(glossary, "_source", None)
+    monkeypatch.setattr(glossary, "_failed", None)
+    monkeypatch.setattr(glossary, "_last_check", 0.0)
+    assert glossary.preload()
+    yield src
+    with glossary._lock:
+        if glossary._index is not None:
+            glossary._index.close()
+            glossary._index = None
+
+
+def test_exact_and_prefix_answer_offline(terms):
+    assert glossary.lookup("raft").match == "exact"
+    assert glossary.lookup("Kubern").term == "Kubernetes"
+
+
+@pytest.mark.parametrize("text", ["craft", "draft", "graft", "rafts", "Kubernetis"])
+def test_one_edit_away_does_not_answer_offline(terms, text):
+    assert glossary.lookup(text) is None
+
+
+def test_near_needs_a_single_candidate(terms):
+    assert glossary.near("craft").term == "RAFT"
+    assert glossary.near("sidecat") is None      # sidecar and sidecart are both one edit away
+
+
+def test_typo_is_only_prompt_context(terms):
+    assert llm.answer_offline("craft", llm.profiles.resolve("craft")) is None
+    prompt = llm._grounded_prompt("craft", {})
+    assert "typo" in prompt and "RAFT: Consensus algorithm" in prompt
+
+
+def _edit(src, monkeypatch, extra):
+    monkeypatch.setattr(glossary, "RELOAD_CHECK_S", 0.0)
+    src.write_text(src.read_text(encoding="utf-8") + extra, encoding="utf-8")
+
+
+def test_recompile_runs_in_background_and_keeps_serving_old_index(terms, monkeypatch):
+    real, started, release = glossary.compile_index, threading.Event(), threading.Event()
+
+    def slow_compile(source, index_path):
+        started.set()
+        assert release.wait(5.0)
+        return real(source, index_path)
+
+    monkeypatch.setattr(glossary, "compile_index", slow_compile)
+    _edit(terms, monkeypatch, "etcd,Key-value store\n")
+    assert glossary.lookup("raft").term == "RAFT"      # does not wait for the compile
+    assert started.wait(2.0)
+    assert glossary.lookup("Kubernetes").match == "exact"
+    assert glossary.lookup("etcd") is None
+    builder = glossary._builder
+    release.set()
+    builder.join(5.0)
+    assert glossary.lookup("etcd").definition == "Key-value store"
+
+
+def test_failed_recompile_keeps_old_index(terms, monkeypatch):
+    calls = []
+
+    def broken(source, index_path):
+        calls.append(source)
+        raise ValueError("bad source")
+
+    monkeypatch.setattr(glossary, "compile_index", broken)
+    _edit(terms, monkeypatch, "etcd,Key-value store\n")
+    glossary.preload()                                  # waits for the failed compile
+    for _ in range(3):
+        assert glossary.lookup("raft").term == "RAFT"
+    assert len(calls) == 1                              # not retried until the source changes again
@@ -0,0 +1,65 @@
+import random
+import string
+
+import llm_toast_history as history
+
+
+def _texts(h):
+    return [e.text for e in h.recent()]
+
+
+def test_item_cap_evicts_oldest_and_repeat_moves_to_front():
+    h = history.SelectionHistory(max_items=3)
+    for t in ("a", "b", "c"):
+        h.add(t)
+    again = h.add("  a ")                       # same stripped text: no copy
+    assert again.hits == 2
+    h.add("d")
+    assert _texts(h) == ["d", "a", "c"]
+    assert h.stats()["items"] == 3
+
+
+def test_byte_cap_evicts_oldest():
+    per = history.ENTRY_OVERHEAD_BYTES + 1 + 10
+    h = history.SelectionHistory(max_bytes=3 * per, max_items=100)
+    for t in ("one-------", "two-------", "three-----", "four------"):
+        h.add(t)
+    assert _texts(h) == ["four------", "three-----", "two-------"]
+    assert h.stats()["bytes"] == 3 * per
+    noise = "".join(random.Random(0).choices(string.printable, k=10 * per))   # does not compress
+    assert h.add(noise) is None                 # larger than the whole budget
+    assert len(h.recent()) == 3
+
+
+def test_large_text_and_answer_round_trip_compressed():
+    text = "SELECT id, name FROM users WHERE active = 1;\n" * 40
+    answer = "Lists the active users. " * 40
+    h = history.SelectionHistory()
+    e = h.add(text)
+    assert e._text[:1] == b"z" and len(e._text) < len(text)
+    h.attach_answer(e, answer, "llm")
+    assert e._answer[:1] == b"z"
+    assert (e.text, e.answer, e.source) == (text.strip(), answer, "llm")
+    small = h.add("x" * (history.COMPRESS_MIN_BYTES - 1))
+    assert small._text[:1] == b"r"
+
+
+def test_attach_answer_counts_bytes_and_skips_evicted_entries():
+    h = history.SelectionHistory(max_items=1)
+    first = h.add("first")
+    assert first.answer is None
+    h.attach_answer(first, "an answer", "local")
+    assert h.stats() == {"items": 1, "bytes": first.nbytes, "max_bytes": h.max_bytes,
+                         "text_chars": 5, "answered": 1}
+    h.add("second")                             # evicts first
+    h.attach_answer(first, "late answer", "llm")
+    assert h.get(first.id) is None
+    assert h.stats()["answered"] == 0
+
+
+def test_answer_that_overflows_evicts_others_not_its_entry():
+    per = history.ENTRY_OVERHEAD_BYTES + 1 + 5
+    h = history.SelectionHistory(max_bytes=2 * per + 50, max_items=100)
+    old, new = h.add("older"), h.add("newer")
+    h.attach_answer(new, "y" * 60, "llm")
+    assert h.get(old.id) is None and h.get(new.id).answer == "y" * 60
@@ -0,0 +1,64 @@
+import pytest
+
+import llm_toast_io as io
+from llm_toast_io import KeyEvent, RecordingKeyBackend, VK_CONTROL, VK_SHIFT, VK_MENU, VK_LWIN, VK_RWIN, VK_C
+
+
+@pytest.fixture
+def recorder():
+    def install(held=()):
+        rec = RecordingKeyBackend(held)
+        io.set_key_backend(rec)
+        return rec
+    prev = io.key_backend()
+    yield install
+    io.set_key_backend(prev)
+
+
+def test_plain_copy_when_nothing_is_held(recorder):
+    rec = recorder()
+    io.send_key_sequence(io.copy_key_sequence())
+    assert rec.batches == [[KeyEvent(VK_CONTROL, True), KeyEvent(VK_C, True),
+                            KeyEvent(VK_C, False), KeyEvent(VK_CONTROL, False)]]
+    assert rec.held == set()
+
+
+def test_hotkey_modifiers_are_lifted_and_restored(recorder):
+    rec = recorder([VK_CONTROL, VK_MENU, VK_SHIFT])
+    io.send_key_sequence(io.copy_key_sequence())
+    seq = rec.batches[0]
+    assert seq[:2] == [KeyEvent(VK_SHIFT, False), KeyEvent(VK_MENU, False)]
+    assert seq[2:4] == [KeyEvent(VK_C, True), KeyEvent(VK_C, False)]   # Ctrl already down: not pressed again
+    assert seq[4:] == [KeyEvent(VK_SHIFT, True), KeyEvent(VK_MENU, True)]
+    assert rec.held == {VK_CONTROL, VK_MENU, VK_SHIFT}
+
+
+@pytest.mark.parametrize("held", [(), (VK_CONTROL,), (VK_CONTROL, VK_SHIFT), (VK_LWIN,), (VK_RWIN, VK_MENU)])
+def test_one_batch_and_key_state_unchanged(recorder, held):
+    rec = recorder(held)
+    io.send_key_sequence(io.copy_key_sequence())
+    assert len(rec.batches) == 1
+    seq = rec.batches[0]
+    assert KeyEvent(VK_C, True) in seq and seq.index(KeyEvent(VK_C, True)) < seq.index(KeyEvent(VK_C, False))
+    # Ctrl is down and no other modifier is while C goes down
+    down = set(held)
+    for ev in seq[:seq.index(KeyEvent(VK_C, True))]:
+        (down.add if ev.down else down.discard)(ev.vk)
+    assert down == {VK_CONTROL}
+    assert rec.held == set(held)
+
+
+def test_explicit_key_state_overrides_backend(recorder):
+    rec = recorder()
+    seq = io.copy_key_sequence(lambda vk: vk == VK_SHIFT)
+    assert seq[0] == KeyEvent(VK_SHIFT, False) and seq[-1] == KeyEvent(VK_SHIFT, True)
+    assert rec.batches == []
+
+
+def test_single_keys_delegate_to_backend(recorder):
+    rec = recorder()
+    io.sendinput_key(VK_SHIFT, True)
+    assert io.is_key_down(VK_SHIFT)
+    io.sendinput_key(VK_SHIFT, False)
+    assert not io.is_key_down(VK_SHIFT)
+    assert len(rec.batches) == 2
@@ -0,0 +1,58 @@
+import time
+import threading
+
+import llm_toast_limiter as limiter
+from llm_toast_limiter import AimdLimiter
+
+
+def test_ok_without_latency_still_increases():
+    lim = AimdLimiter("t", initial=2, max_limit=8)
+    for _ in range(20):
+        permits = [lim.acquire(1.0), lim.acquire(1.0)]
+        for p in permits:
+            p.release(limiter.OK, None)
+    s = lim.stats()
+    assert s["limit"] > 2 and s["spikes"] == 0
+
+
+def test_ttfb_spike_decreases():
+    lim = AimdLimiter("t", initial=8)
+    for _ in range(5):
+        lim.acquire(1.0).release(limiter.OK, 200.0)
+    lim.acquire(1.0).release(limiter.OK, 2000.0)
+    assert lim.stats()["spikes"] == 1 and lim.limit == 4
+
+
+def test_throttle_decreases_once_per_cooldown():
+    lim = AimdLimiter("t", initial=8)
+    for _ in range(3):
+        lim.acquire(1.0).release(limiter.THROTTLED)
+    assert lim.limit == 4
+
+
+def test_interactive_waiters_go_before_background_ones():
+    lim = AimdLimiter("t", initial=1, max_limit=1)
+    held = lim.acquire(1.0)
+    order = []
+
+    def take(tag):
+        p = lim.acquire(5.0)
+        order.append(tag)
+        p.release(limiter.OK)
+
+    def background_take():
+        with limiter.background():
+            take("background")
+
+    bg = threading.Thread(target=background_take)
+    bg.start()
+    while lim.stats()["waiting"] < 1:
+        time.sleep(0.01)
+    fg = threading.Thread(target=take, args=("interactive",))
+    fg.start()
+    while lim.stats()["waiting_interactive"] < 1:
+        time.sleep(0.01)
+    held.release(limiter.OK)
+    bg.join(5.0)
+    fg.join(5.0)
+    assert order == ["interactive", "background"]
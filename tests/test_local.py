@@ -0,0 +1,46 @@
+import pytest
+
+import llm_toast_local as local
+
+
+@pytest.mark.parametrize("text", ["HTTP 404", "HTTP/1.1 503", "404 Not Found", "status 500", "HTTP status code 429"])
+def test_http_status_with_context(text):
+    assert local.evaluate(text).evaluator == "http_status"
+
+
+@pytest.mark.parametrize("text", ["200", "100", "404", "200 apples"])
+def test_bare_three_digit_number_is_not_a_status(text):
+    answer = local.evaluate(text)
+    assert answer is None or answer.evaluator != "http_status"
+
+
+def test_kelvin_has_no_degree_sign():
+    assert local.evaluate("300 °K").text.startswith("300 K = 26.9 °C")
+    assert local.evaluate("25 C").text.startswith("25 °C =")
+
+
+@pytest.mark.parametrize("text", ["4K", "10k", "5G", "5g", "1t", "100m", "25C", "4k", "1T"])
+def test_ambiguous_suffix_without_space_is_not_a_unit(text):
+    assert local.evaluate(text) is None
+
+
+@pytest.mark.parametrize("text, start", [
+    ("4 K", "4 K = -269.1 °C"), ("25 °C", "25 °C = 25.0 °C"), ("100 m", "100 m = 328.1 ft"),
+    ("5 g", "5 g = 0.01102 lb"), ("1 t", "1 t = 2,205 lb"), ("100mph", "100 mph = "), ("3km", "3 km = "),
+])
+def test_units_with_clear_symbols(text, start):
+    answer = local.evaluate(text)
+    assert answer.evaluator == "units" and answer.text.startswith(start)
+
+
+@pytest.mark.parametrize("text", ["9a2827c", "f1", "3d", "cafe", "2024", "404", "1,024", "-42"])
+def test_ids_words_and_short_numbers_are_not_integers(text):
+    answer = local.evaluate(text)
+    assert answer is None or answer.evaluator != "integer"
+
+
+@pytest.mark.parametrize("text, src", [("0x1f", "hex"), ("0X1F", "hex"), ("0b1010", "binary"),
+                                       ("12345", "decimal"), ("1,000,000", "decimal")])
+def test_prefixed_and_long_integers(text, src):
+    answer = local.evaluate(text)
+    assert answer.evaluator == "integer" and f"({src})" in answer.text
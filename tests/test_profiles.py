@@ -0,0 +1,64 @@
+import pytest
+
+import llm_toast_profiles as profiles
+
+
+@pytest.fixture
+def cfg(monkeypatch):
+    conf = {}
+    monkeypatch.setattr(profiles.settings, "load_settings", lambda: conf)
+    monkeypatch.delenv("CLIPLLM_PROFILE", raising=False)
+    return conf
+
+
+@pytest.mark.parametrize("n_chars, name, expected", [
+    (0, None, "fast"),
+    (280, None, "fast"),
+    (281, None, "balanced"),
+    (2000, "auto", "balanced"),
+    (2001, "AUTO", "thorough"),
+    (10, "thorough", "thorough"),
+    (5000, "fast", "fast"),
+    (10, "no-such-profile", "balanced"),
+])
+def test_resolve(cfg, n_chars, name, expected):
+    assert profiles.resolve("x" * n_chars, name).name == expected
+
+
+def test_resolve_follows_selected_profile_and_overrides(cfg):
+    cfg["profile"] = "thorough"
+    cfg["profiles"] = {"thorough": {"max_tokens": 100, "name": "renamed", "bogus": 1}}
+    prof = profiles.resolve("short")
+    assert (prof.name, prof.max_tokens) == ("thorough", 100)
+
+
+@pytest.mark.parametrize("profile, expected", [
+    (None, "explain-m"),
+    ("fast", "explain-m"),
+    ("balanced", "explain-m"),
+    ("thorough", "chat-m"),
+])
+def test_model_for(cfg, profile, expected):
+    prof = profiles.resolve("", profile) if profile else None
+    assert profiles.model_for(prof, "explain-m", "chat-m") == expected
+
+
+def test_model_for_explicit_model():
+    prof = profiles.Profile("custom", "gpt-4o", None, None, 256, 5.0)
+    assert profiles.model_for(prof, "explain-m", "chat-m") == "gpt-4o"
+
+
+@pytest.mark.parametrize("model, profile, chat, responses", [
+    ("gpt-5-mini", "fast", {"reasoning_effort": "minimal", "verbosity": "low"},
+     {"reasoning": {"effort": "minimal"}, "text": {"verbosity": "low"}}),
+    ("gpt-5", "thorough", {"reasoning_effort": "medium", "verbosity": "medium"},
+     {"reasoning": {"effort": "medium"}, "text": {"verbosity": "medium"}}),
+    ("o3-mini", "balanced", {"reasoning_effort": "low"}, {"reasoning": {"effort": "low"}}),
+    ("gpt-4o-mini", "fast", {}, {}),
+    ("omni-moderation", "fast", {}, {}),
+    ("gpt-5", None, {}, {}),
+])
+def test_request_params(cfg, model, profile, chat, responses):
+    prof = profiles.resolve("", profile) if profile else None
+    assert profiles.chat_params(model, prof) == chat
+    assert profiles.responses_params(model, prof) == responses
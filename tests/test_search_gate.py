@@ -0,0 +1,42 @@
+import pytest
+
+from llm_toast_search_gate import decide
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("what's on today's agenda at the UN", "recency"),
+    ("anything new this week in rust async", "recency"),
+    ("latest version of numpy", "recency"),
+    ("AAPL stock price", "recency"),
+    ("weather in Oslo tomorrow", "recency"),
+    ("who won the match last night", "recency"),
+    ("what is the price of bitcoin", "recency"),
+    ("latest release of Python", "recency"),
+    ("who is the current CEO of Acme Corp", "recency"),
+    ("who is Ada Lovelace", "entity"),
+    ("see https://example.com/changelog", "url"),
+])
+def test_turns_that_need_the_web(text, reason):
+    d = decide(text, mode="auto")
+    assert (d.web_search, d.reason) == (True, reason)
+
+
+@pytest.mark.parametrize("text", [
+    "update the release schedule",
+    "current directory",
+    "what does the deadline field mean",
+    "print the score now",
+    "how do I release a mutex",
+    "explain why the price column is null",
+    "the schedule slipped because of the update",
+])
+def test_ordinary_text_stays_local(text):
+    assert decide(text, mode="auto").web_search is False
+
+
+def test_local_tasks_and_overrides():
+    assert decide("rewrite: latest news from Acme Corp today", mode="auto").reason == "local_task"
+    d = decide("/web current directory", mode="auto")
+    assert (d.web_search, d.reason, d.text) == (True, "override:web", "current directory")
+    assert decide("/noweb today's news", mode="auto").web_search is False
+    assert decide("hello", mode="always").web_search is True
@@ -0,0 +1,20 @@
+import llm_toast_llm as llm
+
+
+def test_deadline_mid_stream_keeps_partial_answer(mock_api):
+    # First word arrives at once, the next one only after the deadline: the read
+    # times out mid-stream and the call must end as a cut-off answer, not an error.
+    mock_api.RequestHandlerClass.state.chunk_delay_s = 1.5
+    seen = []
+    out = llm.explain("zebra crossing rules", on_delta=seen.append, deadline_s=0.8)
+    assert out.source == "incomplete"
+    assert out.text == "[mock] …"
+    assert "LLM error" not in out.text
+    assert "".join(seen) == "[mock] …"
+
+
+def test_deadline_before_first_token_is_an_error(mock_api):
+    mock_api.RequestHandlerClass.state.latency_s = 1.5
+    out = llm.explain("zebra crossing rules", on_delta=lambda _d: None, deadline_s=0.5)
+    assert out.source == "incomplete"
+    assert out.text.startswith("LLM error")
@@ -0,0 +1,41 @@
+import llm_toast_telemetry as telemetry
+
+
+def _rec(model, latency, offline=None, outcome="ok", tokens=None):
+    rec = {"ts": "2026-10-18T10:00:00", "model": model, "latency_ms": latency, "outcome": outcome,
+           "prompt_tokens": tokens, "completion_tokens": tokens}
+    if offline:
+        rec["offline"] = offline
+    return rec
+
+
+RECORDS = [
+    _rec("gpt-5-nano", 800.0, tokens=100),
+    _rec("gpt-5-nano", 1200.0, tokens=50),
+    _rec("gpt-5-nano", 0.1, offline="local"),
+    _rec("gpt-5-nano", 0.3, offline="cache"),
+    _rec("gpt-5-nano", 0.2, offline="glossary"),
+    _rec("gpt-5", 3000.0, outcome="timeout"),
+]
+
+
+def test_offline_answers_stay_out_of_provider_latency():
+    out = telemetry.aggregate(RECORDS, by="model")
+    nano = out["gpt-5-nano"]
+    assert (nano["calls"], nano["offline"], nano["errors"]) == (5, 3, 0)
+    assert (nano["p50_ms"], nano["max_ms"]) == (800.0, 1200.0)
+    assert nano["prompt_tokens"] == 150
+    assert out["gpt-5"]["errors"] == 1 and out["gpt-5"]["p90_ms"] == 3000.0
+
+
+def test_grouping_by_offline_shows_their_latency():
+    out = telemetry.aggregate(RECORDS, by="offline")
+    assert out["local"]["p50_ms"] == 0.1
+    assert out["(unknown)"]["calls"] == 3 and out["(unknown)"]["p50_ms"] == 1200.0
+
+
+def test_day_grouping_and_percentiles():
+    out = telemetry.aggregate(RECORDS, by="day")
+    day = out["2026-10-18"]
+    assert day["calls"] == 6 and day["offline"] == 3
+    assert (day["p50_ms"], day["p99_ms"]) == (1200.0, 3000.0)
@@ -0,0 +1,20 @@
+import pytest
+
+import llm_toast_llm as llm
+from llm_toast_llm import Deadline
+
+
+def test_stream_throttle_is_terminal(mock_api):
+    state = mock_api.RequestHandlerClass.state
+    state.max_concurrency, state.active = 1, 1     # every request is answered 429
+    api_base = llm._load_config()[0]
+    with pytest.raises(RuntimeError, match="HTTP 429"):
+        llm._try_stream_chat_completions(api_base, "test-key", "gpt-5-mock", "sys", "hello",
+                                         Deadline(5), token_budget=50, on_delta=lambda _d: None)
+    assert state.throttled == 1
+
+
+def test_stream_rejection_still_falls_back(mock_api):
+    api_base = llm._load_config()[0] + "/nowhere"
+    assert llm._try_stream_chat_completions(api_base, "test-key", "gpt-5-mock", "sys", "hello",
+                                            Deadline(5), token_budget=50, on_delta=lambda _d: None) is None
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+import llm_toast_workers as workers
+
+
+@pytest.fixture
+def fresh_pools(monkeypatch):
+    monkeypatch.setattr(workers, "_default", None)
+    monkeypatch.setattr(workers, "_explain", None)
+    monkeypatch.setattr(workers, "_shut_down", False)
+    yield
+    workers.shutdown_default_pool(timeout_s=0.5)
+
+
+def test_explain_pool_is_not_starved_by_long_jobs(fresh_pools):
+    release = threading.Event()
+    default = workers.default_pool()
+    for i in range(default.max_workers):
+        default.submit(release.wait, 5.0, name=f"long-{i}")
+    try:
+        fut = workers.explain_pool().submit(lambda: "answer", name="Explain")
+        assert fut.result(timeout=2.0) == "answer"
+    finally:
+        release.set()
+
+
+def test_shared_pools_refuse_work_after_shutdown(fresh_pools):
+    pool = workers.default_pool()
+    workers.shutdown_default_pool(timeout_s=0.5)
+    with pytest.raises(workers.PoolRejected):
+        workers.default_pool()
+    with pytest.raises(workers.PoolRejected):
+        workers.explain_pool()
+    with pytest.raises(workers.PoolRejected):
+        pool.submit(lambda: None)
+
+
+def test_discard_oldest_drops_queued_task():
+    pool = workers.WorkerPool("T", max_workers=1, max_queue=1)
+    release = threading.Event()
+    started = threading.Event()
+    pool.submit(lambda: (started.set(), release.wait(5.0)), name="running")
+    assert started.wait(2.0)
+    first = pool.submit(lambda: 1, name="first")
+    second = pool.submit(lambda: 2, name="second", policy=workers.DISCARD_OLDEST)
+    release.set()
+    assert first.cancelled()
+    assert second.result(timeout=2.0) == 2
+    pool.shutdown(timeout_s=1.0)
+
+
+def test_stats_count_every_task_from_many_workers():
+    pool = workers.WorkerPool("T", max_workers=8, max_queue=1000)
+    futs = [pool.submit((lambda i=i: 1 / (i % 5)), name=f"t{i}") for i in range(500)]
+    for f in futs:
+        f.exception(timeout=5.0)
+    s = pool.stats()
+    assert (s["completed"], s["failed"]) == (400, 100)
+    pool.shutdown(timeout_s=1.0)